@@ -5,13 +5,19 @@ Functionality that combines arguments and configuration files.
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import copy
 import logging
 
 logging = logging.getLogger('appupup')
 
 
 def get_common_arg(args, arg_name, cfg_group, cfg_key, default=None):
-    """ Retrieve a setting either from command line or from settings file. """
+    """
+    Retrieve a setting either from command line or from settings file.
+
+    To read several settings with their types and report all the missing
+    ones at once, declare them with :class:`Settings`.
+    """
     result = getattr(args, arg_name)
     if result is None:
         try:
@@ -26,3 +32,234 @@ def get_common_arg(args, arg_name, cfg_group, cfg_key, default=None):
             else:
                 result = default
     return result
+
+
+def parse_size(value):
+    """
+    Converts a size like 512, 64K, 100M or 2G to a number of bytes.
+
+    Can be used as the `type` of an argument.
+    """
+    value = str(value).strip()
+    multiplier = 1
+    suffix = value[-1:].upper()
+    if suffix in _SIZE_SUFFIXES:
+        multiplier = _SIZE_SUFFIXES[suffix]
+        value = value[:-1]
+    return int(value) * multiplier
+
+
+_SIZE_SUFFIXES = {
+    'K': 1024,
+    'M': 1024 * 1024,
+    'G': 1024 * 1024 * 1024,
+}
+
+
+_TRUE_VALUES = frozenset(('1', 'yes', 'true', 'on'))
+_FALSE_VALUES = frozenset(('0', 'no', 'false', 'off'))
+
+
+def parse_bool(value):
+    """ Converts yes/no, true/false, on/off or 1/0 to a boolean. """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError("Not a boolean: %r" % value)
+
+
+# The converters used for some types instead of the type itself.
+_CONVERTERS = {bool: parse_bool}
+
+
+class Setting(object):
+    """
+    The declaration of a setting read by :class:`Settings`.
+
+    Like :func:`get_common_arg` the value given at the command line wins;
+    otherwise the value in the config file is used.
+
+    Arguments:
+        name (str):
+            The name of the attribute in the resolved settings.
+        arg_name (str):
+            The member of the parsed arguments; `name` by default,
+            False if the setting can not be given at the command line.
+        cfg_group (str):
+            The section of the config file; the `group` of
+            :class:`Settings` by default.
+        cfg_key (str):
+            The key in that section; `name` by default.
+        type:
+            A callable that converts the text (e.g. int, float,
+            :func:`parse_size`); `bool` accepts yes/no, true/false,
+            on/off and 1/0.
+        default:
+            The value used when the setting is found in neither place;
+            it is not converted.
+        required (bool):
+            A missing setting without a default is an error; by default
+            the setting is required if it has no default.
+    """
+    __slots__ = ('name', 'arg_name', 'cfg_group', 'cfg_key', 'type',
+                 'convert', 'default', 'required')
+
+    def __init__(self, name, arg_name=None, cfg_group=None, cfg_key=None,
+                 type=str, default=None, required=None):
+        self.name = name
+        self.arg_name = name if arg_name is None else arg_name
+        self.cfg_group = cfg_group
+        self.cfg_key = name if cfg_key is None else cfg_key
+        self.type = type
+        self.convert = _CONVERTERS.get(type, type)
+        self.default = default
+        self.required = default is None if required is None else required
+
+    def __repr__(self):
+        return 'Setting(%r)' % self.name
+
+    def where(self):
+        """ Tells where the setting can be given. """
+        places = []
+        if self.arg_name:
+            places.append('at command line as --%s=value' %
+                          self.arg_name.replace('_', '-'))
+        if self.cfg_group:
+            places.append('in config file as %s=value in [%s] section' %
+                          (self.cfg_key, self.cfg_group))
+        return ' or '.join(places)
+
+
+class SettingsError(RuntimeError):
+    """
+    Some settings are missing or have invalid values.
+
+    Attributes:
+        errors (list):
+            A message for each setting.
+    """
+    def __init__(self, errors):
+        super(SettingsError, self).__init__(
+            'Invalid settings:\n  ' + '\n  '.join(errors))
+        self.errors = errors
+
+
+class FrozenSettings(object):
+    """
+    The base of the objects returned by :meth:`Settings.resolve`.
+
+    The values are attributes that can not be changed.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The settings are read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("The settings are read-only")
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (name, getattr(self, name))
+            for name in self.__slots__))
+
+    def as_dict(self):
+        """ The values in a dictionary. """
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class Settings(object):
+    """
+    A set of settings resolved together.
+
+    The class of the result (a :class:`FrozenSettings` with a slot for
+    each setting) is built once, when the settings are declared:
+
+        >>> SETTINGS = Settings([
+        ...     Setting('host'),
+        ...     Setting('port', type=int, default=8080),
+        ...     Setting('debug', type=bool, default=False, arg_name=False),
+        ... ], group='server')
+        >>> settings = SETTINGS.resolve(args)
+        >>> settings.port
+        8080
+
+    Arguments:
+        settings:
+            A list of :class:`Setting`.
+        group (str):
+            The section of the config file for the settings that do not
+            name one.
+        name (str):
+            The name of the class of the result.
+    """
+    def __init__(self, settings, group=None, name='ResolvedSettings'):
+        self.settings = list(settings)
+        names = [setting.name for setting in self.settings]
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the settings are not unique")
+        if group is not None:
+            # The declarations may be shared with other Settings, so
+            # the group is set on copies.
+            for index, setting in enumerate(self.settings):
+                if setting.cfg_group is None:
+                    setting = copy.copy(setting)
+                    setting.cfg_group = group
+                    self.settings[index] = setting
+        self.cls = type(str(name), (FrozenSettings, ),
+                        {'__slots__': tuple(names)})
+        # Slot descriptors set the values without FrozenSettings.__setattr__.
+        self.setters = [getattr(self.cls, name).__set__ for name in names]
+
+    def resolve(self, args, cfg=None):
+        """
+        Reads all the settings.
+
+        Arguments:
+            args:
+                Arguments returned by the parser.
+            cfg:
+                The config parser; `args.cfg` by default.
+
+        Raises:
+            SettingsError:
+                With a message for each missing or invalid setting.
+
+        Returns:
+            A :class:`FrozenSettings` instance.
+        """
+        if cfg is None:
+            cfg = getattr(args, 'cfg', None)
+        result = self.cls.__new__(self.cls)
+        errors = []
+        for setting, setter in zip(self.settings, self.setters):
+            value = getattr(args, setting.arg_name, None) \
+                if setting.arg_name else None
+            source = 'at command line'
+            if value is None and setting.cfg_group and cfg is not None:
+                try:
+                    value = cfg[setting.cfg_group][setting.cfg_key]
+                    source = 'in [%s] section' % setting.cfg_group
+                except KeyError:
+                    pass
+            if value is None:
+                if setting.required:
+                    errors.append('%s needs to be specified %s' % (
+                        setting.name, setting.where()))
+                value = setting.default
+            elif isinstance(value, str) or setting.type is bool:
+                try:
+                    value = setting.convert(value)
+                except (ValueError, TypeError) as e:
+                    errors.append('%s has an invalid value %r %s: %s' % (
+                        setting.name, value, source, e))
+                    continue
+            setter(result, value)
+        if errors:
+            raise SettingsError(errors)
+        return result
+
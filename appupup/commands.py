@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Subcommands that are only imported when they run.
+
+Instead of building all the subcommands in a `parser_constructor`,
+an application declares them by name and module:
+
+    >>> COMMANDS = [
+    ...     Command('version', 'myapp.cmd.version', help='print the version'),
+    ...     Command('serve', 'myapp.cmd.serve'),
+    ... ]
+    >>> main(..., commands=COMMANDS)
+
+Each module has a `setup_parser(parser)` function that adds the arguments
+of the command and a `run(args, logger)` function that is called by
+:func:`appupup.main.main` (the names can be changed in the declaration).
+
+The parser knows the names of the commands from the declarations, so
+`--help` and dispatching do not import anything. Once the command is
+known, only its module is imported and its arguments are added.
+The help text of the commands that do not declare one is the first line
+of the docstring of the module; it is read once and kept in an index file
+(in the user data directory) that is rebuilt when the version of
+the application or the list of commands changes.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger('appupup')
+
+
+class Command(object):
+    """
+    The declaration of a subcommand.
+
+    Arguments:
+        name (str):
+            The name used at the command line.
+        module (str):
+            The module that implements the command.
+        help (str):
+            A short description; by default the first line of
+            the docstring of the module.
+        setup (str):
+            The function in the module that receives the parser of
+            the command and adds its arguments; it may be missing.
+        func (str):
+            The function in the module that runs the command.
+    """
+    __slots__ = ('name', 'module', 'help', 'setup', 'func')
+
+    def __init__(self, name, module, help=None, setup='setup_parser',
+                 func='run'):
+        self.name = name
+        self.module = module
+        self.help = help
+        self.setup = setup
+        self.func = func
+
+    def __repr__(self):
+        return 'Command(%r, %r)' % (self.name, self.module)
+
+
+def module_help(module):
+    """ The first line of the docstring of a module. """
+    for line in (module.__doc__ or '').splitlines():
+        line = line.strip()
+        if line:
+            return line
+    return None
+
+
+class CommandIndex(object):
+    """
+    Keeps the help text of the commands in a JSON file.
+
+    Arguments:
+        path:
+            The file; None keeps nothing on disk.
+        key:
+            Identifies the application and its commands; the index is
+            discarded if it was saved with another key.
+    """
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.helps = None
+        self.dirty = False
+
+    def load(self):
+        """ Reads the file; returns a dictionary of help texts. """
+        if self.helps is None:
+            self.helps = {}
+            if self.path is not None:
+                try:
+                    with open(self.path, 'r') as f:
+                        content = json.load(f)
+                    if content.get('key') == self.key:
+                        self.helps = content['helps']
+                except (OSError, ValueError, KeyError, AttributeError):
+                    pass
+        return self.helps
+
+    def save(self):
+        """ Writes the file. """
+        if self.path is None:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+            temp = '%s.%d.tmp' % (self.path, os.getpid())
+            with open(temp, 'w') as f:
+                json.dump({'key': self.key, 'helps': self.helps}, f)
+            os.replace(temp, self.path)
+            self.dirty = False
+        except OSError as e:
+            logger.debug("Could not save the command index %s: %s",
+                         self.path, e)
+
+
+class LazyCommands(object):
+    """
+    Adds declared commands to a parser and loads the one that is used.
+
+    Arguments:
+        commands:
+            A list of :class:`Command`.
+        index_path:
+            The file that keeps the help texts; None to not keep them.
+        version:
+            The version of the application; part of the key of the index.
+    """
+    def __init__(self, commands, index_path=None, version=None):
+        self.commands = dict((command.name, command) for command in commands)
+        self.order = [command.name for command in commands]
+        self.parsers = {}
+        self.loaded = set()
+        key = [version, [[c.name, c.module] for c in commands]]
+        self.index = CommandIndex(index_path, key)
+
+    def help_for(self, command):
+        """ The help text of a command, importing its module if needed. """
+        if command.help is not None:
+            return command.help
+        helps = self.index.load()
+        try:
+            return helps[command.name]
+        except KeyError:
+            pass
+        text = module_help(importlib.import_module(command.module))
+        helps[command.name] = text
+        self.index.dirty = True
+        return text
+
+    def install(self, parser):
+        """ Adds a sub-parser without arguments for each command. """
+        subparsers = parser.add_subparsers(
+            dest='command', metavar='command',
+            parser_class=argparse.ArgumentParser)
+        for name in self.order:
+            self.parsers[name] = subparsers.add_parser(
+                name, help=self.help_for(self.commands[name]),
+                add_help=False)
+        if self.index.dirty:
+            self.index.save()
+        return subparsers
+
+    def load(self, name):
+        """ Imports the module of a command and builds its arguments. """
+        if name in self.loaded:
+            return
+        self.loaded.add(name)
+        command = self.commands[name]
+        module = importlib.import_module(command.module)
+        parser = self.parsers[name]
+        parser.add_argument(
+            '-h', '--help', action='help', default=argparse.SUPPRESS,
+            help='show this help message and exit')
+        if parser.description is None:
+            parser.description = self.help_for(command)
+        setup = getattr(module, command.setup, None)
+        if setup is not None:
+            setup(parser)
+        parser.set_defaults(func=getattr(module, command.func))
+
+
+class LazyCommandParser(argparse.ArgumentParser):
+    """
+    A parser that loads the command that is used before parsing.
+
+    The command is found by looking at the arguments (the values of
+    the options are skipped), so no action runs before the command is
+    loaded and the arguments are parsed.
+
+    Attributes:
+        lazy_commands (LazyCommands):
+            The commands; set by :meth:`add_lazy_commands`.
+    """
+    lazy_commands = None
+
+    def add_lazy_commands(self, commands, index_path=None, version=None):
+        """ Declares the commands (a list of :class:`Command`). """
+        self.lazy_commands = LazyCommands(
+            commands, index_path=index_path, version=version)
+        return self.lazy_commands.install(self)
+
+    def option_action(self, arg):
+        """ The action of an option, also if it is abbreviated. """
+        action = self._option_string_actions.get(arg)
+        if action is None and self.allow_abbrev and arg.startswith('--'):
+            actions = set(
+                action for option, action in
+                self._option_string_actions.items()
+                if option.startswith(arg))
+            if len(actions) == 1:
+                action = actions.pop()
+        return action
+
+    def find_command(self, args):
+        """ The name of the command in the arguments, or None. """
+        commands = self.lazy_commands.commands
+        skip = 0
+        options = True
+        for arg in args:
+            if skip:
+                skip = skip - 1
+                continue
+            if options and arg == '--':
+                options = False
+                continue
+            if options and arg.startswith('-') and len(arg) > 1:
+                if '=' in arg:
+                    continue
+                action = self.option_action(arg)
+                if action is None:
+                    continue
+                if action.nargs is None or action.nargs == '+':
+                    skip = 1
+                elif isinstance(action.nargs, int):
+                    skip = action.nargs
+                continue
+            if arg in commands:
+                return arg
+        return None
+
+    def parse_known_args(self, args=None, namespace=None):
+        if self.lazy_commands is not None:
+            args = sys.argv[1:] if args is None else list(args)
+            name = self.find_command(args)
+            if name is not None:
+                self.lazy_commands.load(name)
+        return super(LazyCommandParser, self).parse_known_args(
+            args, namespace)
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Shell completion that does not run the application.
+
+The options, subcommands, choices and file arguments of the parser are
+exported to a spec file in the user data directory; the completion
+function of the shell reads that file, so pressing TAB does not start
+Python. Enable it with:
+
+    eval "$(myapp --completion-script bash)"
+
+(zsh can use the same script after `autoload bashcompinit && bashcompinit`).
+
+The first TAB writes the spec by running `myapp --completion-spec`.
+The spec records the version of the application and it is rewritten by
+:func:`appupup.parse_args.make_argument_parser` when the application runs
+with another version. An empty stamp file next to the spec
+(`completion.spec.v1.2.0`) tells that it is current, so a normal run only
+checks that this file exists. Subcommands declared with
+:class:`appupup.commands.Command` are all imported when the spec is
+written.
+
+The spec has a header line and a line for each word:
+
+    <subcommand path>\\t<kind>\\t<word>\\t<argument>
+
+where the kind is `opt` (an option without a value), `val` (an option
+with a value), `cmd` (a subcommand) or `pos` (a positional argument).
+The argument lists the choices of the value separated by spaces,
+`@file` or `@dir`.
+
+The kind of value of an argument is guessed from its type
+(`argparse.FileType`), choices and metavar (`file`, `directory`); set
+the `completion` attribute of the action to override it:
+
+    >>> parser.add_argument('--input').completion = '@file'
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import os
+import re
+
+SPEC_HEADER = '#appupup-completion'
+SPEC_FORMAT = 1
+
+# Metavars that stand for a file or a directory.
+FILE_METAVARS = ('file', 'path')
+DIR_METAVARS = ('directory', 'dir')
+
+BASH_SCRIPT = r'''# bash completion for @PROG@ (generated by appupup)
+_appupup_complete_@IDENT@() {
+    local cache='@CACHE@'
+    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]}
+    local path='' words='' files='' line rest kind word arg i
+    local -a lines
+    if [[ ! -r $cache ]]; then
+        "${COMP_WORDS[0]}" --completion-spec >/dev/null 2>&1 || return 0
+    fi
+    mapfile -t lines < "$cache"
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        for line in "${lines[@]}"; do
+            if [[ $line == "$path"$'\tcmd\t'"${COMP_WORDS[i]}"$'\t'* ]]; then
+                path=${path:+$path }${COMP_WORDS[i]}
+                break
+            fi
+        done
+    done
+    for line in "${lines[@]}"; do
+        [[ $line == "$path"$'\t'* ]] || continue
+        rest=${line#"$path"$'\t'}
+        kind=${rest%%$'\t'*}
+        rest=${rest#*$'\t'}
+        word=${rest%%$'\t'*}
+        arg=${rest#*$'\t'}
+        case $kind in
+            val)
+                if [[ $word == "$prev" ]]; then
+                    case $arg in
+                        @file) COMPREPLY=($(compgen -f -- "$cur")) ;;
+                        @dir) COMPREPLY=($(compgen -d -- "$cur")) ;;
+                        *) COMPREPLY=($(compgen -W "$arg" -- "$cur")) ;;
+                    esac
+                    return 0
+                fi
+                [[ $cur == -* ]] && words+=" $word" ;;
+            opt)
+                [[ $cur == -* ]] && words+=" $word" ;;
+            cmd)
+                [[ $cur == -* ]] || words+=" $word" ;;
+            pos)
+                [[ $cur == -* ]] && continue
+                case $arg in
+                    @file) files=-f ;;
+                    @dir) files=${files:--d} ;;
+                    *) words+=" $arg" ;;
+                esac ;;
+        esac
+    done
+    COMPREPLY=($(compgen -W "$words" -- "$cur"))
+    if [[ -n $files ]]; then
+        COMPREPLY+=($(compgen $files -- "$cur"))
+    fi
+    return 0
+}
+complete -o filenames -F _appupup_complete_@IDENT@ @PROG@
+'''
+
+SHELLS = ('bash', )
+
+
+def value_kind(action):
+    """
+    What the value of an argument can be.
+
+    Returns:
+        `@file`, `@dir`, a string with the choices separated by spaces or
+        an empty string if the value can not be completed.
+    """
+    completion = getattr(action, 'completion', None)
+    if completion is not None:
+        return completion
+    if isinstance(action.type, argparse.FileType):
+        return '@file'
+    if action.choices:
+        return ' '.join(str(choice).replace('\t', ' ').replace('\n', ' ')
+                        for choice in action.choices)
+    metavar = action.metavar
+    if isinstance(metavar, str):
+        if metavar.lower() in FILE_METAVARS:
+            return '@file'
+        if metavar.lower() in DIR_METAVARS:
+            return '@dir'
+    return ''
+
+
+def completion_spec(parser, path=''):
+    """
+    The words that complete the arguments of a parser.
+
+    Arguments:
+        parser:
+            The parser.
+        path:
+            The names of the subcommands that lead to the parser,
+            separated by spaces.
+
+    Returns:
+        A list of (path, kind, word, argument) tuples.
+    """
+    lazy_commands = getattr(parser, 'lazy_commands', None)
+    if lazy_commands is not None:
+        for name in lazy_commands.order:
+            lazy_commands.load(name)
+
+    entries = []
+    for action in parser._actions:
+        if action.help == argparse.SUPPRESS:
+            continue
+        if isinstance(action, argparse._SubParsersAction):
+            for name, subparser in action.choices.items():
+                entries.append((path, 'cmd', name, ''))
+                entries.extend(completion_spec(
+                    subparser, ('%s %s' % (path, name)).strip()))
+        elif action.option_strings:
+            kind = 'opt' if action.nargs == 0 else 'val'
+            arg = '' if kind == 'opt' else value_kind(action)
+            for option in action.option_strings:
+                entries.append((path, kind, option, arg))
+        else:
+            entries.append((path, 'pos', action.dest, value_kind(action)))
+    return entries
+
+
+def spec_version(path):
+    """
+    The version of the application recorded in a spec.
+
+    Returns:
+        None if there is no spec and an empty string if it was written
+        in another format.
+    """
+    try:
+        with open(path, 'r') as f:
+            header = f.readline().rstrip('\n').split('\t')
+    except OSError:
+        return None
+    if len(header) != 3 or header[0] != SPEC_HEADER or \
+            header[1] != str(SPEC_FORMAT):
+        return ''
+    return header[2]
+
+
+def spec_stamp(path, version):
+    """ The file that tells that the spec was written by a version. """
+    return '%s.v%s' % (path, re.sub(r'[^\w.+-]', '_', str(version)))
+
+
+def _write_stamp(path, version):
+    """ Replaces the stamps of the spec with the one of a version. """
+    stamp = spec_stamp(path, version)
+    directory, name = os.path.split(path)
+    for entry in os.listdir(directory or '.'):
+        if entry.startswith(name + '.v') and \
+                os.path.join(directory, entry) != stamp:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+    open(stamp, 'w').close()
+
+
+def write_spec(path, parser, version):
+    """ Saves the spec of a parser. """
+    lines = ['%s\t%d\t%s' % (SPEC_HEADER, SPEC_FORMAT, version)]
+    lines.extend('\t'.join(entry) for entry in completion_spec(parser))
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp, path)
+    _write_stamp(path, version)
+
+
+def refresh_spec(path, parser, version):
+    """
+    Rewrites the spec if it was written by another version.
+
+    A missing spec is not created (completion may not be in use). When
+    the stamp of the version exists the spec is not read.
+
+    Returns:
+        True if the spec was written.
+    """
+    if os.path.exists(spec_stamp(path, version)):
+        return False
+    current = spec_version(path)
+    if current is None:
+        return False
+    try:
+        if current == str(version):
+            _write_stamp(path, version)
+            return False
+        write_spec(path, parser, version)
+    except OSError:
+        return False
+    return True
+
+
+def completion_script(shell, prog, path):
+    """ The script that enables the completion of a program. """
+    if shell not in SHELLS:
+        raise ValueError("Unsupported shell %r" % shell)
+    return BASH_SCRIPT.replace(
+        '@PROG@', prog).replace(
+        '@IDENT@', re.sub(r'\W', '_', prog)).replace(
+        '@CACHE@', path.replace("'", "'\\''"))
+
+
+class CompletionScriptAction(argparse.Action):
+    """ Prints the completion script and exits. """
+    def __init__(self, option_strings, dest, spec_path=None, **kwargs):
+        super(CompletionScriptAction, self).__init__(
+            option_strings, dest, **kwargs)
+        self.spec_path = spec_path
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(completion_script(values, parser.prog, self.spec_path), end='')
+        parser.exit()
+
+
+class CompletionSpecAction(argparse.Action):
+    """ Writes the completion spec and exits. """
+    def __init__(self, option_strings, dest, spec_path=None,
+                 version=None, **kwargs):
+        super(CompletionSpecAction, self).__init__(
+            option_strings, dest, nargs=0, **kwargs)
+        self.spec_path = spec_path
+        self.version = version
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        write_spec(self.spec_path, parser, self.version)
+        parser.exit()
+
+
+def add_completion_arguments(parser, spec_path, version):
+    """
+    Adds --completion-script and --completion-spec to a parser.
+
+    Arguments:
+        parser:
+            The top level parser.
+        spec_path:
+            Where the spec is saved.
+        version:
+            The version of the application.
+    """
+    parser.add_argument(
+        '--completion-script', choices=SHELLS, default=argparse.SUPPRESS,
+        action=CompletionScriptAction, spec_path=spec_path,
+        help='print the shell completion script and exit; e.g. '
+             'eval "$(%(prog)s --completion-script bash)"')
+    parser.add_argument(
+        '--completion-spec', default=argparse.SUPPRESS,
+        action=CompletionSpecAction, spec_path=spec_path, version=version,
+        help=argparse.SUPPRESS)
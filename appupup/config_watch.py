@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Reloads the config file of a running application when it changes.
+
+A :class:`ConfigWatcher` waits for changes of the config file and of
+the files it includes (with inotify on Linux, by polling elsewhere),
+parses them in a background thread and replaces `args.cfg` with
+the new parser. The callbacks then receive the keys that changed.
+
+Readers do not need a lock: the parser in `args.cfg` is never modified
+once published; a reload builds a new one and swaps the attribute, which
+is atomic. Code that reads several values that belong together should
+take the parser once:
+
+    >>> cfg = args.cfg
+    >>> host, port = cfg['server']['host'], cfg['server']['port']
+
+If the new content can not be parsed the error is logged and the current
+parser is kept.
+
+:func:`appupup.main.main` starts a watcher with `--watch-config`; it also
+applies changes of the `level` in the `[log]` section (unless the level
+was given at the command line) and of the `[loggers]` section.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import select
+import struct
+import threading
+
+from appupup.configure import file_signature, read_config
+
+logger = logging.getLogger('appupup')
+
+# Events of a watched directory that may change the config.
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+            _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+_EVENT = struct.Struct('iIII')
+
+
+def config_values(cfg):
+    """ The values of a config parser as a {(section, key): value} map. """
+    values = {}
+    if cfg is None:
+        return values
+    for key, value in cfg.defaults().items():
+        values[(cfg.default_section, key)] = value
+    for section in cfg.sections():
+        for key, value in cfg.items(section, raw=True):
+            values[(section, key)] = value
+    return values
+
+
+def config_diff(old, new):
+    """
+    The keys that differ between two config parsers.
+
+    Returns:
+        A dictionary that maps (section, key) to a tuple with the old and
+        the new value; a missing key has the value None.
+    """
+    old_values = config_values(old)
+    new_values = config_values(new)
+    changes = {}
+    for name in set(old_values) | set(new_values):
+        before = old_values.get(name)
+        after = new_values.get(name)
+        if before != after:
+            changes[name] = (before, after)
+    return changes
+
+
+class Inotify(object):
+    """
+    Waits for changes in some directories with the inotify API.
+
+    A pipe is watched too, so :meth:`wake` can end a wait early.
+
+    Raises:
+        OSError:
+            If inotify is not available.
+    """
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("The C library was not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wake_fd, self.waker = os.pipe()
+        os.set_blocking(self.wake_fd, False)
+        self.watches = {}
+
+    def watch(self, directories):
+        """ Replaces the watched directories. """
+        directories = set(directories)
+        for directory in set(self.watches) - directories:
+            self.libc.inotify_rm_watch(self.fd, self.watches.pop(directory))
+        for directory in directories - set(self.watches):
+            descriptor = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), _IN_MASK)
+            if descriptor >= 0:
+                self.watches[directory] = descriptor
+
+    def wait(self, timeout):
+        """ Waits for events; tells if there were any. """
+        readable, _, _ = select.select(
+            [self.fd, self.wake_fd], [], [], timeout)
+        if self.wake_fd in readable:
+            try:
+                os.read(self.wake_fd, 64)
+            except BlockingIOError:
+                pass
+        if self.fd not in readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * _EVENT.size):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def wake(self):
+        """ Ends the current (or the next) wait. """
+        os.write(self.waker, b'x')
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            os.close(self.wake_fd)
+            os.close(self.waker)
+            self.fd = -1
+
+
+class ConfigWatcher(object):
+    """
+    Replaces `args.cfg` when the config file changes.
+
+    Arguments:
+        args:
+            Arguments returned by the parser; `args.config_file` is watched
+            and `args.cfg` is replaced.
+        interval (float):
+            How often to look at the files (in seconds) when inotify is not
+            used; with inotify, the longest wait for an event.
+        settle (float):
+            The time to wait after a change before reading the files, so
+            that an editor can finish writing them.
+        use_inotify (bool):
+            Use inotify if available.
+
+    The callbacks should be added before :meth:`start`, as the thread
+    reloads the config as soon as it starts.
+
+    Attributes:
+        reloads (int):
+            The number of times `args.cfg` was replaced.
+        inotify (Inotify):
+            None if the files are polled.
+    """
+    def __init__(self, args, interval=1.0, settle=0.05, use_inotify=True):
+        self.args = args
+        self.path = args.config_file
+        self.interval = interval
+        self.settle = settle
+        self.use_inotify = use_inotify
+        self.callbacks = []
+        self.dependencies = [(os.path.abspath(self.path),
+                              file_signature(self.path))]
+        self.reloads = 0
+        self.inotify = None
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """
+        Calls a function after each reload.
+
+        The function receives the changes (see :func:`config_diff`),
+        the old and the new parser. It runs in the thread of the watcher;
+        exceptions are logged.
+        """
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def changed(self):
+        """ Tells if any of the files changed since the last reload. """
+        return any(file_signature(path) != signature
+                   for path, signature in self.dependencies)
+
+    def reload(self):
+        """
+        Reads the config file and replaces `args.cfg`.
+
+        Returns:
+            The changes (see :func:`config_diff`); None if the file could
+            not be read.
+        """
+        with self.lock:
+            try:
+                new, dependencies = read_config(self.path)
+            except Exception as e:
+                logger.error("Could not reload the config file %s: %s",
+                             self.path, e)
+                self.dependencies = [
+                    (path, file_signature(path))
+                    for path, _ in self.dependencies]
+                return None
+            self.dependencies = dependencies
+            old = getattr(self.args, 'cfg', None)
+            changes = config_diff(old, new)
+            if not changes:
+                return changes
+            self.args.cfg = new
+            self.reloads += 1
+            logger.info("The config file %s was reloaded (%d changes)",
+                        self.path, len(changes))
+            for callback in list(self.callbacks):
+                try:
+                    callback(changes, old, new)
+                except Exception:
+                    logger.exception("Config reload callback %r failed",
+                                     callback)
+            return changes
+
+    def check(self):
+        """ Reloads the config file if it changed; returns the changes. """
+        if self.changed():
+            if self.settle:
+                self.stopping.wait(self.settle)
+            return self.reload()
+        return None
+
+    def directories(self):
+        """ The directories where a change may affect the config. """
+        result = set()
+        for path, _ in self.dependencies:
+            directory = path if os.path.isdir(path) else os.path.dirname(path)
+            if os.path.isdir(directory):
+                result.add(directory)
+        return result
+
+    def start(self):
+        """ Starts watching in a background thread. """
+        if self.use_inotify and self.inotify is None:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                logger.debug("Polling the config file (%s)", e)
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='config-watch')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the background thread. """
+        self.stopping.set()
+        if self.inotify is not None:
+            self.inotify.wake()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def _run(self):
+        """ Runs in the background thread. """
+        # Find the included files (and anything that changed since
+        # the config was loaded by main()).
+        self.reload()
+        while not self.stopping.is_set():
+            if self.inotify is not None:
+                self.inotify.watch(self.directories())
+                self.inotify.wait(self.interval)
+            elif self.stopping.wait(self.interval):
+                break
+            if not self.stopping.is_set():
+                self.check()
+
+
+def log_level_callback(args):
+    """
+    A callback that applies the changes of the logging levels.
+
+    The `level` in the `[log]` section changes the level of the handlers
+    installed by :func:`appupup.log.setup_logging` unless the level was
+    given at the command line; the `[loggers]` section changes the levels
+    of the loggers (a logger that is removed from it gets
+    the level of its parent).
+    """
+    from appupup.log import (
+        config_log_level, config_logger_levels, set_log_level)
+
+    def apply(changes, old, new):
+        if not getattr(args, 'log_level_fixed', False) and \
+                ('log', 'level') in changes:
+            level = config_log_level(new, logging.INFO)
+            set_log_level(args, level)
+            logger.info("The log level is now %s",
+                        logging.getLevelName(level))
+        if any(section == 'loggers' for section, _ in changes):
+            before = config_logger_levels(old)
+            after = config_logger_levels(new)
+            for name in set(before) - set(after):
+                logging.getLogger(name).setLevel(logging.NOTSET)
+            for name, level in after.items():
+                if before.get(name) != level:
+                    logging.getLogger(name).setLevel(level)
+
+    return apply
+
+
+def settings_callback(args, settings):
+    """
+    A callback that resolves the settings again after a reload.
+
+    Arguments:
+        args:
+            Arguments returned by the parser; `args.settings` is replaced.
+        settings:
+            The :class:`appupup.arg_conf.Settings`; if the new config has
+            invalid settings the error is logged and the old ones are kept.
+    """
+    from appupup.arg_conf import SettingsError
+
+    def apply(changes, old, new):
+        try:
+            args.settings = settings.resolve(args, cfg=new)
+        except SettingsError as e:
+            logger.error("The settings were not changed: %s", e)
+
+    return apply
+
+
+def watch_config(args, interval=1.0, use_inotify=True, callbacks=()):
+    """
+    Starts a watcher that also applies the changes of the log levels.
+
+    The watcher is stored in `args.config_watcher`; stop it with
+    :meth:`ConfigWatcher.stop`. Other `callbacks` are added before
+    the watcher starts, so they see the first reload.
+    """
+    watcher = ConfigWatcher(args, interval=interval, use_inotify=use_inotify)
+    watcher.add_callback(log_level_callback(args))
+    for callback in callbacks:
+        watcher.add_callback(callback)
+    args.config_watcher = watcher
+    watcher.start()
+    return watcher
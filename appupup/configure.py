@@ -1,17 +1,18 @@
 # -*- coding: utf-8 -*-
 """
+Locates and reads the config file of the application.
 """
 from __future__ import unicode_literals
 from __future__ import print_function
 
 import logging
 import os
-from appdirs import user_config_dir
+import sys
 
 logger = logging.getLogger('appupup')
 
 
-def get_config_file(app_name, app_author, args=None):
+def get_config_file(app_name, app_author, args=None, create=True):
     """
     Get the path to config file.
 
@@ -26,11 +27,206 @@ def get_config_file(app_name, app_author, args=None):
             The author of the application.
         args:
             Parsed arguments.
+        create:
+            Create the directory of the file if it does not exist.
     """
     if args is not None:
         if len(args.config) > 0 and args.config != '-':
             return args.config
+    from appdirs import user_config_dir
     ucd = user_config_dir(app_name, app_author)
-    if not os.path.isdir(ucd):
+    if create and not os.path.isdir(ucd):
         os.makedirs(ucd)
     return os.path.join(ucd, '%s.cfg' % app_name)
+
+
+# The section whose values are the paths of other config files.
+INCLUDE_SECTION = 'include'
+
+# Changes when the layout of the cache files changes.
+CACHE_FORMAT = 1
+
+
+def file_signature(path):
+    """ The modification time and size of a file; None if it is missing. """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _included_paths(parser, base_dir):
+    """ Removes the include section and returns the paths in it. """
+    if not parser.has_section(INCLUDE_SECTION):
+        return []
+    defaults = parser.defaults()
+    values = [parser.get(INCLUDE_SECTION, key, raw=True)
+              for key in parser.options(INCLUDE_SECTION)
+              if key not in defaults]
+    parser.remove_section(INCLUDE_SECTION)
+    return [os.path.join(base_dir, os.path.expanduser(value.strip()))
+            for value in values if value and value.strip()]
+
+
+def read_config(path, parser=None):
+    """
+    Reads a config file and the files it includes.
+
+    A file includes others by listing their paths (relative to its own
+    directory; wildcards are allowed) in the `[include]` section:
+
+        [include]
+        common = common.cfg
+        local = conf.d/*.cfg
+
+    The included files are read after the file that includes them, so
+    their values take precedence; a file is only read once. Missing files
+    are ignored.
+
+    Arguments:
+        path:
+            The config file.
+        parser:
+            The parser to read into; a new ConfigParser by default.
+
+    Returns:
+        The parser and a list of (path, signature) tuples with
+        the files and directories the content depends on.
+    """
+    import configparser
+    import glob
+
+    if parser is None:
+        parser = configparser.ConfigParser()
+    dependencies = []
+    seen = set()
+    pending = [os.path.abspath(path)]
+    while pending:
+        current = pending.pop(0)
+        if current in seen:
+            continue
+        seen.add(current)
+        dependencies.append((current, file_signature(current)))
+        if not parser.read(current):
+            continue
+        included = []
+        for pattern in _included_paths(parser, os.path.dirname(current)):
+            if glob.has_magic(pattern):
+                directory = os.path.dirname(pattern)
+                dependencies.append((directory, file_signature(directory)))
+                included.extend(sorted(glob.glob(pattern)))
+            else:
+                included.append(pattern)
+        pending[0:0] = included
+    return parser, dependencies
+
+
+class _LazyProxies(dict):
+    """ Creates the section proxies of a parser when they are used. """
+    def __init__(self, parser):
+        super(_LazyProxies, self).__init__()
+        self.parser = parser
+
+    def __missing__(self, key):
+        from configparser import SectionProxy
+        proxy = self[key] = SectionProxy(self.parser, key)
+        return proxy
+
+    def __delitem__(self, key):
+        self.pop(key, None)
+
+
+def cache_file(cache_dir, path):
+    """ The file that caches a config file. """
+    import hashlib
+    digest = hashlib.sha1(
+        os.path.abspath(path).encode('utf-8', 'surrogateescape'))
+    return os.path.join(cache_dir, '%s.bin' % digest.hexdigest()[:24])
+
+
+def _cache_header(path, dependencies):
+    return (CACHE_FORMAT, sys.hexversion, os.path.abspath(path),
+            dependencies)
+
+
+def _load_cached(cache_path, path):
+    """ The parser saved in a cache file if it is still valid, or None. """
+    import configparser
+    import marshal
+    try:
+        with open(cache_path, 'rb') as f:
+            size = int.from_bytes(f.read(4), 'big')
+            header = marshal.loads(f.read(size))
+            if header[:3] != _cache_header(path, None)[:3]:
+                return None
+            for dependency, signature in header[3]:
+                if file_signature(dependency) != \
+                        (tuple(signature) if signature else None):
+                    return None
+            defaults, sections = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        return None
+    parser = configparser.ConfigParser()
+    parser._defaults.update(defaults)
+    parser._sections = sections
+    proxies = _LazyProxies(parser)
+    proxies[parser.default_section] = \
+        parser._proxies[parser.default_section]
+    parser._proxies = proxies
+    return parser
+
+
+def _save_cached(cache_path, path, parser, dependencies):
+    """ Saves a parser in a cache file. """
+    import marshal
+    try:
+        directory = os.path.dirname(cache_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        temp = '%s.%d.tmp' % (cache_path, os.getpid())
+        header = marshal.dumps(_cache_header(path, dependencies))
+        with open(temp, 'wb') as f:
+            # marshal.load() is slow with files, so the header has its size.
+            f.write(len(header).to_bytes(4, 'big'))
+            f.write(header)
+            marshal.dump((dict(parser._defaults),
+                          dict((name, dict(values)) for name, values
+                               in parser._sections.items())), f)
+        os.replace(temp, cache_path)
+    except (OSError, ValueError) as e:
+        logger.debug("Could not cache the config file %s: %s", path, e)
+
+
+def load_config(path, cache_dir=None):
+    """
+    Reads a config file (see :func:`read_config`) using a cache.
+
+    The sections of the file and of the files it includes are saved in
+    a binary file in `cache_dir`, together with the modification time
+    and size of each file. The next time the file is loaded from
+    the cache if none of them changed, which is much faster than parsing
+    large files. Nothing is cached for missing files.
+
+    Arguments:
+        path:
+            The config file; an empty string or `-` for no file.
+        cache_dir:
+            The directory of the cache files; None to not use a cache.
+
+    Returns:
+        A ConfigParser.
+    """
+    import configparser
+    if not path or path == '-':
+        return configparser.ConfigParser()
+    if cache_dir is None:
+        return read_config(path)[0]
+
+    cache_path = cache_file(cache_dir, path)
+    parser = _load_cached(cache_path, path)
+    if parser is None:
+        parser, dependencies = read_config(path)
+        if dependencies[0][1] is not None:
+            _save_cached(cache_path, path, parser, dependencies)
+    return parser
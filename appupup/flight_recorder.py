@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Keeps the most recent records in a memory-mapped file.
+
+The kernel writes the pages of a shared memory map to the file even if
+the process is killed or crashes, so the last records before the death of
+a worker can be recovered without writing all of them to the log file
+synchronously.
+
+The file starts with a header followed by a ring of fixed-size slots.
+Each slot holds one record: its sequence number, the length and
+the CRC32 of the text, and the text (UTF-8, truncated to fit the slot).
+A slot whose CRC does not match was being written when the process died
+and is ignored by the reader.
+
+The file is removed when the handler is closed, which happens at normal
+exit, so the files that are left behind belong to processes that died.
+
+A process forked by the owner of the handler does not write in
+the parent's ring: it opens a ring of its own (the name gets the pid of
+the child) when it logs the first record, so the children that replace
+their handlers (e.g. with :func:`appupup.log_mp.init_worker`) do not
+create a file.
+Decode them with:
+
+    python -m appupup.flight_recorder <file or directory>
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import weakref
+from zlib import crc32
+
+# magic, version, slot size, slot count, process id, creation time
+HEADER = struct.Struct('<8sIIIId')
+HEADER_SIZE = 64
+MAGIC = b'APPUPFR\x00'
+VERSION = 1
+
+# sequence number, length, crc32
+SLOT = struct.Struct('<QII')
+
+# The extension of the files.
+SUFFIX = '.ring'
+
+
+class FlightRecorderHandler(logging.Handler):
+    """
+    Writes the records to a ring of slots in a memory-mapped file.
+
+    Arguments:
+        path:
+            The file; it is created or overwritten.
+        size (int):
+            The size of the file in bytes.
+        slot_size (int):
+            The size of a slot; longer records are truncated.
+        level:
+            The level of the handler.
+        keep (bool):
+            Keep the file when the handler is closed.
+    """
+    def __init__(self, path, size=4 * 1024 * 1024, slot_size=512,
+                 level=logging.NOTSET, keep=False):
+        super(FlightRecorderHandler, self).__init__(level)
+        if slot_size <= SLOT.size:
+            raise ValueError("slot_size should be larger than %d" % SLOT.size)
+        self.path = path
+        self.keep = keep
+        self.slot_size = slot_size
+        self.payload_size = slot_size - SLOT.size
+        self.slot_count = max(1, (size - HEADER_SIZE) // slot_size)
+        self.map = None
+        self.forked = False
+        self._open()
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _after_fork(ref))
+
+    def _open(self):
+        """ Creates the file and maps it. """
+        self.sequence = 0
+        size = HEADER_SIZE + self.slot_count * self.slot_size
+        with open(self.path, 'w+b') as f:
+            f.truncate(size)
+            self.map = mmap.mmap(f.fileno(), size)
+        HEADER.pack_into(
+            self.map, 0, MAGIC, VERSION, self.slot_size, self.slot_count,
+            os.getpid(), time.time())
+
+    def detach(self):
+        """
+        Stops writing in the ring of the parent; called in a forked child.
+
+        The ring of the child is created by the next record.
+        """
+        if self.map is None:
+            return
+        self.map.close()
+        self.map = None
+        self.path = child_path(self.path, os.getpid())
+        self.forked = True
+
+    def emit(self, record):
+        try:
+            if self.map is None:
+                if not self.forked:
+                    return
+                self.forked = False
+                self._open()
+            data = self.format(record).encode('utf-8', 'replace')
+            data = data[:self.payload_size]
+            self.sequence = sequence = self.sequence + 1
+            offset = HEADER_SIZE + \
+                (sequence % self.slot_count) * self.slot_size
+            start = offset + SLOT.size
+            self.map[start:start + len(data)] = data
+            SLOT.pack_into(self.map, offset, sequence, len(data), crc32(data))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            self.forked = False
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+                if not self.keep:
+                    try:
+                        os.remove(self.path)
+                    except OSError:
+                        pass
+        finally:
+            self.release()
+        super(FlightRecorderHandler, self).close()
+
+
+def _after_fork(ref):
+    handler = ref()
+    if handler is not None:
+        handler.detach()
+
+
+def child_path(path, pid):
+    """
+    The file of a forked child.
+
+    The pid of the parent in the name (as set by
+    :func:`flight_recorder_path`) is replaced by the pid of the child;
+    in other names the pid of the child is added before the extension.
+    """
+    root, extension = os.path.splitext(path)
+    head, _, tail = root.rpartition('-')
+    if head and tail.isdigit():
+        root = head
+    return '%s-%d%s' % (root, pid, extension)
+
+
+def read_flight_recorder(path):
+    """
+    Decodes the records in a flight recorder file.
+
+    Returns:
+        A dictionary with the `pid` and `created` time of the process
+        and the `records` as a list of (sequence number, text) tuples,
+        oldest first.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, slot_size, slot_count, pid, created = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a flight recorder file" % path)
+
+    records = []
+    for index in range(slot_count):
+        offset = HEADER_SIZE + index * slot_size
+        sequence, length, checksum = SLOT.unpack_from(data, offset)
+        if sequence == 0 or length > slot_size - SLOT.size:
+            continue
+        start = offset + SLOT.size
+        payload = data[start:start + length]
+        if crc32(payload) != checksum:
+            continue
+        records.append((sequence, payload.decode('utf-8', 'replace')))
+    records.sort()
+    return {'pid': pid, 'created': created, 'records': records}
+
+
+def flight_recorder_path(directory, app_name):
+    """ The file used by current process. """
+    return os.path.join(
+        directory, '%s-%d%s' % (app_name, os.getpid(), SUFFIX))
+
+
+def main(argv=None):
+    """ Prints the records in flight recorder files. """
+    parser = argparse.ArgumentParser(
+        description='Prints the records kept by the flight recorder.')
+    parser.add_argument(
+        'path', nargs='+',
+        help='a flight recorder file or a directory with such files')
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.path:
+        if os.path.isdir(path):
+            paths.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(SUFFIX)))
+        else:
+            paths.append(path)
+
+    for path in paths:
+        try:
+            content = read_flight_recorder(path)
+        except (OSError, ValueError, struct.error) as e:
+            print("%s: %s" % (path, e), file=sys.stderr)
+            continue
+        print("==> %s (pid %d, started %s) <==" % (
+            path, content['pid'], time.strftime(
+                '%Y-%m-%d %H:%M:%S', time.localtime(content['created']))))
+        for sequence, text in content['records']:
+            print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Formatters used by :func:`appupup.log.setup_logging` and
+:meth:`appupup.log.DebugLogger.install`.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import re
+import time
+from operator import attrgetter
+
+# The encoder picked by default_dumps(); the JSON modules are only
+# imported when the first JsonFormatter is created.
+_default_dumps = None
+
+
+def stdlib_json_dumps(data):
+    """ Compact JSON encoding of a dictionary (using json module). """
+    import json
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def default_dumps():
+    """ The JSON encoder: orjson if it is installed, json otherwise. """
+    global _default_dumps
+    if _default_dumps is None:
+        try:
+            import orjson
+        except ImportError:
+            import json
+            _default_dumps = json.JSONEncoder(
+                ensure_ascii=False, separators=(',', ':')).encode
+        else:
+            def orjson_dumps(data):
+                """ Compact JSON encoding of a dictionary (using orjson). """
+                return orjson.dumps(data).decode('utf-8')
+            _default_dumps = orjson_dumps
+    return _default_dumps
+
+
+def json_dumps(data):
+    """ Compact JSON encoding of a dictionary. """
+    return default_dumps()(data)
+
+
+# The fields and the escaped percent signs in a %-style format.
+_FIELD = re.compile(r'%(?:%|\((\w+)\))')
+
+
+class FastFormatter(logging.Formatter):
+    """
+    A `logging.Formatter` that produces the same text in less time.
+
+    * The date and time (without milliseconds) are only rendered once
+      per second; `time.strftime` has no directive that changes
+      more often than that.
+    * For %-style formats the template is converted at construction
+      to a positional one whose values are read from the record with
+      a single `operator.attrgetter` call.
+    * Whether the format uses the time is only checked once.
+
+    The arguments are those of `logging.Formatter`.
+    """
+    def __init__(self, fmt=None, datefmt=None, style='%', **kwargs):
+        super(FastFormatter, self).__init__(
+            fmt=fmt, datefmt=datefmt, style=style, **kwargs)
+        self.uses_time = self.usesTime()
+        self.time_cache = (None, None, None)
+
+        self.template = None
+        if type(self._style) is logging.PercentStyle:
+            fmt = self._style._fmt
+            names = [name for name in _FIELD.findall(fmt) if name]
+            self.template = _FIELD.sub(
+                lambda match: '%' if match.group(1) else '%%', fmt)
+            if len(names) == 1:
+                name = names[0]
+                self.fields = lambda record: (getattr(record, name), )
+            else:
+                self.fields = attrgetter(*names) if names else tuple
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, cached_format, text = self.time_cache
+        if second != cached_second or datefmt != cached_format:
+            text = time.strftime(
+                datefmt or self.default_time_format,
+                self.converter(record.created))
+            self.time_cache = (second, datefmt, text)
+        if not datefmt and self.default_msec_format:
+            text = self.default_msec_format % (text, record.msecs)
+        return text
+
+    def formatMessage(self, record):
+        if self.template is None:
+            return super(FastFormatter, self).formatMessage(record)
+        try:
+            return self.template % self.fields(record)
+        except AttributeError as e:
+            raise ValueError('Formatting field not found in record: %s' % e)
+
+    def format(self, record):
+        record.message = record.getMessage()
+        if self.uses_time:
+            record.asctime = self.formatTime(record, self.datefmt)
+        s = self.formatMessage(record)
+        if record.exc_info:
+            # Cache the traceback text to avoid converting it multiple times
+            # (it's constant anyway)
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + self.formatStack(record.stack_info)
+        return s
+
+
+class JsonFormatter(FastFormatter):
+    """
+    Formats each record as a compact JSON object on a single line.
+
+    The keys are always present and always in this order: `time`,
+    `level`, `name`, `file`, `line`, `thread`, `function`, `message` and
+    `exception` (null if the record has no exception information).
+
+    The orjson package is used for encoding if it is installed,
+    the json module otherwise. The time is rendered like in
+    :class:`FastFormatter`.
+
+    Arguments:
+        datefmt:
+            The format of the date and time; the milliseconds are appended
+            after a dot. None uses the default format of `logging`, which
+            already has them.
+        dumps:
+            The function that encodes a dictionary; by default the one
+            returned by :func:`default_dumps`.
+    """
+    def __init__(self, datefmt='%Y-%m-%dT%H:%M:%S', dumps=None):
+        super(JsonFormatter, self).__init__(datefmt=datefmt)
+        self.dumps = default_dumps() if dumps is None else dumps
+
+    def formatTime(self, record, datefmt=None):
+        text = super(JsonFormatter, self).formatTime(record, datefmt)
+        if datefmt is None:
+            # The default format already has the milliseconds.
+            return text
+        return '%s.%03d' % (text, record.msecs)
+
+    def format(self, record):
+        record.message = record.getMessage()
+        exception = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            exception = record.exc_text
+        if record.stack_info:
+            exception = (exception + '\n' if exception else '') + \
+                self.formatStack(record.stack_info)
+
+        return self.dumps({
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'name': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'function': record.funcName,
+            'message': record.message,
+            'exception': exception,
+        })
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Hooks that run at fixed points of :func:`appupup.main.main`.
+
+The stages, in order:
+
+- `pre_parse(parser)`: the parser is built but the arguments were not
+  parsed yet; a hook can add arguments;
+- `post_config(args)`: the arguments are parsed and the config file
+  is loaded (`args.cfg`);
+- `post_logging(args)`: logging is ready; `init(args)`, the only hook of
+  older versions, runs here too;
+- `pre_run(args)`: just before the command;
+- `post_run(args, result)`: after the command, with its exit code;
+- `on_exit(args, result)`: always, even if something failed before
+  (`result` is None then).
+
+The extra positional and keyword arguments of `main()` are passed to
+every hook after these.
+
+Hooks come from the `hooks` argument of `main()` (a dictionary of stage
+names to functions or lists of functions) and from the overrides module:
+a python file, usually kept out of version control, that defines
+functions named after the stages. It is `--hook-file` or the first
+`overrides.py` found in the package directory, the current directory or
+`../<package>` (see :func:`find_hook_file`). It is imported before
+the arguments are parsed, through the normal import machinery, so its
+bytecode is cached in `__pycache__`. An error while importing it is
+logged with its traceback (once logging is configured) and
+the application runs without it.
+
+As logging is configured after the module is imported, the levels that
+the module sets on the loggers (e.g. by calling
+:meth:`appupup.log.DebugLogger.install`) are set again once logging is
+ready (see :meth:`HookPipeline.restore_levels`). Handlers that should
+replace the ones of :func:`appupup.log.setup_logging` are installed by
+a `post_logging` hook.
+
+Each hook is timed; the durations are logged at DEBUG level and hooks
+slower than :data:`SLOW_HOOK` seconds produce a warning.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import sys
+import time
+
+from appupup.parse_args import option_from_argv
+
+logger = logging.getLogger('appupup')
+
+HOOK_STAGES = ('pre_parse', 'post_config', 'post_logging', 'pre_run',
+               'post_run', 'on_exit')
+
+# Older names of the stages.
+LEGACY_HOOKS = {'init': 'post_logging'}
+
+# Hooks that take longer than this (in seconds) are reported as warnings.
+SLOW_HOOK = 0.5
+
+# The modules loaded by load_hook_module() in this process and
+# the logger levels they set.
+_loaded_modules = {}
+
+HOOK_OPTION = '--hook-file'
+
+
+def hook_file_from_argv(argv, parser=None):
+    """
+    The value of `--hook-file` in a list of arguments (or None).
+
+    Arguments:
+        argv:
+            The arguments.
+        parser:
+            The parser that will parse them; if given, the abbreviations
+            it accepts (e.g. `--hook-f`) are recognized too.
+    """
+    return option_from_argv(argv, HOOK_OPTION, parser)
+
+
+def find_hook_file(base_package, hook_file=None):
+    """
+    The location of the overrides module.
+
+    The locations are probed each time, so a file that is created or
+    removed while a process is running (e.g. the server of
+    :mod:`appupup.warm`) is seen by the next run.
+
+    Arguments:
+        base_package:
+            The name of the package of the application.
+        hook_file:
+            The file given at the command line; it is used as is.
+
+    Returns:
+        The absolute path of the file or None.
+    """
+    if hook_file is not None:
+        return hook_file
+    for candidate in (os.path.join(base_package, 'overrides.py'),
+                      'overrides.py',
+                      os.path.join(os.pardir, base_package, 'overrides.py')):
+        candidate = os.path.abspath(candidate)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def load_hook_module(path, name='overrides'):
+    """
+    Imports the overrides module.
+
+    The module is loaded with the source file loader, which reads and
+    writes its bytecode in `__pycache__`, and it is kept for the rest of
+    the process as long as the file does not change.
+
+    Raises:
+        Whatever importing the module raises.
+    """
+    return _load_hook_module(path, name)[0]
+
+
+def _logger_levels():
+    """ The levels of the root logger and of the other loggers. """
+    levels = {'': logging.getLogger().level}
+    for name, item in logging.Logger.manager.loggerDict.items():
+        if isinstance(item, logging.Logger):
+            levels[name] = item.level
+    return levels
+
+
+def _load_hook_module(path, name):
+    """
+    Imports the overrides module.
+
+    Returns:
+        The module and a dictionary with the levels of the loggers that
+        were changed when the module was executed (the root logger has
+        the name '').
+    """
+    import importlib.util
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    try:
+        return _loaded_modules[key]
+    except KeyError:
+        pass
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None:
+        raise ImportError("Can not load %s as a module" % path)
+    module = importlib.util.module_from_spec(spec)
+    before = _logger_levels()
+    spec.loader.exec_module(module)
+    levels = dict(
+        (logger_name, level)
+        for logger_name, level in _logger_levels().items()
+        if before.get(logger_name, logging.NOTSET) != level)
+    _loaded_modules[key] = module, levels
+    return module, levels
+
+
+class HookPipeline(object):
+    """
+    The hooks of each stage.
+
+    Arguments:
+        hooks:
+            A dictionary of stage names to a function or a list of
+            functions.
+        slow (float):
+            Hooks slower than this (in seconds) are reported as warnings.
+
+    Attributes:
+        timings (list):
+            (stage, hook name, seconds) for each hook that ran; loading
+            the overrides module is recorded with the stage `load`.
+        errors (list):
+            (path, exc_info) for the modules that could not be loaded and
+            were not reported yet.
+        module:
+            The overrides module, if one was loaded.
+        levels (dict):
+            The levels that the overrides module set on the loggers.
+    """
+    def __init__(self, hooks=None, slow=SLOW_HOOK):
+        self.hooks = dict((stage, []) for stage in HOOK_STAGES)
+        self.slow = slow
+        self.timings = []
+        self.errors = []
+        self.module = None
+        self.levels = {}
+        self.logger = None
+        self.reported = 0
+        for stage, funcs in (hooks or {}).items():
+            if callable(funcs):
+                funcs = [funcs]
+            for func in funcs:
+                self.add(stage, func)
+
+    def add(self, stage, func):
+        """ Adds a hook to a stage. """
+        stage = LEGACY_HOOKS.get(stage, stage)
+        if stage not in self.hooks:
+            raise ValueError("Unknown hook stage %r; expected one of %s" % (
+                stage, ', '.join(HOOK_STAGES)))
+        self.hooks[stage].append(func)
+
+    def add_module(self, module):
+        """ Adds the functions of a module named after the stages. """
+        for name in HOOK_STAGES + tuple(LEGACY_HOOKS):
+            func = getattr(module, name, None)
+            if callable(func):
+                self.add(name, func)
+
+    def load(self, path):
+        """
+        Loads the hooks of an overrides module.
+
+        Errors are logged with their traceback by
+        :meth:`start_reporting`.
+
+        Returns:
+            True if the module was loaded.
+        """
+        start = time.perf_counter()
+        try:
+            module, levels = _load_hook_module(path, 'overrides')
+        except Exception:
+            self.errors.append((path, sys.exc_info()))
+            if self.logger is not None:
+                self._report()
+            return False
+        self.module = module
+        self.levels = levels
+        self.add_module(module)
+        self._timed('load', path, time.perf_counter() - start)
+        return True
+
+    def restore_levels(self):
+        """
+        Sets again the levels that the overrides module set on the loggers.
+
+        :func:`appupup.log.setup_logging` sets the level of the root
+        logger and of the loggers in the config file, which would undo
+        the changes of the module.
+        """
+        for name, level in self.levels.items():
+            logging.getLogger(name).setLevel(level)
+
+    def run(self, stage, *args, **kwargs):
+        """
+        Calls the hooks of a stage.
+
+        Exceptions raised by the hooks are not caught.
+        """
+        for func in self.hooks[stage]:
+            start = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            finally:
+                self._timed(stage, _hook_name(func),
+                            time.perf_counter() - start)
+
+    def _timed(self, stage, name, seconds):
+        self.timings.append((stage, name, seconds))
+        if self.logger is not None:
+            self._report()
+
+    def _report(self):
+        for path, exc_info in self.errors:
+            self.logger.error("The hook file %s could not be loaded", path,
+                              exc_info=exc_info)
+        del self.errors[:]
+        for stage, name, seconds in self.timings[self.reported:]:
+            if seconds >= self.slow:
+                self.logger.warning(
+                    "Hook %s (%s) took %.3f s", name, stage, seconds)
+            else:
+                self.logger.debug(
+                    "Hook %s (%s) took %.3f ms", name, stage, seconds * 1000)
+        self.reported = len(self.timings)
+
+    def start_reporting(self, report_logger):
+        """
+        Logs the timings so far and those of the hooks that run later.
+
+        The hooks that run before logging is configured (and the errors
+        of :meth:`load`) are reported when this is called.
+        """
+        self.logger = report_logger
+        self._report()
+
+
+def _hook_name(func):
+    """ The name of a hook in the log. """
+    module = getattr(func, '__module__', None)
+    name = getattr(func, '__qualname__', None) or repr(func)
+    return '%s.%s' % (module, name) if module else name
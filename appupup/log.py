@@ -6,26 +6,194 @@ from __future__ import print_function
 
 import logging
 import os
-import re
 
+from appupup.arg_conf import parse_size
+from appupup.formatter import FastFormatter, JsonFormatter
+from appupup.log_gate import LevelGate, GATE_RULE_NAMES
+from appupup.log_limit import RateLimiter
+from appupup.log_sample import Sampler
+from appupup.log_rules import (
+    is_pattern_object, compile_rules, RULE_NAMES, ACCEPT, REJECT)
 
-# The Pattern was introduced in python 3.7
-try:
-    _ = re.Pattern
+# Changing these attributes of DebugLogger rebuilds its decision function.
+_RECOMPILE_NAMES = RULE_NAMES | {
+    'lazy_format', 'call_site_cache_size', 'rate_limit', 'rate_limit_burst',
+    'rate_limit_key', 'rate_limit_max_keys'}
 
-    def is_pattern_object(x):
-        return isinstance(x, re.Pattern)
 
-except AttributeError:
-    def is_pattern_object(x):
-        return type(x).__name__ == 'SRE_Pattern'
+def log_option(args, arg_name, cfg_key, convert, default):
+    """
+    Reads a logging option from the command line or from the config file.
+
+    The value given at the command line wins; otherwise the `cfg_key`
+    in the `[log]` section of the config file (`args.cfg`) is used.
+
+    Arguments:
+        args:
+            Arguments returned by the parser.
+        arg_name:
+            The name of the member in `args`.
+        cfg_key:
+            The key in the `[log]` section.
+        convert:
+            Callable that converts the value to the expected type.
+        default:
+            Returned if the option is found in neither place.
+    """
+    value = getattr(args, arg_name, None)
+    if value is None:
+        try:
+            value = args.cfg['log'][cfg_key]
+        except (AttributeError, KeyError):
+            return default
+    return convert(value)
+
+
+def parse_level(value):
+    """ Converts a level name (`DEBUG`) or number to a number. """
+    try:
+        return int(value)
+    except ValueError:
+        level = logging.getLevelName(str(value).strip().upper())
+        if not isinstance(level, int):
+            raise ValueError("Unknown log level %r" % value)
+        return level
+
+
+def config_log_level(cfg, default):
+    """ The `level` in the `[log]` section of the config file. """
+    try:
+        return parse_level(cfg['log']['level'])
+    except (TypeError, KeyError):
+        return default
+
+
+def config_logger_levels(cfg):
+    """
+    The levels of the loggers listed in the `[loggers]` section.
+
+    The keys are the names of the loggers (lower case, as the config
+    parser changes them) and the values are their levels:
+
+        [loggers]
+        urllib3 = WARNING
+        myapp.db = DEBUG
+    """
+    if cfg is None or not cfg.has_section('loggers'):
+        return {}
+    defaults = cfg.defaults()
+    return dict((name, parse_level(cfg.get('loggers', name, raw=True)))
+                for name in cfg.options('loggers') if name not in defaults)
+
+
+def set_log_level(args, level):
+    """
+    Changes the level of the handlers installed by :func:`setup_logging`.
+
+    Arguments:
+        args:
+            Arguments returned by the parser; `args.log_level` is updated.
+        level:
+            The new level.
+    """
+    for handler in getattr(args, 'log_handlers', ()):
+        handler.setLevel(level)
+    args.log_level = level
+    root_level = level
+    recorder = getattr(args, 'flight_recorder_handler', None)
+    if recorder is not None:
+        root_level = min(level, recorder.level)
+    logging.getLogger().setLevel(root_level)
+
+
+def make_file_handler(args, file_buffer=None):
+    """
+    Creates the handler that writes the log file.
+
+    The buffering and rotation are configured by the `log_file_*` and
+    `log_rotate_*` members of `args` or by the same keys (without
+    the `log_` prefix) in the `[log]` section of the config file:
+
+    * `file_buffer`: characters to collect before writing;
+    * `rotate_size`: size of the file that triggers a rotation;
+    * `rotate_interval`: age in seconds that triggers a rotation;
+    * `rotate_count`: how many rotated files to keep;
+    * `compress`: `gzip`, `zstd`, `auto` or `none` for the rotated files.
+
+    Arguments:
+        args:
+            Arguments returned by the parser; `log_file` is the path.
+        file_buffer:
+            The number of characters to collect before writing them to
+            the file; 0 writes each record as it arrives. By default
+            the value is taken from `args.log_file_buffer`.
+
+    The file (and its directory) is only created when the first record
+    is written.
+
+    Returns:
+        A :class:`~appupup.log_file.FileHandler` if neither buffering nor
+        rotation are requested, otherwise a
+        :class:`~appupup.log_file.BufferedFileHandler` or
+        a :class:`~appupup.log_file.RotatingFileHandler`.
+    """
+    from appupup.log_file import (
+        FileHandler, BufferedFileHandler, RotatingFileHandler)
+
+    if file_buffer is None:
+        file_buffer = log_option(args, 'log_file_buffer', 'file_buffer',
+                                 parse_size, 0)
+    rotate_size = log_option(args, 'log_rotate_size', 'rotate_size',
+                             parse_size, 0)
+    rotate_interval = log_option(args, 'log_rotate_interval',
+                                 'rotate_interval', float, 0)
+    if not file_buffer and not rotate_size and not rotate_interval:
+        return FileHandler(args.log_file, delay=True)
+
+    kwargs = dict(
+        delay=True,
+        buffer_size=file_buffer,
+        flush_interval=getattr(args, 'log_file_flush_interval', 1.0),
+        flush_level=getattr(args, 'log_file_flush_level', logging.ERROR),
+        fsync_interval=getattr(args, 'log_file_fsync', None))
+    if not rotate_size and not rotate_interval:
+        return BufferedFileHandler(args.log_file, **kwargs)
+
+    compress = log_option(args, 'log_compress', 'compress', str, 'auto')
+    return RotatingFileHandler(
+        args.log_file, max_bytes=rotate_size,
+        rotate_interval=rotate_interval,
+        backup_count=log_option(args, 'log_rotate_count', 'rotate_count',
+                                int, 0),
+        compress=None if compress == 'none' else compress,
+        **kwargs)
 
 
 def setup_logging(args, app_name, app_version, app_stage='',
-                  log_for_console=False):
+                  log_for_console=False, queue_size=None,
+                  queue_overflow=None, file_buffer=None):
     """
     Prepares our logging mechanism.
 
+    Without `--log-level` or `--verbose` the level is the `level` in
+    the `[log]` section of the config file (a name or a number) and
+    the loggers listed in the `[loggers]` section get their levels (see
+    :func:`config_logger_levels`). The handlers are stored in
+    `args.log_handlers`.
+
+    The format of each output can be switched to JSON lines (see
+    :class:`~appupup.formatter.JsonFormatter`) with
+    `args.log_console_format` and `args.log_file_format` or
+    the `console_format` and `file_format` keys in the `[log]` section
+    of the config file.
+
+    With `args.flight_recorder` (a size in bytes) or the `flight_recorder`
+    key in the `[log]` section the most recent records are also kept in
+    a memory-mapped file inside `args.udd` that survives crashes (see
+    :mod:`appupup.flight_recorder`). Its level is
+    `args.flight_recorder_level` (DEBUG by default) and the handler is
+    stored in `args.flight_recorder_handler`.
+
     Examples:
 
         >>> setup_logging(args, __package_name__, __author__, __version__, 'dev')
@@ -42,15 +210,40 @@ def setup_logging(args, app_name, app_version, app_stage='',
         log_for_console:
             Use a format for stream handler that looks nicer in interactive
             terminals.
+        queue_size:
+            If not zero the handlers run in a background thread and
+            the records reach them through a queue of this size
+            (see :mod:`appupup.log_queue`). The listener is stored in
+            `args.log_listener` and must be stopped before exiting
+            (:func:`appupup.main.main` does that). By default the value
+            is taken from `args.log_queue_size`.
+        queue_overflow:
+            What to do when the queue is full: `block`, `drop-newest` or
+            `drop-oldest`. By default the value is taken from
+            `args.log_queue_overflow`.
+        file_buffer:
+            If not zero the log file is written in chunks of this many
+            characters (see :func:`make_file_handler`). By default
+            the value is taken from `args.log_file_buffer`.
 
     Returns:
         True if all went well, False to exit with error
     """
     logger = logging.getLogger()
 
-    # Determine the level of logging.
+    # Determine the level of logging; without a level at the command line
+    # the one in the config file is used.
+    cfg = getattr(args, 'cfg', None)
+    args.log_level_fixed = args.verbose or args.log_level != logging.INFO
     if args.log_level == logging.INFO:
-        log_level = logging.DEBUG if args.verbose else logging.INFO
+        if args.verbose:
+            log_level = logging.DEBUG
+        else:
+            try:
+                log_level = config_log_level(cfg, logging.INFO)
+            except ValueError as e:
+                print("ERROR! %s in the [log] section" % e)
+                return False
     else:
         try:
             log_level = int(args.log_level)
@@ -63,12 +256,15 @@ def setup_logging(args, app_name, app_version, app_stage='',
     args.log_level = log_level
 
     # The format we're going to use with console output.
-    if log_for_console:
-        fmt = logging.Formatter(
+    if log_option(args, 'log_console_format', 'console_format',
+                  str, 'text') == 'json':
+        fmt = JsonFormatter()
+    elif log_for_console:
+        fmt = FastFormatter(
             "%(levelname)s: %(message)s",
             '%M:%S')
     else:
-        fmt = logging.Formatter(
+        fmt = FastFormatter(
             "[%(asctime)s] [%(levelname)-7s] [%(name)-19s] [%(threadName)-15s] "
             "[%(funcName)-25s] %(message)s",
             '%M:%S')
@@ -78,30 +274,149 @@ def setup_logging(args, app_name, app_version, app_stage='',
     console_handler.setFormatter(fmt)
     console_handler.setLevel(log_level)
     logger.addHandler(console_handler)
+    args.log_handlers = [console_handler]
 
     # This is the file output.
     if len(args.log_file) > 0 and args.log_file != '-':
         # The format we're going to use with file handler.
-        fmt = logging.Formatter(
-            "%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
-            "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
-            "[%(funcName)-25s] | %(message)s",
-            '%Y-%m-%d %H:%M:%S')
-        file_path, file_name = os.path.split(args.log_file)
-        if not os.path.isdir(file_path):
-            os.makedirs(file_path)
-        file_handler = logging.FileHandler(args.log_file)
+        if log_option(args, 'log_file_format', 'file_format',
+                      str, 'text') == 'json':
+            fmt = JsonFormatter()
+        else:
+            fmt = FastFormatter(
+                "%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
+                "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+                "[%(funcName)-25s] | %(message)s",
+                '%Y-%m-%d %H:%M:%S')
+        file_handler = make_file_handler(args, file_buffer=file_buffer)
         file_handler.setFormatter(fmt)
         file_handler.setLevel(log_level)
         logger.addHandler(file_handler)
-
-    logger.setLevel(log_level)
+        args.log_handlers.append(file_handler)
+
+    # Move the handlers to a background thread.
+    if queue_size is None:
+        queue_size = getattr(args, 'log_queue_size', 0)
+    if queue_overflow is None:
+        queue_overflow = getattr(args, 'log_queue_overflow', 'block')
+    if queue_size:
+        from appupup.log_queue import start_queue_logging
+        args.log_listener = start_queue_logging(
+            logger, maxsize=queue_size, overflow=queue_overflow)
+    else:
+        args.log_listener = None
+
+    # The flight recorder is not moved behind the queue; the records
+    # waiting there are lost if the process is killed.
+    recorder_size = log_option(args, 'flight_recorder', 'flight_recorder',
+                               parse_size, 0)
+    args.flight_recorder_handler = None
+    root_level = log_level
+    if recorder_size:
+        from appupup.flight_recorder import (
+            FlightRecorderHandler, flight_recorder_path)
+        recorder_level = log_option(
+            args, 'flight_recorder_level', 'flight_recorder_level',
+            int, logging.DEBUG)
+        directory = os.path.join(args.udd, 'flight-recorder')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        recorder = FlightRecorderHandler(
+            flight_recorder_path(directory, app_name),
+            size=recorder_size, level=recorder_level)
+        recorder.setFormatter(FastFormatter(
+            "%(asctime)s.%(msecs)03d [%(levelname)-7s] [%(name)-19s] "
+            "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+            "[%(funcName)-25s] | %(message)s",
+            '%Y-%m-%d %H:%M:%S'))
+        logger.addHandler(recorder)
+        args.flight_recorder_handler = recorder
+        root_level = min(log_level, recorder_level)
+
+    logger.setLevel(root_level)
+    try:
+        for name, level in config_logger_levels(cfg).items():
+            logging.getLogger(name).setLevel(level)
+    except ValueError as e:
+        print("ERROR! %s in the [loggers] section" % e)
+        return False
     logger.debug(
         "%s v%s %s started", app_name, app_version, app_stage)
     logger.debug("logging to %s", args.log_file)
     return True
 
 
+def shutdown_logging(args):
+    """
+    Flushes the logging mechanism prepared by :func:`setup_logging`.
+
+    If the handlers run in a background thread the records that are waiting
+    in the queue are written, the thread is stopped and the handlers are
+    placed back on the root logger, so any later record is written
+    synchronously.
+
+    Arguments:
+        args:
+            Arguments returned by the parser.
+    """
+    listener = getattr(args, 'log_listener', None)
+    if listener is None:
+        return
+    args.log_listener = None
+    listener.stop()
+    handlers = listener.logger.handlers
+    index = handlers.index(listener.queue_handler)
+    listener.logger.handlers = \
+        handlers[:index] + list(listener.handlers) + handlers[index + 1:]
+
+    dropped = listener.queue.dropped
+    if dropped:
+        logging.getLogger('appupup').warning(
+            "%d log records were dropped (%s)",
+            sum(dropped.values()), ', '.join(
+                '%s: %d' % (logging.getLevelName(level), count)
+                for level, count in sorted(dropped.items())))
+
+
+class LazyMessage(object):
+    """
+    The text of a record that is only formatted when it is needed.
+
+    `str()` returns the text produced by the formatter of the handler;
+    the record is formatted at most once. :attr:`message` is the message
+    of the record with the arguments merged in, without the rest of
+    the format.
+    """
+    __slots__ = ('handler', 'record', '_text', '_message')
+
+    def __init__(self, handler, record):
+        self.handler = handler
+        self.record = record
+        self._text = None
+        self._message = None
+
+    @property
+    def message(self):
+        """ The message of the record (`record.getMessage()`). """
+        if self._message is None:
+            self._message = self.record.getMessage()
+        return self._message
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self.handler.format(self.record)
+        return self._text
+
+    def __len__(self):
+        return len(str(self))
+
+    def __contains__(self, item):
+        return item in str(self)
+
+    def __repr__(self):
+        return '<LazyMessage %r>' % self.record
+
+
 class DebugLogger(logging.StreamHandler):
     """
     Logging handler that allows extended filtering of the output.
@@ -124,6 +439,51 @@ class DebugLogger(logging.StreamHandler):
       It should call either :meth:~`filtered_in` \
       or :meth:~`filtered_out` if it returns `True`, otherwise it should \
       call neither.
+
+    A pattern is either a string that must be equal to the value or
+    a compiled regular expression that must match it. Each field also
+    accepts a list, tuple or set of patterns and matches if any of them
+    matches; the strings are looked up in a set and the regular expressions
+    are merged into a single one. Interval fields accept a list of
+    intervals in the same way. For callbacks the pattern (or the
+    collection) is the first member of the `(pattern, callback)` tuple.
+
+    With `lazy_format` the record is not formatted before the rules are
+    checked. The rules work on the fields of the record (the message rules
+    on `record.getMessage()`) and callbacks receive
+    a :class:`LazyMessage` in place of the formatted message, so
+    the formatting is only paid for the records that are issued or when
+    a callback asks for the text.
+
+    The rules that only depend on the call site (logger name, file,
+    function, line and level) are remembered for up to
+    `call_site_cache_size` call sites, so a hot loop only pays for
+    the other rules; see :meth:`cache_info`.
+
+    With `rate_limit` at most that many records per second are issued for
+    each call site (or message template, see `rate_limit_key`) after
+    a burst of `rate_limit_burst` records. The records over the limit are
+    passed to :meth:`filtered_out` and a summary like "suppressed 12
+    similar messages in 3.0 seconds" is issued when the limit allows
+    records with that key again (or when the handler is closed).
+    At most `rate_limit_max_keys` keys are tracked;
+    see :class:`appupup.log_limit.RateLimiter`.
+
+    `sample` is a list of :class:`~appupup.log_sample.SampleRule` (or of
+    tuples with their arguments) that keep a fraction of the records of
+    some loggers and levels, e.g. `[('db.*', 'DEBUG', 0.01)]`.
+    Sampling is deterministic by call site or by a field of the record
+    (`('db.*', 'DEBUG', 0.01, 'request_id')`); by call site, a site is
+    kept or dropped as a whole. Sampling happens before any other rule;
+    the records that are sampled out are passed to :meth:`filtered_out`
+    (formatted, or as a :class:`LazyMessage` with `lazy_format`) only if
+    a subclass overrides it, so they cost almost nothing otherwise.
+
+    The rules that are set are compiled into a single decision function
+    (see :mod:`appupup.log_rules`) when the handler is created. Assigning
+    a new value to a rule attribute causes the function to be rebuilt
+    before the next record is processed; if a rule object is changed in
+    place call :meth:`recompile`.
     """
     def __init__(self,
                  include_name_pattern=None, include_thread_pattern=None,
@@ -150,7 +510,12 @@ class DebugLogger(logging.StreamHandler):
                  callback_process_pattern=None,
                  callback_created_interval=None, callback_relative_created_interval=None,
                  callback_level_in=None,
+                 lazy_format=False, call_site_cache_size=4096,
+                 rate_limit=None, rate_limit_burst=None,
+                 rate_limit_key='call_site', rate_limit_max_keys=1024,
+                 sample=None,
                  ):
+        self.gate = None
 
         self.include_name_pattern = include_name_pattern
         self.include_thread_pattern = include_thread_pattern
@@ -197,7 +562,103 @@ class DebugLogger(logging.StreamHandler):
         self.callback_created_interval = callback_created_interval
         self.callback_relative_created_interval = callback_relative_created_interval
 
+        self.lazy_format = lazy_format
+        self.call_site_cache_size = call_site_cache_size
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst
+        self.rate_limit_key = rate_limit_key
+        self.rate_limit_max_keys = rate_limit_max_keys
+        self.sample = sample
+
         logging.StreamHandler.__init__(self)
+        self.recompile()
+
+    def __setattr__(self, name, value):
+        if name in _RECOMPILE_NAMES:
+            object.__setattr__(self, '_decide', self._decide_stale)
+        object.__setattr__(self, name, value)
+        if name == 'sample':
+            # Sampling happens before the decision function is checked
+            # for staleness so the sampler is rebuilt right away.
+            self._build_sampler()
+        if name in GATE_RULE_NAMES:
+            gate = self.__dict__.get('gate')
+            if gate is not None:
+                gate.apply()
+
+    def enable_gate(self, logger=None):
+        """
+        Sets the levels of the loggers based on the name and level rules.
+
+        Loggers whose records can never pass the rules are disabled or have
+        their level raised, so those records are never created. The gate
+        follows the changes to the rules and the new loggers.
+        Only use this if the handler is the only one that consumes
+        the records of the loggers at and below `logger`;
+        see :mod:`appupup.log_gate`.
+
+        Arguments:
+            logger (logging.Logger):
+                The logger where the handler is installed; the root logger
+                by default.
+        """
+        self.disable_gate()
+        if logger is None:
+            logger = logging.getLogger()
+        object.__setattr__(self, 'gate', LevelGate(self, logger))
+        self.gate.install()
+
+    def disable_gate(self):
+        """ Restores the levels changed by :meth:`enable_gate`. """
+        gate = self.__dict__.get('gate')
+        if gate is not None:
+            gate.uninstall()
+            object.__setattr__(self, 'gate', None)
+
+    def recompile(self):
+        """
+        Rebuilds the decision function from current rules.
+
+        The rate limiter is also rebuilt, so the suppression state is lost.
+        """
+        decide = compile_rules(
+            self, lazy=self.lazy_format,
+            cache_size=self.call_site_cache_size)
+        object.__setattr__(self, '_decide', decide)
+        limiter = None
+        if self.rate_limit:
+            limiter = RateLimiter(
+                self.rate_limit, burst=self.rate_limit_burst,
+                key=self.rate_limit_key, max_keys=self.rate_limit_max_keys)
+        object.__setattr__(self, 'limiter', limiter)
+        self._build_sampler()
+        return decide
+
+    def _build_sampler(self):
+        """ Creates the sampler from the `sample` rules. """
+        object.__setattr__(
+            self, 'sampler', Sampler(self.sample) if self.sample else None)
+
+    def cache_info(self):
+        """
+        Statistics of the call site cache.
+
+        Returns:
+            A named tuple with `hits`, `misses`, `maxsize` and `currsize`
+            or None if the current rules do not use the cache.
+        """
+        decide = self._decide
+        if decide == self._decide_stale:
+            decide = self.recompile()
+        try:
+            return decide.cache_info()
+        except AttributeError:
+            return None
+
+    def _decide_stale(self, msg, record):
+        """ Decision function used after the rules were changed. """
+        decide = self.recompile()
+        return ACCEPT if decide is None else decide(msg, record)
 
     def filter_callback(self, pattern, msg, value, record):
         """ Checks if a value matches the pattern. """
@@ -239,7 +700,7 @@ class DebugLogger(logging.StreamHandler):
         interval, callback = interval
         if include:
             if (value >= interval[0]) and (value <= interval[1]):
-                return callback(self, value, record)
+                return callback(self, msg, value, record)
 
         else:
             if (value < interval[0]) or (value > interval[1]):
@@ -277,111 +738,73 @@ class DebugLogger(logging.StreamHandler):
 
     def filtered_in(self, msg, record):
         """ The function receives messages that were filtered in. """
-        super().emit(record)
+        # Same as StreamHandler.emit() but without formatting the record
+        # a second time.
+        try:
+            self.stream.write(str(msg) + self.terminator)
+            self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
 
     def filtered_out(self, msg, record):
         """ The function receives messages that were filtered out. """
         pass
 
+    def issue_summaries(self):
+        """ Issues the summaries produced by the rate limiter. """
+        summaries = self.limiter.summaries
+        self.limiter.summaries = []
+        for summary in summaries:
+            self.filtered_in(self.format(summary), summary)
+
     def emit(self, record):
         """ Reimplemented method to filter messages. """
-        msg = self.format(record)
-        while True:
-            if self.filter_exclude(self.exclude_thread_pattern, record.threadName):
-                break
-            if self.filter_exclude(self.exclude_name_pattern, record.name):
-                break
-            if self.filter_exclude(self.exclude_file_name_pattern, record.filename):
-                break
-            if self.filter_exclude(self.exclude_func_name_pattern, record.funcName):
-                break
-            if self.filter_exclude(self.exclude_level_name_pattern, record.levelname):
-                break
-            if self.filter_exclude(self.exclude_level_number_pattern, record.levelno):
-                break
-            if self.filter_exclude(self.exclude_line_number_pattern, record.lineno):
-                break
-            if self.filter_exclude(self.exclude_message_pattern, record.message):
-                break
-            if self.filter_exclude(self.exclude_module_pattern, record.module):
-                break
-            if self.filter_exclude(self.exclude_path_pattern, record.pathname):
-                break
-            if self.filter_exclude(self.exclude_process_pattern, record.processName):
-                break
-            if not self.check_interval(self.exclude_created_interval, record.created):
-                break
-            if not self.check_interval(self.exclude_relative_created_interval, record.relativeCreated):
-                break
-            if not self.check_in(self.exclude_level_in, record.levelno):
-                break
-
-            if not self.filter_include(self.include_thread_pattern, record.threadName):
-                break
-            if not self.filter_include(self.include_name_pattern, record.name):
-                break
-            if not self.filter_include(self.include_file_name_pattern, record.filename):
-                break
-            if not self.filter_include(self.include_func_name_pattern, record.funcName):
-                break
-            if not self.filter_include(self.include_level_name_pattern, record.levelname):
-                break
-            if not self.filter_include(self.include_level_number_pattern, record.levelno):
-                break
-            if not self.filter_include(self.include_line_number_pattern, record.lineno):
-                break
-            if not self.filter_include(self.include_message_pattern, record.message):
-                break
-            if not self.filter_include(self.include_module_pattern, record.module):
-                break
-            if not self.filter_include(self.include_path_pattern, record.pathname):
-                break
-            if not self.filter_include(self.include_process_pattern, record.processName):
-                break
-            if not self.check_interval(self.include_created_interval, record.created):
-                break
-            if not self.check_interval(self.include_relative_created_interval, record.relativeCreated):
-                break
-            if not self.check_in(self.include_level_in, record.levelno):
-                break
-
-
-            if not self.filter_callback(self.callback_thread_pattern, msg, record.threadName, record):
-                return
-            if not self.filter_callback(self.callback_name_pattern, msg, record.name, record):
-                return
-            if not self.filter_callback(self.callback_file_name_pattern, msg, record.filename, record):
-                return
-            if not self.filter_callback(self.callback_func_name_pattern, msg, record.funcName, record):
-                return
-            if not self.filter_callback(self.callback_level_name_pattern, msg, record.levelname, record):
-                return
-            if not self.filter_callback(self.callback_level_number_pattern, msg, record.levelno, record):
-                return
-            if not self.filter_callback(self.callback_line_number_pattern, msg, record.lineno, record):
-                return
-            if not self.filter_callback(self.callback_message_pattern, msg, record.message, record):
-                return
-            if not self.filter_callback(self.callback_module_pattern, msg, record.module, record):
-                return
-            if not self.filter_callback(self.callback_path_pattern, msg, record.pathname, record):
-                return
-            if not self.filter_callback(self.callback_process_pattern, msg, record.processName, record):
-                return
-            if not self.check_interval_callback(self.callback_created_interval, msg, record.created, record):
-                return
-            if not self.check_interval_callback(self.callback_relative_created_interval, msg, record.relativeCreated, record):
-                return
-            if not self.check_in_callback(self.callback_level_in, msg, record.levelno, record):
-                return
-
-            self.filtered_in(msg, record)
+        sampler = self.sampler
+        if sampler is not None and not sampler.filter(record):
+            # The records that are sampled out are only formatted for
+            # a subclass that looks at them.
+            if type(self).filtered_out is not DebugLogger.filtered_out:
+                self.filtered_out(
+                    LazyMessage(self, record) if self.lazy_format
+                    else self.format(record), record)
             return
+        if self.lazy_format:
+            msg = LazyMessage(self, record)
+        else:
+            msg = self.format(record)
+        decide = self._decide
+        outcome = ACCEPT if decide is None else decide(msg, record)
+        if outcome == ACCEPT:
+            limiter = self.limiter
+            if limiter is not None:
+                allowed = limiter.check(record)
+                if limiter.summaries:
+                    self.issue_summaries()
+                if not allowed:
+                    self.filtered_out(msg, record)
+                    return
+            self.filtered_in(msg, record)
+        elif outcome == REJECT:
+            self.filtered_out(msg, record)
 
-        self.filtered_out(msg, record)
+    def close(self):
+        """ Issues the pending summaries of the rate limiter. """
+        self.acquire()
+        try:
+            limiter = self.__dict__.get('limiter')
+            if limiter is not None:
+                limiter.flush()
+                if limiter.summaries:
+                    self.issue_summaries()
+        finally:
+            self.release()
+        super(DebugLogger, self).close()
 
     @staticmethod
-    def install(logger_name=None, exclusive=False, fmt=None, *args, **kwargs):
+    def install(logger_name=None, exclusive=False, fmt=None, *args,
+                gate=False, **kwargs):
         """
         Creates the handler and installs it to a logger.
 
@@ -392,7 +815,12 @@ class DebugLogger(logging.StreamHandler):
             exclusive (bool):
                 If true will remove all other handlers
             fmt (logging.Formatter):
-                The format to be used with the logger.
+                The format to be used with the logger; by default
+                a :class:`~appupup.formatter.FastFormatter`.
+            gate (bool):
+                Push the name and level rules to the loggers so that
+                the records that are rejected are not created;
+                see :meth:`enable_gate`.
 
         Return:
             Newly created handler.
@@ -404,7 +832,7 @@ class DebugLogger(logging.StreamHandler):
             logger.handlers = []
 
         if fmt is None:
-            fmt = logging.Formatter(
+            fmt = FastFormatter(
                 "[%(asctime)s.%(msecs)03d] [%(levelname)-7s] [%(name)-19s] "
                 "[%(threadName)-15s] "
                 "[%(funcName)-25s] %(message)s",
@@ -415,5 +843,7 @@ class DebugLogger(logging.StreamHandler):
 
         logger.addHandler(result)
         logger.setLevel(1)
+        if gate:
+            result.enable_gate(logger)
 
         return result
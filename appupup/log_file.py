@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+File handlers used by :func:`appupup.log.setup_logging`.
+
+`logging.FileHandler` writes and flushes the file for each record.
+:class:`FileHandler` does the same but also creates the directory of
+the file, so, with `delay`, nothing is created on disk until the first
+record is written. :class:`BufferedFileHandler` collects the formatted records and writes
+them in large chunks. :class:`RotatingFileHandler` also starts a new file
+when the current one gets too large or too old and compresses the old
+files in a background thread.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import queue
+import threading
+import time
+
+# The extensions of the compressed files.
+COMPRESSED_SUFFIX = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def zstd_available():
+    """ Tells if the zstandard package is installed. """
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FileHandler(logging.FileHandler):
+    """
+    A `logging.FileHandler` that creates the directory of the file when
+    the file is opened.
+
+    The arguments are those of `logging.FileHandler`.
+    """
+    def _open(self):
+        directory = os.path.dirname(self.baseFilename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        return super(FileHandler, self)._open()
+
+
+class BufferedFileHandler(FileHandler):
+    """
+    A file handler that writes the records in batches.
+
+    The records are formatted as they arrive and kept in memory until
+    one of these happens:
+
+    * the buffered text reaches `buffer_size` characters;
+    * a record with a level of at least `flush_level` arrives;
+    * `flush_interval` seconds passed since the last write (checked by
+      a background thread, so the records are written even if no other
+      record arrives);
+    * the handler is flushed or closed (`logging.shutdown()` does that
+      at exit).
+
+    With a `buffer_size` of 0 each record is written as it arrives.
+
+    Arguments:
+        filename:
+            The path of the file.
+        mode, encoding, delay:
+            Same as for `logging.FileHandler`.
+        buffer_size (int):
+            The number of characters to collect before writing them.
+        flush_interval (float):
+            The maximum number of seconds a record stays in the buffer;
+            0 or None to only flush on size and level.
+        flush_level (int):
+            Records with this level or higher are written right away,
+            together with the ones waiting in the buffer.
+        fsync_interval (float):
+            If not None, the file is also synced to the disk when it is
+            written, at most once in this many seconds (0 syncs on each
+            write).
+    """
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 buffer_size=64 * 1024, flush_interval=1.0,
+                 flush_level=logging.ERROR, fsync_interval=None):
+        self.buffer = []
+        self.buffered = 0
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.fsync_interval = fsync_interval
+        self.last_fsync = 0.0
+        self.flusher = None
+        self.stopping = threading.Event()
+        super(BufferedFileHandler, self).__init__(
+            filename, mode=mode, encoding=encoding, delay=delay)
+
+        if flush_interval and buffer_size:
+            self.flusher = threading.Thread(
+                target=self._flush_periodically,
+                name='log-flush-%s' % os.path.basename(filename))
+            self.flusher.daemon = True
+            self.flusher.start()
+
+    def _flush_periodically(self):
+        """ Runs in a background thread. """
+        while not self.stopping.wait(self.flush_interval):
+            if self.buffer:
+                try:
+                    self.flush()
+                except Exception:
+                    # The next record reports the error through emit().
+                    pass
+
+    def emit(self, record):
+        """ Formats the record and stores it in the buffer. """
+        try:
+            text = self.format(record) + self.terminator
+            self.buffer.append(text)
+            self.buffered = self.buffered + len(text)
+            if self.buffered >= self.buffer_size or \
+                    record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def write(self, text):
+        """ Writes a chunk of text to the file; the lock is held. """
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.write(text)
+        self.stream.flush()
+
+    def flush(self):
+        """ Writes the records in the buffer to the file. """
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            text = ''.join(self.buffer)
+            self.buffer = []
+            self.buffered = 0
+            self.write(text)
+
+            if self.fsync_interval is not None:
+                now = time.monotonic()
+                if now - self.last_fsync >= self.fsync_interval:
+                    self.last_fsync = now
+                    os.fsync(self.stream.fileno())
+        finally:
+            self.release()
+
+    def close(self):
+        """ Stops the background thread and writes the buffer. """
+        self.stopping.set()
+        if self.flusher is not None and \
+                self.flusher is not threading.current_thread():
+            self.flusher.join()
+            self.flusher = None
+        self.flush()
+        super(BufferedFileHandler, self).close()
+
+
+def compress_file(path, method):
+    """
+    Compresses a file and removes the original.
+
+    The compressed file is written under a temporary name and renamed
+    when complete.
+
+    Arguments:
+        path:
+            The file to compress.
+        method:
+            `gzip` or `zstd`; the latter needs the zstandard package.
+
+    Returns:
+        The path of the compressed file.
+    """
+    import shutil
+    if method == 'zstd':
+        import zstandard
+    else:
+        import gzip
+
+    target = path + COMPRESSED_SUFFIX[method]
+    temp = target + '.tmp'
+    with open(path, 'rb') as source, open(temp, 'wb') as destination:
+        if method == 'zstd':
+            with zstandard.ZstdCompressor().stream_writer(
+                    destination, closefd=False) as stream:
+                shutil.copyfileobj(source, stream)
+        else:
+            with gzip.GzipFile(fileobj=destination, mode='wb') as stream:
+                shutil.copyfileobj(source, stream)
+    os.replace(temp, target)
+    os.remove(path)
+    return target
+
+
+def _rotation_key(suffix):
+    """
+    Sorts the names given by :meth:`RotatingFileHandler.rotated_name`.
+
+    The suffix is the time of the rotation optionally followed by
+    a counter for the rotations in the same second (`20191115-130000.12`);
+    the counter is compared as a number.
+    """
+    stamp, _, counter = suffix.partition('.')
+    return stamp, int(counter) if counter.isdigit() else 0, counter
+
+
+class Archiver(object):
+    """
+    Compresses and prunes the rotated files in a background thread.
+
+    Arguments:
+        base_path:
+            The path of the live log file; rotated files have names that
+            start with this path followed by a dot.
+        compress:
+            `gzip`, `zstd` or None to keep the files as they are.
+        backup_count:
+            How many rotated files to keep; 0 keeps all of them.
+    """
+    def __init__(self, base_path, compress=None, backup_count=0):
+        self.base_path = base_path
+        self.compress = compress
+        self.backup_count = backup_count
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def submit(self, path):
+        """ Schedules a rotated file for compression and pruning. """
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._run, name='log-archiver-%s' %
+                os.path.basename(self.base_path))
+            self.thread.daemon = True
+            self.thread.start()
+        self.queue.put(path)
+
+    def _run(self):
+        """ Runs in the background thread. """
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+            try:
+                if self.compress:
+                    compress_file(path, self.compress)
+                self.prune()
+            except OSError:
+                # e.g. the file was pruned before it was compressed
+                pass
+
+    def rotated_files(self):
+        """ The rotated files, oldest first. """
+        directory, name = os.path.split(self.base_path)
+        prefix = name + '.'
+        result = []
+        for entry in os.listdir(directory or '.'):
+            if not entry.startswith(prefix) or entry.endswith('.tmp'):
+                continue
+            key = entry
+            for suffix in COMPRESSED_SUFFIX.values():
+                if key.endswith(suffix):
+                    key = key[:-len(suffix)]
+            result.append((_rotation_key(key[len(prefix):]),
+                           os.path.join(directory, entry)))
+        return [path for key, path in sorted(result)]
+
+    def prune(self):
+        """ Removes the oldest rotated files. """
+        if not self.backup_count:
+            return
+        files = self.rotated_files()
+        for path in files[:max(0, len(files) - self.backup_count)]:
+            os.remove(path)
+
+    def close(self):
+        """ Waits for the files that were submitted to be processed. """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+class RotatingFileHandler(BufferedFileHandler):
+    """
+    A buffered file handler that rotates the file.
+
+    After a chunk of text is written, the file is renamed if it grew past
+    `max_bytes` (counted in characters) or if it is older than
+    `rotate_interval` seconds. The age is counted from the time the file
+    was started, which is kept in a hidden file next to it
+    (`.app.log.started`) because file systems do not reliably record
+    when a file was created; a restart of the application does not reset
+    it. The new name is the old one followed by
+    the time of the rotation (`app.log.20191115-130000`). The old file is
+    then compressed and the files over `backup_count` are removed
+    by an :class:`Archiver` thread, so the thread that logs never waits for
+    the compression.
+
+    Arguments:
+        max_bytes (int):
+            The size that triggers a rotation; 0 to not rotate on size.
+        rotate_interval (float):
+            The age in seconds that triggers a rotation; 0 to not rotate
+            on time.
+        backup_count (int):
+            How many rotated files to keep; 0 keeps all of them.
+        compress (str):
+            `gzip`, `zstd`, `auto` (zstd if the zstandard package is
+            installed, gzip otherwise) or None.
+
+    The other arguments are those of :class:`BufferedFileHandler`.
+    """
+    def __init__(self, filename, mode='a', encoding=None, delay=False,
+                 max_bytes=0, rotate_interval=0, backup_count=0,
+                 compress='auto', **kwargs):
+        if compress == 'auto':
+            compress = 'zstd' if zstd_available() else 'gzip'
+        elif compress == 'zstd' and not zstd_available():
+            raise ValueError(
+                "zstd compression needs the zstandard package")
+        elif compress is not None and compress not in COMPRESSED_SUFFIX:
+            raise ValueError("Unknown compression %r" % compress)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.size = 0
+        self.rotate_at = None
+        super(RotatingFileHandler, self).__init__(
+            filename, mode=mode, encoding=encoding, delay=delay, **kwargs)
+        self.archiver = Archiver(
+            self.baseFilename, compress=compress, backup_count=backup_count)
+
+    def _open(self):
+        stream = super(RotatingFileHandler, self)._open()
+        self.size = os.path.getsize(self.baseFilename)
+        if self.rotate_interval:
+            self.rotate_at = self.started() + self.rotate_interval
+        return stream
+
+    def stamp_path(self):
+        """ The file that keeps the time when the log file was started. """
+        directory, name = os.path.split(self.baseFilename)
+        return os.path.join(directory, '.%s.started' % name)
+
+    def started(self):
+        """
+        When the current file was started.
+
+        An existing file without a recorded time is as old as its oldest
+        time stamp.
+        """
+        now = time.time()
+        path = self.stamp_path()
+        if self.size:
+            try:
+                with open(path, 'r') as f:
+                    started = float(f.read())
+                if started <= now:
+                    return started
+            except (OSError, ValueError):
+                pass
+            stat = os.stat(self.baseFilename)
+            started = min(stat.st_mtime, stat.st_ctime,
+                          getattr(stat, 'st_birthtime', now))
+        else:
+            started = now
+        try:
+            with open(path, 'w') as f:
+                f.write(repr(started))
+        except OSError:
+            pass
+        return started
+
+    def write(self, text):
+        super(RotatingFileHandler, self).write(text)
+        self.size = self.size + len(text)
+        if (self.max_bytes and self.size >= self.max_bytes) or \
+                (self.rotate_at is not None and time.time() >= self.rotate_at):
+            self.rotate()
+
+    def rotated_name(self):
+        """
+        The name for the file that is rotated now.
+
+        The counter follows the highest one used in the same second, not
+        the first free one, as the archiver may have pruned the older files.
+        """
+        result = '%s.%s' % (
+            self.baseFilename, time.strftime('%Y%m%d-%H%M%S'))
+        directory, name = os.path.split(result)
+        index = -1
+        for entry in os.listdir(directory or '.'):
+            if entry.startswith(name):
+                counter = entry[len(name):].split('.')
+                if counter[0]:
+                    continue
+                if len(counter) == 1 or not counter[1].isdigit():
+                    index = max(index, 0)
+                else:
+                    index = max(index, int(counter[1]))
+        if index < 0:
+            return result
+        return '%s.%d' % (result, index + 1)
+
+    def rotate(self):
+        """ Renames the current file and opens a new one; lock is held. """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            rotated = self.rotated_name()
+            os.rename(self.baseFilename, rotated)
+            self.archiver.submit(rotated)
+        self.stream = self._open()
+
+    def close(self):
+        """ Closes the file and waits for the archiver. """
+        super(RotatingFileHandler, self).close()
+        self.archiver.close()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Pushes the decisions of a :class:`~appupup.log.DebugLogger` up to
+the loggers.
+
+A logger creates a record for each call that passes `isEnabledFor()`,
+only for the handler to throw it away. The gate looks at the name and
+level rules of the handler and sets the level of the loggers (or disables
+them) so that records that can never pass are not created at all.
+
+This is only correct if the handler is the sole consumer of the records
+of the loggers below the one where it is installed: the records that
+are dropped are not seen by other handlers either.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+from types import SimpleNamespace
+
+from appupup.log_rules import compile_rules, REJECT
+
+# The rules that are taken into account by the gate.
+GATE_ATTRIBUTES = ('name', 'levelno', 'levelname')
+GATE_RULE_NAMES = frozenset(
+    '%s_%s' % (prefix, suffix)
+    for prefix in ('include', 'exclude')
+    for suffix in ('name_pattern', 'level_name_pattern',
+                   'level_number_pattern', 'level_in'))
+
+# Marks the absence of an attribute.
+_MISSING = object()
+
+
+def lowest_level(handler):
+    """
+    The lowest level that passes the level rules of a handler.
+
+    All levels up to CRITICAL and all named levels are tried.
+
+    Returns:
+        A level; if none of the levels that were tried passes, the level
+        above the highest one is returned.
+    """
+    rejects = compile_rules(handler, only=('levelno', 'levelname'))
+    candidates = sorted(set(range(1, logging.CRITICAL + 1)) | set(
+        level for level in logging._levelToName if level > 0))
+    if rejects is None:
+        return candidates[0]
+    for level in candidates:
+        record = SimpleNamespace(
+            levelno=level, levelname=logging.getLevelName(level))
+        if rejects('', record) != REJECT:
+            return level
+    return candidates[-1] + 1
+
+
+class LevelGate(object):
+    """
+    Keeps the levels of the loggers in sync with the rules of a handler.
+
+    Loggers whose name is rejected are disabled and the others have their
+    level raised to the lowest level that can pass. The original values
+    are restored by :meth:`apply` before it computes the new ones and
+    by :meth:`uninstall`. Loggers created after the gate was installed
+    are gated as soon as they are created.
+
+    Arguments:
+        handler:
+            The :class:`~appupup.log.DebugLogger`.
+        logger:
+            The logger where the handler is installed; only this logger
+            and the ones below it are changed.
+    """
+    def __init__(self, handler, logger):
+        self.handler = handler
+        self.logger = logger
+        self.manager = logger.manager
+        self.saved = {}
+        self.name_rejects = None
+        self.level = logging.NOTSET
+        self.installed = False
+        self.previous = _MISSING
+        self.wrapper = None
+
+    def covers(self, logger):
+        """ Tells if the records of a logger reach the handler. """
+        if self.logger is self.manager.root:
+            return True
+        name = self.logger.name
+        return logger.name == name or logger.name.startswith(name + '.')
+
+    def loggers(self):
+        """ The loggers that are affected by the gate. """
+        result = [self.manager.root]
+        result.extend(
+            logger for logger in list(self.manager.loggerDict.values())
+            if isinstance(logger, logging.Logger))
+        return [logger for logger in result if self.covers(logger)]
+
+    def install(self):
+        """ Applies the gate and watches for new loggers. """
+        if not self.installed:
+            manager = self.manager
+            # The function set by another gate, if any.
+            self.previous = manager.__dict__.get('getLogger', _MISSING)
+            get_logger = manager.getLogger
+
+            def getLogger(name):
+                existing = manager.loggerDict.get(name)
+                logger = get_logger(name)
+                if self.installed and logger is not existing and \
+                        self.covers(logger):
+                    self.gate(logger)
+                    self.clear_cache()
+                return logger
+
+            getLogger.gate = self
+            manager.getLogger = getLogger
+            self.wrapper = getLogger
+            self.installed = True
+        self.apply()
+
+    def uninstall(self):
+        """
+        Restores the loggers and stops watching for new ones.
+
+        Gates can be uninstalled in any order: a gate that was installed
+        after this one still calls the function of this one, which then
+        does nothing more than the one it replaced.
+        """
+        if self.installed:
+            self.installed = False
+            manager = self.manager
+            if manager.__dict__.get('getLogger') is self.wrapper:
+                # Skip the gates below this one that were uninstalled.
+                previous = self.previous
+                while getattr(previous, 'gate', None) is not None and \
+                        not previous.gate.installed:
+                    previous = previous.gate.previous
+                if previous is _MISSING:
+                    del manager.getLogger
+                else:
+                    manager.getLogger = previous
+            self.wrapper = None
+        self.restore()
+
+    def restore(self):
+        """ Restores the levels and states changed by the gate. """
+        for logger, (level, disabled) in self.saved.items():
+            logger.level = level
+            logger.disabled = disabled
+        self.saved = {}
+        self.clear_cache()
+
+    def apply(self):
+        """ Computes the gate from current rules and applies it. """
+        self.restore()
+        self.name_rejects = compile_rules(self.handler, only=('name', ))
+        self.level = lowest_level(self.handler)
+        for logger in self.loggers():
+            self.gate(logger)
+        self.clear_cache()
+
+    def gate(self, logger):
+        """ Applies the gate to a single logger. """
+        disabled = self.name_rejects is not None and self.name_rejects(
+            '', SimpleNamespace(name=logger.name)) == REJECT
+        level = logger.level
+        if logger is self.logger or logger.level != logging.NOTSET:
+            level = max(level, self.level)
+
+        if disabled or level != logger.level:
+            self.saved.setdefault(logger, (logger.level, logger.disabled))
+            logger.disabled = logger.disabled or disabled
+            logger.level = level
+
+    def clear_cache(self):
+        """ Levels are cached by the loggers since python 3.7. """
+        clear = getattr(self.manager, '_clear_cache', None)
+        if clear is not None:
+            clear()
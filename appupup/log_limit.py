@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limiting for :class:`appupup.log.DebugLogger`.
+
+A :class:`RateLimiter` keeps a token bucket for each key (the call site
+or the template of the message by default). A record that finds its
+bucket empty is suppressed; when the next record with the same key is
+allowed, a summary record is issued before it:
+
+    suppressed 1234 similar messages in 5.2 seconds
+
+At most `max_keys` buckets are kept; the one used least recently is
+dropped to make room (and its summary is issued if it was suppressing
+records).
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from collections import OrderedDict
+import logging
+import time
+
+# The text of the summary records; receives the number of records that
+# were suppressed and the duration in seconds.
+SUMMARY_FORMAT = 'suppressed %d similar messages in %.1f seconds'
+
+
+def _call_site_key(record):
+    return record.name, record.pathname, record.lineno
+
+
+def _template_key(record):
+    msg = record.msg
+    return msg if isinstance(msg, str) else str(msg)
+
+
+def _message_key(record):
+    return record.getMessage()
+
+
+# The ways in which records are grouped in buckets.
+LIMIT_KEYS = {
+    'call_site': _call_site_key,
+    'template': _template_key,
+    'message': _message_key,
+}
+
+
+class _Bucket(object):
+    """ The state of a key. """
+    __slots__ = ('tokens', 'last', 'suppressed', 'since', 'sample')
+
+    def __init__(self, tokens, last):
+        self.tokens = tokens
+        self.last = last
+        self.suppressed = 0
+        self.since = None
+        self.sample = None
+
+
+class RateLimiter(object):
+    """
+    Limits the rate of similar records.
+
+    Arguments:
+        rate (float):
+            How many records per second are allowed for each key.
+        burst (int):
+            How many records are allowed in a row before the rate applies;
+            by default the rate (but at least one).
+        key:
+            How the records are grouped: `call_site` (logger name, file and
+            line), `template` (the message before the arguments are merged
+            in), `message` (the message after the arguments are merged in)
+            or a function that receives the record and returns
+            a hashable value.
+        max_keys (int):
+            The maximum number of buckets that are kept.
+
+    Attributes:
+        summaries (list):
+            The summary records that should be issued; the user of
+            the limiter empties the list.
+    """
+    def __init__(self, rate, burst=None, key='call_site', max_keys=1024):
+        if rate <= 0:
+            raise ValueError("The rate should be positive")
+        if not callable(key):
+            try:
+                key = LIMIT_KEYS[key]
+            except KeyError:
+                raise ValueError(
+                    "The key should be one of %s or a function" %
+                    ', '.join(sorted(LIMIT_KEYS)))
+        self.rate = float(rate)
+        self.burst = max(1.0, float(rate if burst is None else burst))
+        self.key = key
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.summaries = []
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def check(self, record):
+        """
+        Tells if a record should be issued.
+
+        A summary of the records that were suppressed is appended to
+        :attr:`summaries` when the record ends a suppression period.
+        """
+        key = self.key(record)
+        now = record.created
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                _, evicted = self.buckets.popitem(last=False)
+                self._summarize(evicted, now)
+            self.buckets[key] = _Bucket(self.burst - 1.0, now)
+            return True
+
+        self.buckets.move_to_end(key)
+        elapsed = now - bucket.last
+        if elapsed > 0:
+            bucket.tokens = min(
+                self.burst, bucket.tokens + elapsed * self.rate)
+            bucket.last = now
+        if bucket.tokens >= 1.0:
+            bucket.tokens = bucket.tokens - 1.0
+            self._summarize(bucket, now)
+            return True
+
+        if not bucket.suppressed:
+            bucket.since = now
+            bucket.sample = record
+        bucket.suppressed = bucket.suppressed + 1
+        return False
+
+    def _summarize(self, bucket, now):
+        """ Creates the summary record of a bucket, if needed. """
+        if not bucket.suppressed:
+            return
+        sample = bucket.sample
+        summary = logging.makeLogRecord(sample.__dict__)
+        summary.msg = SUMMARY_FORMAT
+        summary.args = (bucket.suppressed, max(0.0, now - bucket.since))
+        summary.exc_info = None
+        summary.exc_text = None
+        summary.stack_info = None
+        summary.created = now
+        summary.msecs = (now - int(now)) * 1000
+        self.summaries.append(summary)
+        bucket.suppressed = 0
+        bucket.since = None
+        bucket.sample = None
+
+    def flush(self, now=None):
+        """ Creates the summaries of all the buckets that suppress records. """
+        if now is None:
+            now = time.time()
+        for bucket in self.buckets.values():
+            self._summarize(bucket, now)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Logging from worker processes.
+
+A :class:`LogCollector` runs in the parent process. It listens on a local
+socket (or a named pipe on Windows) and passes the records it receives
+to the loggers of the parent, so they go through the handlers configured
+by :func:`~appupup.log.setup_logging` and through any
+:class:`~appupup.log.DebugLogger` rules, exactly like the records of
+the parent.
+
+Worker processes call :func:`init_worker` (directly or as the initializer
+of a pool), which replaces their handlers with a :class:`ChildLogHandler`
+that sends the records to the collector in batches.
+
+Example:
+
+    >>> with LogCollector() as collector:
+    ...     with ProcessPoolExecutor(
+    ...             initializer=collector.initializer,
+    ...             initargs=collector.initargs) as pool:
+    ...         pool.map(work, items)
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import pickle
+import socket
+import threading
+from multiprocessing.connection import Listener, Client
+from multiprocessing.util import Finalize
+
+logger = logging.getLogger('appupup')
+
+# Types that are sent as they are; other values in the record are
+# replaced by their representation if the record can not be pickled.
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def prepare_record(record):
+    """
+    Converts a record to a dictionary that can be pickled.
+
+    The arguments are merged into the message and the exception is
+    converted to text, like `logging.handlers.QueueHandler` does.
+    """
+    data = dict(record.__dict__)
+    data['msg'] = record.getMessage()
+    data['args'] = None
+    if record.exc_info and not record.exc_text:
+        data['exc_text'] = logging.Formatter().formatException(
+            record.exc_info)
+    data['exc_info'] = None
+    data.pop('message', None)
+    return data
+
+
+def _sanitize(data):
+    """ Makes sure all the values in the dictionary can be pickled. """
+    return dict(
+        (key, value if isinstance(value, _PLAIN_TYPES) else repr(value))
+        for key, value in data.items())
+
+
+class ChildLogHandler(logging.Handler):
+    """
+    Sends the records of a worker process to the :class:`LogCollector`.
+
+    The records are collected in batches of `batch_size` and sent when the
+    batch is full, when a record with a level of at least `flush_level`
+    arrives, after `flush_interval` seconds or when the handler is flushed
+    or closed.
+    """
+    def __init__(self, address, authkey, batch_size=100, flush_interval=0.5,
+                 flush_level=logging.ERROR):
+        super(ChildLogHandler, self).__init__()
+        self.connection = Client(address, authkey=authkey)
+        self.batch = []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.stopping = threading.Event()
+        self.flusher = None
+        if flush_interval:
+            self.flusher = threading.Thread(
+                target=self._flush_periodically, name='log-batch-flush')
+            self.flusher.daemon = True
+            self.flusher.start()
+
+    def _flush_periodically(self):
+        """ Runs in a background thread. """
+        while not self.stopping.wait(self.flush_interval):
+            if self.batch:
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+
+    def emit(self, record):
+        try:
+            self.batch.append(prepare_record(record))
+            if len(self.batch) >= self.batch_size or \
+                    record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """ Sends the records in the batch to the collector. """
+        self.acquire()
+        try:
+            if not self.batch or self.connection is None:
+                return
+            batch = self.batch
+            self.batch = []
+            try:
+                data = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = pickle.dumps(
+                    [_sanitize(item) for item in batch],
+                    pickle.HIGHEST_PROTOCOL)
+            self.connection.send_bytes(data)
+        finally:
+            self.release()
+
+    def close(self):
+        self.stopping.set()
+        self.acquire()
+        try:
+            if self.connection is not None:
+                self.flush()
+                self.connection.close()
+                self.connection = None
+        finally:
+            self.release()
+        super(ChildLogHandler, self).close()
+
+
+def init_worker(address, authkey, level=logging.NOTSET, batch_size=100,
+                flush_interval=0.5):
+    """
+    Sends the log of a worker process to the parent.
+
+    The handlers inherited from the parent are removed from all
+    the loggers (without being closed, as they belong to the parent) and
+    a :class:`ChildLogHandler` is installed on the root logger.
+    The records still in the batch are sent when the process exits
+    normally.
+
+    Arguments:
+        address, authkey:
+            Where the :class:`LogCollector` listens; see its `initargs`.
+        level:
+            The level of the root logger in the worker.
+    """
+    root = logging.getLogger()
+    for item in list(root.manager.loggerDict.values()):
+        if isinstance(item, logging.Logger):
+            item.handlers = []
+    handler = ChildLogHandler(
+        address, authkey, batch_size=batch_size,
+        flush_interval=flush_interval)
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    # atexit handlers do not run in the processes of multiprocessing.
+    Finalize(handler, handler.close, exitpriority=100)
+    return handler
+
+
+class LogCollector(object):
+    """
+    Receives the records of the worker processes and logs them.
+
+    Each worker gets its own connection, read by its own thread, so
+    the workers never wait for each other. The records are handled by
+    the logger with the same name in this process.
+
+    Attributes:
+        address:
+            Where the collector listens.
+        initializer, initargs:
+            To be passed to `multiprocessing.Pool` or
+            `concurrent.futures.ProcessPoolExecutor`.
+        received (int):
+            The number of records that were received.
+    """
+    def __init__(self, level=None, batch_size=100, flush_interval=0.5):
+        self.authkey = os.urandom(16)
+        self.listener = None
+        self.address = None
+        self.level = level
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.acceptor = None
+        self.readers = []
+        self.stopping = False
+        self.received = 0
+        self.lock = threading.Lock()
+
+    @property
+    def initializer(self):
+        return init_worker
+
+    @property
+    def initargs(self):
+        level = self.level
+        if level is None:
+            level = logging.getLogger().getEffectiveLevel()
+        return (self.address, self.authkey, level, self.batch_size,
+                self.flush_interval)
+
+    def start(self):
+        """ Starts listening for workers. """
+        self.listener = Listener(authkey=self.authkey)
+        self.address = self.listener.address
+        self.stopping = False
+        self.acceptor = threading.Thread(
+            target=self._accept, name='log-collector')
+        self.acceptor.daemon = True
+        self.acceptor.start()
+        return self
+
+    def _accept(self):
+        """ Runs in a background thread. """
+        while not self.stopping:
+            try:
+                connection = self.listener.accept()
+            except Exception as e:
+                # including AuthenticationError for foreign clients
+                if self.stopping:
+                    break
+                logger.debug("A worker failed to connect: %s", e)
+                continue
+            # The connection that wakes the thread up in stop() fails
+            # the authentication, so this one is a worker that connected
+            # before stop() and its records are read even if stopping.
+            reader = threading.Thread(
+                target=self._read, args=(connection, ),
+                name='log-collector-reader')
+            reader.daemon = True
+            with self.lock:
+                self.readers.append(reader)
+            reader.start()
+
+    def _read(self, connection):
+        """ Logs the records received from a worker. """
+        try:
+            while True:
+                try:
+                    batch = pickle.loads(connection.recv_bytes())
+                except (EOFError, OSError):
+                    break
+                for data in batch:
+                    record = logging.makeLogRecord(data)
+                    logging.getLogger(record.name).handle(record)
+                with self.lock:
+                    self.received = self.received + len(batch)
+        finally:
+            connection.close()
+
+    def stop(self, timeout=None):
+        """
+        Stops listening and waits for the workers to disconnect.
+
+        Call this after the workers finished (e.g. after the pool was shut
+        down), so the records they sent when exiting are logged.
+        """
+        if self.listener is None:
+            return
+        self.stopping = True
+        # accept() does not return when the listener is closed from
+        # another thread, so connect to wake it up. A plain socket is used
+        # because the thread may have already seen `stopping` and a Client
+        # would then wait forever for the authentication challenge.
+        if isinstance(self.address, tuple):
+            family = socket.AF_INET
+        elif self.address.startswith('\\\\'):
+            # A named pipe on Windows.
+            family = None
+        else:
+            family = socket.AF_UNIX
+        if family is None:
+            # Without the authkey the client does not take part in
+            # the handshake, so it can not wait for it.
+            try:
+                Client(self.address).close()
+            except OSError:
+                pass
+        else:
+            wake = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                wake.connect(self.address)
+            except OSError:
+                pass
+            finally:
+                wake.close()
+        self.acceptor.join(timeout)
+        self.listener.close()
+        self.listener = None
+        with self.lock:
+            readers = list(self.readers)
+            self.readers = []
+        for reader in readers:
+            reader.join(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
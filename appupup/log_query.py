@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""
+Finds records in the log files written by :func:`appupup.log.setup_logging`
+by time, level and logger name without reading the whole file.
+
+A sparse index is kept next to the log file (`app.log` is indexed in
+`.app.log.idx`). The file is split in blocks of about `block_size` bytes
+that start and end at record boundaries, and the index stores for each
+block its location, the range of the times of its records, their levels
+and the names of their loggers. A query only reads (through a memory map)
+the blocks that may contain matching records plus the end of the file
+that is not yet covered by a block.
+
+The index is updated before each query: the new complete blocks are
+appended to it. It is rebuilt if the log file was replaced
+(e.g. rotated) or truncated.
+
+Both the text and the JSON lines formats of `setup_logging` are
+understood; lines that do not start a record (e.g. tracebacks) belong to
+the record before them. Use it from the command line with:
+
+    python -m appupup.log_query --since "2019-11-15 14:00" \\
+        --until "2019-11-15 14:05" --level ERROR app.log
+
+or add it to an application with :func:`setup_parser`.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import fnmatch
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import time
+from zlib import crc32
+
+logger = logging.getLogger('appupup')
+
+INDEX_VERSION = 1
+
+# The default size of a block in bytes.
+BLOCK_SIZE = 256 * 1024
+
+# The number of bytes at the start of the log file that identify it.
+SIGNATURE_SIZE = 4096
+
+# Blocks with more loggers than this do not list them.
+MAX_BLOCK_NAMES = 64
+
+# The first line of a record in the text format...
+TEXT_LINE = re.compile(
+    br'(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)[^ \n]* '
+    br'\[([^\]\n]+?) *\] \[([^\]\n]*?) *\]')
+
+# ... and in the JSON format (the keys are always in this order).
+JSON_LINE = re.compile(
+    br'\{"time":"(\d{4}-\d\d-\d\d)T(\d\d:\d\d:\d\d)[^"]*",'
+    br'"level":"([^"]+)","name":"((?:[^"\\]|\\.)*)"')
+
+# The formats accepted for the limits of the time range.
+TIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M',
+)
+CLOCK_FORMATS = ('%H:%M:%S', '%H:%M')
+
+_level_numbers = {}
+
+
+def level_number(name):
+    """ The number of a level given its name as it appears in the log. """
+    try:
+        return _level_numbers[name]
+    except KeyError:
+        number = logging.getLevelName(name)
+        if not isinstance(number, int):
+            try:
+                number = int(name.split()[-1])
+            except (ValueError, IndexError):
+                number = 0
+        _level_numbers[name] = number
+        return number
+
+
+def parse_line(data, start, end):
+    """
+    Reads the fields of the line that starts at `start`.
+
+    Returns:
+        (time, level number, logger name) or None if the line does not
+        start a record. The time is a `YYYY-MM-DD HH:MM:SS` string.
+    """
+    match = TEXT_LINE.match(data, start, end)
+    if match is not None:
+        when, level, name = match.groups()
+        return (when.decode('ascii'),
+                level_number(level.decode('utf-8', 'replace')),
+                name.decode('utf-8', 'replace'))
+    match = JSON_LINE.match(data, start, end)
+    if match is not None:
+        day, clock, level, name = match.groups()
+        name = name.decode('utf-8', 'replace')
+        if '\\' in name:
+            name = json.loads('"%s"' % name)
+        return ('%s %s' % (day.decode('ascii'), clock.decode('ascii')),
+                level_number(level.decode('utf-8', 'replace')), name)
+    return None
+
+
+def iter_records(data, start, end):
+    """
+    Finds the records in a region of the log.
+
+    Only complete lines are considered. Lines at the start of the region
+    that do not start a record are reported as a record without fields.
+
+    Yields:
+        (start offset, end offset, time, level number, logger name)
+    """
+    current = None
+    position = start
+    while position < end:
+        line_end = data.find(b'\n', position, end)
+        if line_end < 0:
+            break
+        following = line_end + 1
+        fields = parse_line(data, position, line_end)
+        if fields is None:
+            if current is None:
+                current = [position, following, None, 0, '']
+            else:
+                current[1] = following
+        else:
+            if current is not None:
+                yield tuple(current)
+            current = [position, following, fields[0], fields[1], fields[2]]
+        position = following
+    if current is not None:
+        yield tuple(current)
+
+
+def parse_time(text, now=None):
+    """
+    Converts the limit of a time range to the format used in the log.
+
+    A time without a date (`14:05`) refers to the current day.
+    """
+    for time_format in TIME_FORMATS:
+        try:
+            return time.strftime(
+                '%Y-%m-%d %H:%M:%S', time.strptime(text, time_format))
+        except ValueError:
+            pass
+    for time_format in CLOCK_FORMATS:
+        try:
+            clock = time.strptime(text, time_format)
+        except ValueError:
+            continue
+        day = time.localtime(now)
+        return '%04d-%02d-%02d %02d:%02d:%02d' % (
+            day.tm_year, day.tm_mon, day.tm_mday,
+            clock.tm_hour, clock.tm_min, clock.tm_sec)
+    raise ValueError("Unknown time format: %s" % text)
+
+
+class Query(object):
+    """
+    The conditions that a record must meet.
+
+    Arguments:
+        since:
+            The records at or after this time (`YYYY-MM-DD HH:MM:SS`).
+        until:
+            The records before this time.
+        level (int):
+            The minimum level of the records.
+        names:
+            A list of logger names that may contain shell-style wildcards.
+    """
+    def __init__(self, since=None, until=None, level=None, names=None):
+        self.since = since
+        self.until = until
+        self.level = level
+        self.match_name = None
+        if names:
+            self.match_name = re.compile('|'.join(
+                '(?:%s)' % fnmatch.translate(name) for name in names)).match
+
+    def accepts(self, when, level, name):
+        """ Tells if a record matches. """
+        if when is None:
+            # Lines that do not belong to any record.
+            return self.since is None and self.until is None and \
+                self.level is None and self.match_name is None
+        if self.since is not None and when < self.since:
+            return False
+        if self.until is not None and when >= self.until:
+            return False
+        if self.level is not None and level < self.level:
+            return False
+        if self.match_name is not None and self.match_name(name) is None:
+            return False
+        return True
+
+    def may_match(self, block):
+        """ Tells if a block may contain matching records. """
+        if self.since is not None and block.last < self.since:
+            return False
+        if self.until is not None and block.first >= self.until:
+            return False
+        if self.level is not None and max(block.levels) < self.level:
+            return False
+        if self.match_name is not None and block.names is not None:
+            match_name = self.match_name
+            return any(match_name(name) for name in block.names)
+        return True
+
+
+class Block(object):
+    """
+    The summary of a part of the log file.
+
+    `first` and `last` are the earliest and latest times in the block
+    (empty if no line in the block starts a record), `levels` the set of
+    level numbers and `names` the set of logger names (None if there are
+    too many).
+    """
+    __slots__ = ('offset', 'end', 'first', 'last', 'levels', 'names')
+
+    def __init__(self, offset, end=None, first='', last='', levels=None,
+                 names=None):
+        self.offset = offset
+        self.end = end
+        self.first = first
+        self.last = last
+        self.levels = set() if levels is None else set(levels)
+        self.names = set() if names is None else names
+
+    def add(self, when, level, name):
+        """ Includes a record in the summary. """
+        if when is not None:
+            if not self.first or when < self.first:
+                self.first = when
+            if when > self.last:
+                self.last = when
+        self.levels.add(level)
+        if self.names is not None:
+            self.names.add(name)
+            if len(self.names) > MAX_BLOCK_NAMES:
+                self.names = None
+
+    def to_json(self):
+        return json.dumps([
+            self.offset, self.end, self.first, self.last,
+            sorted(self.levels),
+            None if self.names is None else sorted(self.names)],
+            separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        offset, end, first, last, levels, names = json.loads(text)
+        return cls(offset, end, first, last, levels,
+                   None if names is None else set(names))
+
+
+class LogIndex(object):
+    """
+    The sparse index of a log file.
+
+    Arguments:
+        path:
+            The log file.
+        block_size (int):
+            The approximate size of a block in bytes.
+        index_path:
+            Where the index is kept; by default a hidden file next to the log.
+    """
+    def __init__(self, path, block_size=BLOCK_SIZE, index_path=None):
+        if index_path is None:
+            directory, name = os.path.split(path)
+            index_path = os.path.join(directory, '.%s.idx' % name)
+        self.path = path
+        self.index_path = index_path
+        self.block_size = block_size
+        self.blocks = []
+        self.signature = None
+        self.loaded = False
+
+    @property
+    def indexed_end(self):
+        """ The offset where the part that is not indexed starts. """
+        return self.blocks[-1].end if self.blocks else 0
+
+    def _signature(self, data, size):
+        """ Identifies the log file by its first bytes. """
+        size = min(size, SIGNATURE_SIZE)
+        return [size, crc32(data[:size])]
+
+    def load(self):
+        """ Reads the index from its file; returns False if not usable. """
+        self.blocks = []
+        self.signature = None
+        try:
+            with open(self.index_path, 'r') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != INDEX_VERSION or \
+                        header.get('block_size') != self.block_size:
+                    return False
+                self.signature = header['signature']
+                self.blocks = [Block.from_json(line) for line in f]
+            return True
+        except (OSError, ValueError, KeyError, TypeError):
+            self.blocks = []
+            self.signature = None
+            return False
+
+    def _write(self, blocks, rewrite):
+        """ Saves the index; the new blocks are appended if possible. """
+        try:
+            if rewrite:
+                temp = self.index_path + '.tmp'
+                with open(temp, 'w') as f:
+                    f.write(json.dumps({
+                        'version': INDEX_VERSION,
+                        'block_size': self.block_size,
+                        'signature': self.signature}) + '\n')
+                    for block in blocks:
+                        f.write(block.to_json() + '\n')
+                os.replace(temp, self.index_path)
+            elif blocks:
+                with open(self.index_path, 'a') as f:
+                    for block in blocks:
+                        f.write(block.to_json() + '\n')
+        except OSError as e:
+            logger.debug("Could not save the log index %s: %s",
+                         self.index_path, e)
+
+    def _scan(self, data, start, end):
+        """ Creates the complete blocks in a region of the log. """
+        blocks = []
+        block = None
+        for offset, _, when, level, name in iter_records(data, start, end):
+            if block is not None and offset - block.offset >= self.block_size:
+                block.end = offset
+                blocks.append(block)
+                block = None
+            if block is None:
+                block = Block(offset)
+            block.add(when, level, name)
+        # The last block is left out as more lines of its last record
+        # may still come.
+        return blocks
+
+    def update(self, data=None, size=None):
+        """
+        Indexes the part of the log file that was added since last update.
+
+        Arguments:
+            data, size:
+                The memory map of the log file and its size, if they are
+                already available.
+
+        Returns:
+            The number of new blocks.
+        """
+        if data is None:
+            with open(self.path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return self._reset()
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                        as data:
+                    return self.update(data, size)
+
+        if not self.loaded:
+            self.load()
+            self.loaded = True
+
+        signature = self.signature
+        if signature is None or size < signature[0] or \
+                crc32(data[:signature[0]]) != signature[1] or \
+                size < self.indexed_end:
+            # Another file or a truncated one.
+            self.blocks = []
+        # The signature of a small file changes as the file grows.
+        self.signature = self._signature(data, size)
+        rewrite = self.signature != signature
+
+        blocks = self._scan(data, self.indexed_end, size)
+        self.blocks.extend(blocks)
+        if rewrite:
+            self._write(self.blocks, True)
+        else:
+            self._write(blocks, False)
+        return len(blocks)
+
+    def _reset(self):
+        """ The log file is empty. """
+        self.blocks = []
+        self.signature = None
+        self.loaded = True
+        try:
+            os.remove(self.index_path)
+        except OSError:
+            pass
+        return 0
+
+    def regions(self, query, size):
+        """
+        The parts of the log file that may contain matching records.
+
+        Returns:
+            A list of (start, end) offsets; adjacent regions are merged.
+        """
+        result = []
+        candidates = [(block.offset, block.end) for block in self.blocks
+                      if query.may_match(block)]
+        candidates.append((self.indexed_end, size))
+        for start, end in candidates:
+            if start >= end:
+                continue
+            if result and result[-1][1] == start:
+                result[-1] = (result[-1][0], end)
+            else:
+                result.append((start, end))
+        return result
+
+
+def query_log(path, query, use_index=True, block_size=BLOCK_SIZE):
+    """
+    Finds the records in a log file that match a query.
+
+    Arguments:
+        path:
+            The log file.
+        query (Query):
+            The conditions.
+        use_index (bool):
+            Use (and update) the index; False reads the whole file.
+        block_size (int):
+            The size of the blocks of the index.
+
+    Yields:
+        The text of each matching record, including its final new line.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if use_index:
+                index = LogIndex(path, block_size=block_size)
+                index.update(data, size)
+                regions = index.regions(query, size)
+            else:
+                regions = [(0, size)]
+            accepts = query.accepts
+            for start, end in regions:
+                for offset, stop, when, level, name in \
+                        iter_records(data, start, end):
+                    if accepts(when, level, name):
+                        yield data[offset:stop].decode('utf-8', 'replace')
+
+
+def add_arguments(parser):
+    """ Adds the arguments of the query command to a parser. """
+    parser.add_argument(
+        '--since', metavar='time',
+        help='only records at or after this time (YYYY-MM-DD HH:MM[:SS] '
+             'or HH:MM[:SS] for today)')
+    parser.add_argument(
+        '--until', metavar='time',
+        help='only records before this time')
+    parser.add_argument(
+        '--level', metavar='level',
+        help='only records with this level or higher (name or number)')
+    parser.add_argument(
+        '--name', metavar='logger', action='append', dest='names',
+        help='only records from this logger (wildcards allowed); '
+             'can be repeated')
+    parser.add_argument(
+        '--no-index', action='store_true', default=False,
+        help='read the whole file instead of using the index')
+
+
+def make_query(args):
+    """ Creates the query described by the arguments. """
+    level = args.level
+    if level is not None:
+        level = int(level) if level.isdigit() else level_number(level.upper())
+    return Query(
+        since=None if args.since is None else parse_time(args.since),
+        until=None if args.until is None else parse_time(args.until),
+        level=level, names=args.names)
+
+
+def query_command(args, logger=None):
+    """
+    Prints the matching records from `args.log_query_file`, falling back to
+    `args.log_file`.
+    """
+    path = getattr(args, 'log_query_file', None) or args.log_file
+    try:
+        query = make_query(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        for text in query_log(path, query, use_index=not args.no_index):
+            sys.stdout.write(text)
+    except OSError as e:
+        print("%s: %s" % (path, e), file=sys.stderr)
+        return 1
+    return 0
+
+
+def setup_parser(subparsers, name='log-query'):
+    """
+    Adds the query command to an application.
+
+    Example:
+
+        >>> def setup_parser(parent_parser):
+        ...     subparsers = parent_parser.add_subparsers()
+        ...     appupup.log_query.setup_parser(subparsers)
+
+    The command queries the log file of the application unless a file is
+    given.
+    """
+    parser = subparsers.add_parser(
+        name, help='find records in the log file by time, level and logger')
+    add_arguments(parser)
+    parser.add_argument(
+        'log_query_file', nargs='?', metavar='file',
+        help='the log file; by default the one of the application')
+    parser.set_defaults(func=query_command)
+    return parser
+
+
+def main(argv=None):
+    """ Prints the records in a log file that match the arguments. """
+    parser = argparse.ArgumentParser(
+        description='Finds records in a log file by time, level and logger.')
+    add_arguments(parser)
+    parser.add_argument('log_file', metavar='file', help='the log file')
+    return query_command(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Moves the work of the logging handlers to a background thread.
+
+The handlers of a logger are replaced by a `QueueHandler` that places
+the records in a bounded :class:`LogQueue`; a :class:`BackgroundListener`
+thread takes them from there and passes them to the original handlers.
+The thread that logs only pays for preparing the record and appending it
+to the queue.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from collections import deque, Counter
+import logging
+import logging.handlers
+import threading
+
+# What to do when a record arrives and the queue is full.
+BLOCK = 'block'
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+OVERFLOW_POLICIES = (BLOCK, DROP_NEWEST, DROP_OLDEST)
+
+# The key under which the sentinel of the listener is stored; it is never
+# dropped and does not count towards the size of the queue.
+_SENTINEL_LEVEL = float('inf')
+
+
+class LogQueue(object):
+    """
+    A bounded queue of log records.
+
+    When the queue is full a new record either waits for room (`block`),
+    is dropped (`drop-newest`), or replaces the oldest record that has the
+    lowest level which is not higher than its own (`drop-oldest`); if all
+    the queued records have a higher level the new one is dropped.
+
+    The records are kept in a deque for each level, each record being
+    tagged with a sequence number so that they are retrieved in the order
+    in which they arrived.
+
+    Once the sentinel was put the queue is closed: the records no longer
+    wait for room, so a producer that was blocked does not wait forever
+    for a listener that stopped; :meth:`BackgroundListener.stop` handles
+    the records that arrive after the sentinel.
+
+    Attributes:
+        dropped (collections.Counter):
+            The number of records that were dropped for each level.
+        closed (bool):
+            The sentinel was put in the queue.
+    """
+    def __init__(self, maxsize=10000, overflow=BLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                "overflow should be one of %s" % ', '.join(OVERFLOW_POLICIES))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = Counter()
+        self.closed = False
+        self.size = 0
+        self.sequence = 0
+        self.levels = {}
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dropped_total(self):
+        """ The number of records that were dropped. """
+        return sum(self.dropped.values())
+
+    def _append(self, level, record):
+        """ Stores a record; the lock must be held. """
+        try:
+            queue = self.levels[level]
+        except KeyError:
+            queue = self.levels[level] = deque()
+        queue.append((self.sequence, record))
+        self.sequence = self.sequence + 1
+        self.not_empty.notify()
+
+    def _drop_oldest(self, level):
+        """ Drops a record to make room for one with given level. """
+        candidates = [key for key, queue in self.levels.items()
+                      if queue and key <= level]
+        if not candidates:
+            return False
+        lowest = min(candidates)
+        self.levels[lowest].popleft()
+        self.dropped[lowest] += 1
+        self.size = self.size - 1
+        return True
+
+    def put(self, record, block=True, timeout=None):
+        """
+        Adds a record to the queue observing the overflow policy.
+
+        `None` is the sentinel used by the listener to stop and is always
+        accepted. The `block` and `timeout` arguments are only there for
+        compatibility with `queue.Queue`.
+        """
+        with self.lock:
+            if record is None:
+                self._append(_SENTINEL_LEVEL, None)
+                self.closed = True
+                self.not_full.notify_all()
+                return
+
+            level = record.levelno
+            if self.size >= self.maxsize:
+                if self.overflow == BLOCK:
+                    while self.size >= self.maxsize and not self.closed:
+                        self.not_full.wait()
+                elif self.overflow == DROP_NEWEST or \
+                        not self._drop_oldest(level):
+                    self.dropped[level] += 1
+                    return
+
+            self.size = self.size + 1
+            self._append(level, record)
+
+    put_nowait = put
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the oldest record.
+
+        The `timeout` argument is only there for compatibility with
+        `queue.Queue`.
+        """
+        with self.lock:
+            while not any(self.levels.values()):
+                if not block:
+                    raise IndexError('the queue is empty')
+                self.not_empty.wait()
+
+            oldest = None
+            for key, queue in self.levels.items():
+                if queue and (oldest is None or
+                              queue[0][0] < self.levels[oldest][0][0]):
+                    oldest = key
+            _, record = self.levels[oldest].popleft()
+            if record is not None:
+                self.size = self.size - 1
+                self.not_full.notify()
+            return record
+
+    get_nowait = get
+
+
+class BackgroundListener(logging.handlers.QueueListener):
+    """
+    Passes the records from the queue to the real handlers.
+
+    Unlike its parent it can be stopped more than once and it flushes
+    the handlers after the queue was drained, including the records that
+    were put after the sentinel by producers that were waiting for room.
+    """
+    def __init__(self, queue, *handlers):
+        super(BackgroundListener, self).__init__(
+            queue, *handlers, respect_handler_level=True)
+
+    def stop(self):
+        """ Processes the records in the queue, then stops the thread. """
+        if self._thread is None:
+            return
+        super(BackgroundListener, self).stop()
+        while True:
+            try:
+                record = self.queue.get(block=False)
+            except IndexError:
+                break
+            if record is not None:
+                self.handle(record)
+        for handler in self.handlers:
+            handler.flush()
+
+
+def start_queue_logging(logger=None, maxsize=10000, overflow=BLOCK):
+    """
+    Moves the handlers of a logger behind a queue.
+
+    Arguments:
+        logger (logging.Logger):
+            The logger whose handlers are moved; root logger by default.
+        maxsize (int):
+            The maximum number of records waiting in the queue.
+        overflow (str):
+            What to do when the queue is full; one of `OVERFLOW_POLICIES`.
+
+    Returns:
+        The listener, which was started. Call its `stop()` method to
+        drain the queue before the program exits; the queue is
+        the `queue` attribute of the listener, the logger is
+        the `logger` attribute and the handler that was installed in
+        the logger is `queue_handler`.
+    """
+    if logger is None:
+        logger = logging.getLogger()
+
+    queue = LogQueue(maxsize=maxsize, overflow=overflow)
+    listener = BackgroundListener(queue, *logger.handlers)
+    listener.logger = logger
+    listener.queue_handler = logging.handlers.QueueHandler(queue)
+    logger.handlers = [listener.queue_handler]
+    listener.start()
+    return listener
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Compiles the rules of a :class:`~appupup.log.DebugLogger` into a single
+decision function.
+
+The handler used to walk all of its rule attributes for every record.
+Instead, the rules that are set are turned into the source of a function
+that only contains the checks that are needed and which is then compiled
+once. Rules that are left as `None` do not appear in that function at all.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import re
+from functools import lru_cache
+
+# The Pattern was introduced in python 3.7
+try:
+    _ = re.Pattern
+
+    def is_pattern_object(x):
+        return isinstance(x, re.Pattern)
+
+except AttributeError:
+    def is_pattern_object(x):
+        return type(x).__name__ == 'SRE_Pattern'
+
+
+# The outcomes of a decision function.
+REJECT = 0
+ACCEPT = 1
+HANDLED = 2
+
+# The kinds of rules.
+PATTERN = 'pattern'
+INTERVAL = 'interval'
+MEMBERSHIP = 'in'
+
+# The prefixes of the rules in the order in which they are checked.
+RULE_PREFIXES = ('exclude', 'include', 'callback')
+
+# The fields that can be filtered in the order in which they are checked.
+# Each entry has the suffix of the rule attribute, the attribute of
+# the record and the kind of the rule.
+RULE_FIELDS = (
+    ('thread_pattern', 'threadName', PATTERN),
+    ('name_pattern', 'name', PATTERN),
+    ('file_name_pattern', 'filename', PATTERN),
+    ('func_name_pattern', 'funcName', PATTERN),
+    ('level_name_pattern', 'levelname', PATTERN),
+    ('level_number_pattern', 'levelno', PATTERN),
+    ('line_number_pattern', 'lineno', PATTERN),
+    ('message_pattern', 'message', PATTERN),
+    ('module_pattern', 'module', PATTERN),
+    ('path_pattern', 'pathname', PATTERN),
+    ('process_pattern', 'processName', PATTERN),
+    ('created_interval', 'created', INTERVAL),
+    ('relative_created_interval', 'relativeCreated', INTERVAL),
+    ('level_in', 'levelno', MEMBERSHIP),
+)
+
+# The attributes of the record that are the same for all the records
+# issued from a call site (the level name follows the level number).
+STATIC_ATTRIBUTES = frozenset((
+    'name', 'filename', 'funcName', 'levelname', 'levelno', 'lineno',
+    'module', 'pathname',
+))
+
+# With fewer static rules that only compare strings a cache lookup
+# costs more than evaluating the rules.
+CACHE_MIN_RULES = 6
+
+# Parts of a regular expression that change their meaning when the
+# expression is placed inside an alternation.
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+# The names of all the rule attributes of the handler.
+RULE_NAMES = frozenset(
+    '%s_%s' % (prefix, field[0])
+    for prefix in RULE_PREFIXES
+    for field in RULE_FIELDS)
+
+
+def is_collection(x):
+    """ Tells if a rule holds several values, patterns or intervals. """
+    return isinstance(x, (list, tuple, set, frozenset))
+
+
+def _mergeable(pattern):
+    """ Tells if a pattern keeps its meaning inside an alternation. """
+    return not (_BACKREFERENCE.search(pattern.pattern) or
+                _GLOBAL_FLAGS.match(pattern.pattern))
+
+
+def merge_patterns(patterns):
+    """
+    Combines regular expressions into as few as possible.
+
+    The patterns that have the same flags are joined in a single
+    alternation, so a value is checked against all of them in a single
+    call. Patterns that use back-references or global inline flags
+    are kept as they are.
+
+    Returns:
+        A list of compiled patterns.
+    """
+    by_flags = {}
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern.pattern, str) and _mergeable(pattern):
+            by_flags.setdefault(pattern.flags, []).append(pattern)
+        else:
+            result.append(pattern)
+
+    for flags, group in by_flags.items():
+        if len(group) == 1:
+            result.extend(group)
+            continue
+        try:
+            result.append(re.compile(
+                '|'.join('(?:%s)' % pattern.pattern for pattern in group),
+                flags))
+        except re.error:
+            # e.g. the same group name used in two patterns
+            result.extend(group)
+    return result
+
+
+def _matcher(strings, matchers):
+    """ Creates a function that checks a value against a mixed rule. """
+    def matches(value):
+        value = str(value)
+        if value in strings:
+            return True
+        for match in matchers:
+            if match(value):
+                return True
+        return False
+    return matches
+
+
+def _pattern_condition(rule, value, key, namespace):
+    """ Creates the expression for a pattern rule. """
+    if not is_collection(rule):
+        rule = (rule, )
+    strings = frozenset(str(x) for x in rule if not is_pattern_object(x))
+    matchers = [pattern.match for pattern in merge_patterns(
+        [x for x in rule if is_pattern_object(x)])]
+
+    if len(matchers) == 0:
+        if len(strings) == 1:
+            namespace[key] = next(iter(strings))
+            return 'str(%s) == %s' % (value, key)
+        namespace[key] = strings
+        return 'str(%s) in %s' % (value, key)
+    elif len(matchers) == 1 and not strings:
+        namespace[key] = matchers[0]
+        return '%s(str(%s))' % (key, value)
+    namespace[key] = _matcher(strings, matchers)
+    return '%s(%s)' % (key, value)
+
+
+def _condition(kind, rule, value, key, namespace):
+    """
+    Creates the expression that is true if the value matches the rule.
+
+    Arguments:
+        kind:
+            The kind of the rule (one of PATTERN, INTERVAL, MEMBERSHIP).
+        rule:
+            The pattern, interval or collection set by the user.
+        value:
+            The expression that produces the value to check.
+        key:
+            Unique name used for the objects stored in the namespace.
+        namespace:
+            The globals of the function that is being compiled.
+    """
+    if kind == PATTERN:
+        return _pattern_condition(rule, value, key, namespace)
+    elif kind == INTERVAL:
+        if not is_collection(rule[0]):
+            rule = (rule, )
+        conditions = []
+        for index, (low, high) in enumerate(rule):
+            namespace['%s_low%d' % (key, index)] = low
+            namespace['%s_high%d' % (key, index)] = high
+            conditions.append('%s_low%d <= %s <= %s_high%d' % (
+                key, index, value, key, index))
+        return ' or '.join(conditions)
+    else:
+        namespace[key] = rule
+        return '%s in %s' % (value, key)
+
+
+def _value(attribute, lazy):
+    """ Creates the expression that reads an attribute of the record. """
+    if lazy and attribute == 'message':
+        # The record was not formatted so `record.message` is not set.
+        return 'msg.message'
+    return 'record.%s' % attribute
+
+
+def _rejects(prefix, kind, condition, outcome='REJECT'):
+    """ Creates the statement that rejects the record. """
+    if prefix == 'exclude' and kind == PATTERN:
+        return 'if %s: return %s' % (condition, outcome)
+    return 'if not (%s): return %s' % (condition, outcome)
+
+
+def _calls_back(condition, key):
+    """ Creates the statement that calls the callback if matched. """
+    return 'if (%s) and not %s_callback(handler, msg, value, record): ' \
+           'return HANDLED' % (condition, key)
+
+
+def _has_regex(rule):
+    """ Tells if a pattern rule uses regular expressions. """
+    if is_collection(rule):
+        return any(is_pattern_object(x) for x in rule)
+    return is_pattern_object(rule)
+
+
+def _worth_caching(rules):
+    """ Tells if the static rules are costlier than a cache lookup. """
+    return len(rules) >= CACHE_MIN_RULES or any(
+        rule[2] == PATTERN and _has_regex(rule[3]) for rule in rules)
+
+
+def compile_rules(handler, lazy=False, cache_size=0, only=None):
+    """
+    Creates the decision function for the rules of a handler.
+
+    The function receives the formatted message and the record and returns
+    `ACCEPT` if the record should be issued, `REJECT` if it should be
+    filtered out and `HANDLED` if a callback decided its fate.
+
+    Excluding rules are checked first, followed by including rules and
+    callbacks. Interval and membership rules reject the records that
+    are outside, regardless of them being include or exclude rules.
+
+    The rules that only look at the fields in `STATIC_ATTRIBUTES` give
+    the same result for all the records issued from a call site. With
+    a `cache_size` these are evaluated in a separate function whose
+    results are kept in a LRU cache keyed by the values of those fields,
+    so only the remaining rules are checked when the cache is hit.
+    The decision function then has a `cache_info` attribute that returns
+    the hits and misses of the cache.
+
+    Arguments:
+        handler:
+            The handler that holds the rules.
+        lazy:
+            The record was not formatted and the function receives
+            a :class:`~appupup.log.LazyMessage` instead of the text.
+        cache_size:
+            The maximum number of entries in the cache; 0 disables it.
+            The cache is also not used if the static rules are cheaper
+            to evaluate than a cache lookup.
+        only:
+            If provided, only the include and exclude rules for these
+            attributes of the record are compiled (no callbacks).
+
+    Returns:
+        The decision function or None if no rule is set, in which case all
+        records are accepted.
+    """
+    # Collect the rules that were set, in the order in which they are checked.
+    rules = []
+    for prefix in RULE_PREFIXES:
+        for index, (suffix, attribute, kind) in enumerate(RULE_FIELDS):
+            if only is not None and (
+                    prefix == 'callback' or attribute not in only):
+                continue
+            rule = getattr(handler, '%s_%s' % (prefix, suffix))
+            if rule is None:
+                continue
+            callback = None
+            if prefix == 'callback':
+                rule, callback = rule
+            rules.append((prefix, attribute, kind, rule, callback,
+                          '%s_%d' % (prefix, index)))
+    if not rules:
+        return None
+
+    namespace = {
+        'REJECT': REJECT, 'ACCEPT': ACCEPT, 'HANDLED': HANDLED,
+        'handler': handler,
+    }
+    static_rules = [rule for rule in rules if rule[1] in STATIC_ATTRIBUTES]
+    cached = cache_size > 0 and _worth_caching(static_rules)
+
+    static_lines = []
+    lines = []
+    if cached:
+        # The static function receives the fields it needs as arguments
+        # so they make up the key of the cache.
+        parameters = []
+        for rule in static_rules:
+            if rule[1] not in parameters:
+                parameters.append(rule[1])
+        matched = []
+        for prefix, attribute, kind, rule, callback, key in static_rules:
+            condition = _condition(kind, rule, attribute, key, namespace)
+            if prefix == 'callback':
+                matched.append('bool(%s)' % condition)
+            else:
+                static_lines.append(
+                    _rejects(prefix, kind, condition, outcome='None'))
+        static_lines.append('return (%s)' % ''.join(
+            '%s, ' % condition for condition in matched))
+        lines.append('matched = static(%s)' % ', '.join(
+            'record.%s' % attribute for attribute in parameters))
+        lines.append('if matched is None: return REJECT')
+
+    static_index = 0
+    for prefix, attribute, kind, rule, callback, key in rules:
+        if prefix == 'callback':
+            namespace[key + '_callback'] = callback
+            lines.append('value = %s' % _value(attribute, lazy))
+            if cached and attribute in STATIC_ATTRIBUTES:
+                condition = 'matched[%d]' % static_index
+                static_index = static_index + 1
+            else:
+                condition = _condition(kind, rule, 'value', key, namespace)
+            lines.append(_calls_back(condition, key))
+        elif not cached or attribute not in STATIC_ATTRIBUTES:
+            lines.append(_rejects(prefix, kind, _condition(
+                kind, rule, _value(attribute, lazy), key, namespace)))
+
+    source = 'def decide(msg, record):\n    %s\n    return ACCEPT\n' % (
+        '\n    '.join(lines))
+    if cached:
+        source = 'def static(%s):\n    %s\n\n%s' % (
+            ', '.join(parameters), '\n    '.join(static_lines), source)
+    exec(compile(source, '<DebugLogger rules>', 'exec'), namespace)
+
+    decide = namespace['decide']
+    if cached:
+        namespace['static'] = lru_cache(maxsize=cache_size)(
+            namespace['static'])
+        decide.cache_info = namespace['static'].cache_info
+    return decide
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic sampling of log records.
+
+A :class:`Sampler` keeps a fraction of the records selected by its
+rules. Whether a record is kept depends on a hash of its key (the call
+site by default, or a field such as a request id), so all the records
+with the same key share the same fate, in all the processes and runs.
+The same hash is used by all the rules, so a request that is kept at 1%
+by a rule is also kept by the rules with higher rates.
+
+The sampler is used by :class:`appupup.log.DebugLogger` (see its `sample`
+argument) and, as it has a `filter()` method, it can also be added to any
+handler or logger:
+
+    >>> handler.addFilter(Sampler([SampleRule('db.*', 'DEBUG', 0.01)]))
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import fnmatch
+import logging
+import re
+from zlib import crc32
+
+from appupup.log_rules import is_pattern_object, is_collection
+
+# The hash of a key is compared with the rate scaled to this value.
+_HASH_RANGE = 1 << 32
+
+
+def _level_number(level):
+    """ Converts a level name to its number. """
+    if isinstance(level, str):
+        number = logging.getLevelName(level.upper())
+        if not isinstance(number, int):
+            raise ValueError("Unknown level %r" % level)
+        return number
+    return level
+
+
+class SampleRule(object):
+    """
+    Keeps a fraction of the records of some loggers.
+
+    Arguments:
+        name:
+            The name of the logger; a string that may contain shell-style
+            wildcards (`db.*`) or a compiled regular expression.
+        level:
+            The level (number or name) or a collection of levels of
+            the records that are sampled; None for all levels.
+        rate (float):
+            The fraction of the keys that are kept, between 0 and 1.
+        key:
+            None to sample by call site (file and line), otherwise
+            the name of an attribute of the record (an `extra` field such as
+            `request_id`) or a tuple of such names. Records that do not
+            have the attribute are sampled by call site.
+
+    With the call site as key the rate is the fraction of the call sites
+    that are kept, not of the records: all the records of a kept site are
+    logged and none of the others, so a busy site is either fully
+    present or absent. Use a key that changes from record to record
+    (e.g. a request id) to keep a fraction of the records of each site.
+    """
+    def __init__(self, name, level=None, rate=0.0, key=None):
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("The rate should be between 0 and 1")
+        if is_pattern_object(name):
+            self.match_name = name.match
+        else:
+            self.match_name = re.compile(fnmatch.translate(name)).match
+        if level is None:
+            self.levels = None
+        elif is_collection(level):
+            self.levels = frozenset(_level_number(x) for x in level)
+        else:
+            self.levels = frozenset((_level_number(level), ))
+        self.name = name
+        self.rate = rate
+        self.threshold = int(rate * _HASH_RANGE)
+        self.key = key
+        if isinstance(key, str) or (key is not None and len(key) == 1):
+            self.attribute = key if isinstance(key, str) else key[0]
+            self.attributes = None
+        else:
+            self.attribute = None
+            self.attributes = key
+
+    def __repr__(self):
+        return 'SampleRule(%r, %r, %r, %r)' % (
+            self.name, self.levels and sorted(self.levels),
+            self.rate, self.key)
+
+    def covers(self, name, level):
+        """ Tells if the rule applies to a logger and level. """
+        return (self.levels is None or level in self.levels) and \
+            self.match_name(name) is not None
+
+    def keeps(self, key):
+        """ Tells if the records with this key (a string) are kept. """
+        return crc32(key.encode('utf-8', 'replace')) < self.threshold
+
+
+class Sampler(object):
+    """
+    Applies the first :class:`SampleRule` that covers a record.
+
+    The rule that applies to each logger name and level and the outcome
+    for each call site are remembered (up to `cache_size` entries each),
+    so a record that is sampled out by call site only costs two
+    dictionary lookups.
+
+    Arguments:
+        rules:
+            A list of :class:`SampleRule` or of tuples with their arguments.
+        cache_size (int):
+            The maximum number of entries in each of the caches.
+    """
+    def __init__(self, rules, cache_size=4096):
+        self.rules = [rule if isinstance(rule, SampleRule)
+                      else SampleRule(*rule) for rule in rules]
+        self.cache_size = cache_size
+        self.rule_cache = {}
+        self.site_cache = {}
+
+    def rule_for(self, name, level):
+        """ The rule that applies to a logger and level (or None). """
+        for rule in self.rules:
+            if rule.covers(name, level):
+                return rule
+        return None
+
+    def filter(self, record):
+        """ Tells if the record is kept. """
+        try:
+            rule = self.rule_cache[(record.name, record.levelno)]
+        except KeyError:
+            rule = self.rule_for(record.name, record.levelno)
+            if len(self.rule_cache) >= self.cache_size:
+                self.rule_cache.clear()
+            self.rule_cache[(record.name, record.levelno)] = rule
+        if rule is None:
+            return True
+
+        attribute = rule.attribute
+        if attribute is not None:
+            value = getattr(record, attribute, None)
+            if value is not None:
+                return crc32(str(value).encode('utf-8', 'replace')) < \
+                    rule.threshold
+        elif rule.attributes is not None:
+            values = [getattr(record, name, None) for name in rule.attributes]
+            if any(value is not None for value in values):
+                return rule.keeps('\x00'.join(str(x) for x in values))
+
+        site = (rule, record.pathname, record.lineno)
+        try:
+            return self.site_cache[site]
+        except KeyError:
+            kept = rule.keeps('%s:%d' % (record.pathname, record.lineno))
+            if len(self.site_cache) >= self.cache_size:
+                self.site_cache.clear()
+            self.site_cache[site] = kept
+            return kept
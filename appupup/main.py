@@ -5,48 +5,15 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
-from datetime import datetime
-import logging
-import random
-import configparser
-import importlib
-import importlib.util
 
-from appupup.log import setup_logging
-from appupup.parse_args import make_argument_parser
-
-
-def overrides_file(base_package, args):
-    """ Find the location of the hook. """
-    while True:
-
-        result = args.hook_file
-        if result is not None:
-            break
-
-        result = os.path.abspath(
-            os.path.join(base_package, 'overrides.py'))
-        if os.path.exists(result):
-            break
-
-        result = os.path.abspath('overrides.py')
-        if os.path.exists(result):
-            break
-
-        result = os.path.abspath(
-            os.path.join(os.pardir, base_package, 'overrides.py'))
-        if os.path.exists(result):
-            break
-
-        result = None
-        break
-
-    return result
+# The other modules are imported by main() so that importing this module
+# stays cheap; see tests/integration/test_startup.py.
 
 
 def main(app_name, app_version, app_stage, app_author, app_description,
          app_url, parser_constructor=None, pre_hook=None, base_package=None,
-         log_for_console=False, *args, **kwargs):
+         log_for_console=False, *args, commands=None, settings=None,
+         hooks=None, **kwargs):
     """
     Entry point for the application.
 
@@ -93,16 +60,40 @@ def main(app_name, app_version, app_stage, app_author, app_description,
             The name of the package. Can be used to detect the location of the
             overrides file when the user does not provide one. By default
             this is the same as app_name.
+        hooks (dict):
+            Functions to call at some points of the run, by stage
+            (`pre_parse`, `post_config`, `post_logging`, `pre_run`,
+            `post_run`, `on_exit`); a stage can have a function or a list
+            of functions. The functions of the overrides file run after
+            these. See :mod:`appupup.hooks`.
         log_for_console (bool):
             Use a shorter format for console output; useful when the INFO
             level is intended for the user.
+        commands (list):
+            The subcommands of the application as a list of
+            :class:`~appupup.commands.Command`; only the module of
+            the command that runs is imported.
+        settings (appupup.arg_conf.Settings):
+            Settings resolved after the configuration was loaded and stored
+            in `args.settings`; if some are missing or invalid they are all
+            reported and 1 is returned without running the command.
 
     Returns:
         * 0 for normal exit
         * 1 for exit with error
         * -2 if an unhandled exception was triggered by the main function.
     """
-    random.seed(datetime.now())
+    import logging
+    import random
+    import sys
+    import time
+
+    from appupup.configure import load_config
+    from appupup.hooks import HookPipeline, find_hook_file, hook_file_from_argv
+    from appupup.log import setup_logging, shutdown_logging
+    from appupup.parse_args import make_argument_parser
+
+    random.seed(time.time())
 
     if base_package is None:
         base_package = app_name
@@ -112,64 +103,102 @@ def main(app_name, app_version, app_stage, app_author, app_description,
         app_author=app_author, app_name=app_name,
         app_description=app_description,
         parser_constructor=parser_constructor,
-        app_url=app_url)
+        app_url=app_url, commands=commands, app_version=app_version)
+
+    # Allow some overrides before starting the app.
+    # This would be a python module hidden from the version control used
+    # in debugging where you can e.g. filter logging output.
+    # It is loaded before parsing so that it can add arguments.
+    pipeline = HookPipeline(hooks)
+    hook_file = find_hook_file(
+        base_package, hook_file_from_argv(sys.argv[1:], parser))
+    if hook_file:
+        pipeline.load(hook_file)
+    pipeline.run('pre_parse', parser, *args, **kwargs)
     arguments = parser.parse_args()
     arguments.parser = parser
+    arguments.hooks = pipeline
 
     # load configuration
-    cfg = configparser.ConfigParser()
-    if len(arguments.config_file) > 0 and arguments.config_file != '-':
-        cfg.read(arguments.config_file)
-    arguments.cfg = cfg
+    arguments.cfg = load_config(
+        arguments.config_file,
+        cache_dir=os.path.join(arguments.udd, 'config-cache')
+        if arguments.config_cache else None)
+    pipeline.run('post_config', arguments, *args, **kwargs)
 
     # prepare the logger
     logger = logging.getLogger(app_name)
     setup_logging(args=arguments, app_name=app_name,
                   app_version=app_version, app_stage=app_stage,
                   log_for_console=log_for_console)
+    pipeline.restore_levels()
+    pipeline.start_reporting(logger)
+    if not hook_file:
+        logger.debug("No hook file was loaded")
 
-    logger.debug("config file is at %s", arguments.config_file)
+    arguments.config_watcher = None
+    if arguments.watch_config and arguments.config_file != '-':
+        from appupup.config_watch import settings_callback, watch_config
+        callbacks = []
+        if settings is not None:
+            callbacks.append(settings_callback(arguments, settings))
+        watch_config(arguments, callbacks=callbacks)
 
+    result = None
     try:
-        func = arguments.func
-    except AttributeError:
-        func = None
-        parser.print_help()
+        logger.debug("config file is at %s", arguments.config_file)
+        pipeline.run('post_logging', arguments, *args, **kwargs)
+
+        arguments.settings = None
+        if settings is not None:
+            from appupup.arg_conf import SettingsError
+            try:
+                arguments.settings = settings.resolve(arguments)
+            except SettingsError as e:
+                logger.error("%s", e)
+                return 1
 
-    # Allow some overrides before starting the app.
-    # This would be a python module hidden from the version control used
-    # in debugging where you can e.g. filter logging output.
-    hook_file = overrides_file(base_package=base_package, args=arguments)
-    if hook_file:
-        spec = importlib.util.spec_from_file_location(
-            "overrides", hook_file)
-        hook = importlib.util.module_from_spec(spec)
         try:
-            spec.loader.exec_module(hook)
-            hook.init(arguments, *args, **kwargs)
-        except ImportError:
-            pass
-    else:
-        logger.debug("No hook file was loaded")
+            func = arguments.func
+        except AttributeError:
+            func = None
+            parser.print_help()
 
-    if pre_hook:
-        pre_hook(arguments, *args, **kwargs)
+        if pre_hook:
+            pre_hook(arguments, *args, **kwargs)
+        pipeline.run('pre_run', arguments, *args, **kwargs)
 
-    # noinspection PyBroadException
-    try:
-        result = func(
-            arguments, logger,
-            *args, **kwargs) \
-            if func is not None else 0
-
-        if not isinstance(result, int):
-            if isinstance(result, bool):
-                result = 0 if result else 1
-            elif isinstance(result, str):
-                result = 0 if len(result) > 0 else 1
-            else:
+        # noinspection PyBroadException
+        try:
+            if func is None:
                 result = 0
-    except Exception:
-        logger.critical('Fatal error', exc_info=True)
-        result = -2
+            elif arguments.profile:
+                from appupup.profiling import profile_call
+                result = profile_call(
+                    arguments, app_name, func, arguments, logger,
+                    *args, **kwargs)
+            else:
+                result = func(arguments, logger, *args, **kwargs)
+
+            if not isinstance(result, int):
+                if isinstance(result, bool):
+                    result = 0 if result else 1
+                elif isinstance(result, str):
+                    result = 0 if len(result) > 0 else 1
+                else:
+                    result = 0
+        except Exception:
+            logger.critical('Fatal error', exc_info=True)
+            result = -2
+        pipeline.run('post_run', arguments, result, *args, **kwargs)
+    finally:
+        # noinspection PyBroadException
+        try:
+            pipeline.run('on_exit', arguments, result, *args, **kwargs)
+        except Exception:
+            logger.error('An on_exit hook failed', exc_info=True)
+        if arguments.config_watcher is not None:
+            arguments.config_watcher.stop()
+        # Write the records that are still waiting in the log queue.
+        shutdown_logging(arguments)
     return result
@@ -7,16 +7,58 @@ from __future__ import print_function
 import logging
 import argparse
 import os
+import sys
 
-from appdirs import user_log_dir, user_data_dir
-
+from appupup.arg_conf import parse_size
+from appupup.completion import add_completion_arguments, refresh_spec
 from appupup.configure import get_config_file
 
 logger = logging.getLogger('appupup')
 
 
+def option_from_argv(argv, option, parser=None):
+    """
+    The value of an option in a list of arguments (or None).
+
+    This is used for the options that are needed before the arguments
+    are parsed.
+
+    Arguments:
+        argv:
+            The arguments.
+        option:
+            The long option (e.g. `--udd`).
+        parser:
+            The parser that will parse them; if given, the abbreviations
+            it accepts (e.g. `--ud`) are recognized too.
+    """
+    options = ()
+    if parser is not None and parser.allow_abbrev:
+        options = [known for known in parser._option_string_actions
+                   if known.startswith('--')]
+    for index, arg in enumerate(argv):
+        if arg == '--':
+            break
+        if not arg.startswith('--'):
+            continue
+        name, equal, value = arg.partition('=')
+        if name != option:
+            if len(name) <= 2 or not option.startswith(name):
+                continue
+            # Like argparse, only an unambiguous prefix is accepted.
+            if [known for known in options
+                    if known.startswith(name)] != [option]:
+                continue
+        if equal:
+            return value
+        if index + 1 < len(argv):
+            return argv[index + 1]
+    return None
+
+
 def make_argument_parser(app_author, app_name, app_description, app_url,
-                         parser_constructor=None):
+                         parser_constructor=None, commands=None,
+                         app_version=None, argv=None):
     """
     Creates an ArgumentParser to read the options for this script from
     sys.argv.
@@ -36,22 +78,42 @@ def make_argument_parser(app_author, app_name, app_description, app_url,
             A short description of the application.
         parser_constructor:
             A callable that receives the parser for further construction.
+            It can not add sub-parsers if `commands` are given.
+        commands:
+            A list of :class:`~appupup.commands.Command`; only the module
+            of the command that is used is imported.
+        app_version:
+            The version of the application; the help texts of the commands
+            and the shell completion spec are updated when it changes.
+        argv:
+            The arguments that will be parsed (`sys.argv[1:]` by default);
+            the `--udd` option is looked up in them to know where
+            the completion spec and the command index are kept.
     """
+    from appdirs import user_log_dir, user_data_dir
 
-    udd = user_data_dir(app_name, app_author)
-
-    parser = argparse.ArgumentParser(
-        description='ko server.',
-        epilog="See %s for more information" % app_url,
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter
-    )
+    # Nothing is created on disk here; the directories are created when
+    # something is written to them.
+    default_udd = user_data_dir(app_name, app_author)
 
-    parser = argparse.ArgumentParser(
-        description=app_description)
+    if commands:
+        from appupup.commands import LazyCommandParser
+        parser = LazyCommandParser(description=app_description)
+    else:
+        parser = argparse.ArgumentParser(description=app_description)
     parser.add_argument(
-        '--config', default=get_config_file(app_name, app_author),
+        '--config',
+        default=get_config_file(app_name, app_author, create=False),
         metavar='file', dest='config_file',
         help='specify the location of the config file')
+    parser.add_argument(
+        '--config-cache', default=False, action='store_true',
+        help='load the parsed config file from a cache in the user data '
+             'directory; useful for large files with includes')
+    parser.add_argument(
+        '--watch-config', default=False, action='store_true',
+        help='reload the config file when it changes; changes of the log '
+             'levels are applied')
     parser.add_argument(
         "--verbose", default=False,
         action="store_true",
@@ -67,15 +129,90 @@ def make_argument_parser(app_author, app_name, app_description, app_url,
             user_log_dir(app_name, app_author),
             '%s.log' % app_name),
         help='where to save the log; a single - will disable it.')
+    parser.add_argument(
+        '--log-file-format', default=None, choices=('text', 'json'),
+        help='format of the log file; json writes an object per line')
+    parser.add_argument(
+        '--log-console-format', default=None, choices=('text', 'json'),
+        help='format of the console output; json writes an object per line')
+    parser.add_argument(
+        '--log-file-buffer', default=None, type=parse_size,
+        metavar="chars", action='store',
+        help='write the log file in chunks of this size (e.g. 64K); '
+             '0 writes each record as it arrives')
+    parser.add_argument(
+        '--log-file-flush-interval', default=1.0, type=float,
+        metavar="seconds", action='store',
+        help='maximum time a record stays in the log file buffer')
+    parser.add_argument(
+        '--log-file-flush-level', default=logging.ERROR, type=int,
+        metavar="level", action='store',
+        help='records with this level or above are written right away')
+    parser.add_argument(
+        '--log-file-fsync', default=None, type=float,
+        metavar="seconds", action='store',
+        help='also sync the log file to disk, at most once in this '
+             'many seconds')
+    parser.add_argument(
+        '--log-rotate-size', default=None, type=parse_size,
+        metavar="size", action='store',
+        help='start a new log file when the current one reaches this '
+             'size (e.g. 100M)')
+    parser.add_argument(
+        '--log-rotate-interval', default=None, type=float,
+        metavar="seconds", action='store',
+        help='start a new log file when the current one is this old')
+    parser.add_argument(
+        '--log-rotate-count', default=None, type=int,
+        metavar="files", action='store',
+        help='how many rotated log files to keep; 0 keeps all')
+    parser.add_argument(
+        '--log-compress', default=None,
+        choices=('auto', 'gzip', 'zstd', 'none'),
+        help='how to compress the rotated log files; auto uses zstd if '
+             'available and gzip otherwise')
+    parser.add_argument(
+        '--log-queue-size', default=0, type=int,
+        metavar="records", action='store',
+        help='write the log from a background thread through a queue '
+             'of this size; 0 writes it synchronously')
+    parser.add_argument(
+        '--log-queue-overflow', default='block',
+        choices=('block', 'drop-newest', 'drop-oldest'),
+        help='what to do when the log queue is full; drop-oldest drops '
+             'the oldest record with the lowest level')
+    parser.add_argument(
+        '--flight-recorder', default=None, type=parse_size,
+        metavar="size", action='store',
+        help='keep the most recent records in a memory-mapped file of '
+             'this size (e.g. 4M) in the user data directory; it survives '
+             'crashes and is removed at normal exit')
+    parser.add_argument(
+        '--flight-recorder-level', default=None, type=int,
+        metavar="level", action='store',
+        help='the level of the records kept by the flight recorder '
+             '(default is 10 - debug)')
+    parser.add_argument(
+        '--profile', default=None, choices=('cprofile', 'sample'),
+        help='profile the command; cprofile saves pstats, sample saves '
+             'collapsed stacks for flame graphs with a lower overhead')
+    parser.add_argument(
+        '--profile-interval', default=0.005, type=float,
+        metavar="seconds", action='store',
+        help='time between two samples of the sampling profiler')
+    parser.add_argument(
+        '--profile-top', default=20, type=int,
+        metavar="functions", action='store',
+        help='how many functions to print in the profile summary')
+    parser.add_argument(
+        '--profile-dir', default=None,
+        metavar="directory", action='store',
+        help='where to save the profile; by default in the profiles '
+             'directory of the user data directory')
     parser.add_argument(
         "--version", default=False,
         action="store_true",
         help="print program version and exit")
-    parser.add_argument(
-        "--hookup", default=False,
-        action="store_true",
-        help="loads the hook file (default one or specified in hook-file "
-             "argument")
     parser.add_argument(
         '--hook-file',
         metavar="file", action='store',
@@ -84,10 +221,23 @@ def make_argument_parser(app_author, app_name, app_description, app_url,
              'will be searched for')
     parser.add_argument(
         '--udd',
-        action='store', default=udd,
+        metavar='directory', action='store', default=default_udd,
         help='User data directory.')
+    udd = option_from_argv(
+        sys.argv[1:] if argv is None else argv, '--udd', parser) or \
+        default_udd
+    completion_spec = os.path.join(udd, 'completion.spec')
+    add_completion_arguments(parser, completion_spec, app_version)
+
+    if commands:
+        parser.add_lazy_commands(
+            commands, version=app_version,
+            index_path=os.path.join(udd, 'command-index.json'))
 
     if parser_constructor is not None:
         parser_constructor(parser)
 
+    if app_version is not None:
+        refresh_spec(completion_spec, parser, app_version)
+
     return parser
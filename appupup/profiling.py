@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Profiles the function that :func:`appupup.main.main` runs.
+
+With `--profile cprofile` the function runs under `cProfile` and the
+statistics are saved in a `.pstats` file (open it with `pstats` or
+snakeviz). With `--profile sample` a background thread looks at the stack
+of the thread that runs the function every `--profile-interval` seconds;
+the samples are saved as collapsed stacks (`.collapsed`, one stack per
+line followed by its count), the input of flamegraph.pl and speedscope.
+The sampling profiler has a much lower overhead, so it is better suited
+for production runs.
+
+The files are written in `--profile-dir` (`<udd>/profiles` by default)
+and a summary with the `--profile-top` most expensive functions is
+printed to stderr at exit.
+
+This module is only imported when profiling was requested.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from collections import Counter
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+logger = logging.getLogger('appupup')
+
+PROFILERS = ('cprofile', 'sample')
+
+
+def code_label(code):
+    """ The name of a function in the collapsed stacks and summaries. """
+    return '%s (%s:%d)' % (
+        code.co_name, os.path.basename(code.co_filename),
+        code.co_firstlineno)
+
+
+class SamplingProfiler(object):
+    """
+    Records the stack of a thread at regular intervals.
+
+    Arguments:
+        interval (float):
+            The time between two samples in seconds.
+        thread_id (int):
+            The thread to sample; by default the one that calls
+            :meth:`start`.
+
+    Attributes:
+        samples (collections.Counter):
+            The number of samples for each stack (a tuple of code objects,
+            outermost first).
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """ Starts the sampling thread. """
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='profiler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the sampling thread. """
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        """ Runs in the sampling thread. """
+        current_frames = sys._current_frames
+        samples = self.samples
+        thread_id = self.thread_id
+        while not self.stopping.wait(self.interval):
+            frame = current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                samples[tuple(stack)] += 1
+
+    def collapsed(self):
+        """ The samples as collapsed stacks, one per line. """
+        lines = []
+        for stack, count in self.samples.most_common():
+            lines.append('%s %d' % (
+                ';'.join(code_label(code) for code in stack), count))
+        return lines
+
+    def write_collapsed(self, path):
+        """ Saves the collapsed stacks to a file. """
+        with open(path, 'w') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
+
+    def summary(self, top=20):
+        """
+        The most expensive functions.
+
+        Returns:
+            A list of (label, own samples, total samples) for the `top`
+            functions with most samples of their own.
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for code in set(stack):
+                total[code] += count
+        return [(code_label(code), count, total[code])
+                for code, count in own.most_common(top)]
+
+    def print_summary(self, top=20, stream=None):
+        """ Prints the most expensive functions. """
+        stream = sys.stderr if stream is None else stream
+        count = sum(self.samples.values())
+        print('%d samples every %g s' % (count, self.interval), file=stream)
+        print('%8s %8s %8s  %s' % ('own', 'own%', 'total%', 'function'),
+              file=stream)
+        for label, own, total in self.summary(top):
+            print('%8d %7.1f%% %7.1f%%  %s' % (
+                own, 100.0 * own / count, 100.0 * total / count, label),
+                file=stream)
+
+
+def profile_path(directory, app_name, extension):
+    """ The file for the results of this run. """
+    return os.path.join(directory, '%s-%s-%d.%s' % (
+        app_name, time.strftime('%Y%m%d-%H%M%S'), os.getpid(), extension))
+
+
+def profile_call(args, app_name, func, *func_args, **func_kwargs):
+    """
+    Calls a function under the profiler selected by the arguments.
+
+    The results are saved and summarized even if the function raises
+    an exception.
+
+    Arguments:
+        args:
+            Arguments returned by the parser; `profile`, `profile_interval`,
+            `profile_top`, `profile_dir` and `udd` are used.
+        app_name:
+            The name of the application; the files start with it.
+        func:
+            The function to call with `func_args` and `func_kwargs`.
+
+    Returns:
+        The result of the function.
+    """
+    mode = args.profile
+    if mode not in PROFILERS:
+        raise ValueError("Unknown profiler %r" % mode)
+    directory = args.profile_dir or os.path.join(args.udd, 'profiles')
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    top = args.profile_top
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*func_args, **func_kwargs)
+        finally:
+            profiler.disable()
+            path = profile_path(directory, app_name, 'pstats')
+            profiler.dump_stats(path)
+            logger.info("Profile saved to %s", path)
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats('cumulative').print_stats(top)
+
+    profiler = SamplingProfiler(interval=args.profile_interval)
+    profiler.start()
+    try:
+        return func(*func_args, **func_kwargs)
+    finally:
+        profiler.stop()
+        path = profile_path(directory, app_name, 'collapsed')
+        profiler.write_collapsed(path)
+        logger.info("Profile saved to %s", path)
+        profiler.print_summary(top)
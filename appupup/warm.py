@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the commands of an application in a warm process.
+
+Scripts that call an application thousands of times pay each time for
+the start of the interpreter and the imports. In the warm mode a server
+process imports everything once and listens on a Unix socket; for each
+call a thin client sends its arguments, environment, working directory
+and standard streams (the file descriptors themselves, so pipes and
+terminals work as usual), the server forks a child that runs the entry
+point of the application with them and the client exits with the exit
+code of the child.
+
+Start the server with a function that calls :func:`appupup.main.main`
+(it reads `sys.argv` as usual):
+
+    python -m appupup.warm serve /run/user/1000/myapp.sock \\
+        myapp.__main__:run --preload myapp.heavy
+
+and call it with:
+
+    python -m appupup.warm call /run/user/1000/myapp.sock -- --verbose cmd
+
+An entry point can also try the server first and run the command itself
+when there is no server (see :func:`call_or_run`):
+
+    >>> sys.exit(call_or_run(socket_path('myapp'), run))
+
+The children are forked from the server, so changes to the code of
+the application are only seen after the server is restarted;
+`--idle-timeout` makes it exit after a period without calls.
+The client forwards SIGINT, SIGTERM and SIGHUP to the child.
+
+This module only imports the standard library modules that the client
+needs; the server imports the rest when it starts.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import array
+import marshal
+import os
+import signal
+import socket
+import struct
+import sys
+
+# The requests are marshalled (json would double the import time of
+# the client) and prefixed with their size; only the user can connect.
+_SIZE = struct.Struct('!I')
+
+# The child answers with its process id and then its exit code.
+_INT = struct.Struct('!i')
+
+# The exit code of the client if the child ended without sending one.
+LOST_CHILD = 255
+
+# The time in seconds that a client has to send its request.
+REQUEST_TIMEOUT = 5.0
+
+# The standard streams of the client.
+STDIO = (0, 1, 2)
+
+# Signals that the client forwards to the child.
+FORWARDED_SIGNALS = ('SIGINT', 'SIGTERM', 'SIGHUP')
+
+# Modules that :func:`appupup.main.main` imports; the server imports them
+# before accepting calls.
+MAIN_MODULES = (
+    'argparse', 'configparser', 'logging', 'logging.handlers', 'random',
+    'appdirs', 'appupup.main', 'appupup.parse_args', 'appupup.log',
+    'appupup.configure', 'appupup.formatter',
+)
+
+
+def socket_path(app_name):
+    """
+    The default location of the socket of an application.
+
+    It is in `$XDG_RUNTIME_DIR` if set, otherwise in a directory of
+    the temporary directory that only the user can access.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        import tempfile
+        directory = os.path.join(
+            tempfile.gettempdir(), 'appupup-%d' % os.getuid())
+    return os.path.join(directory, '%s.sock' % app_name)
+
+
+def _recv_exactly(sock, size):
+    """ Reads `size` bytes; fewer if the connection is closed. """
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_int(sock):
+    """ Reads an integer; None if the connection was closed. """
+    data = _recv_exactly(sock, _INT.size)
+    if len(data) < _INT.size:
+        return None
+    return _INT.unpack(data)[0]
+
+
+def send_request(sock, args, env=None, cwd=None, fds=STDIO):
+    """
+    Sends a call to the server.
+
+    Arguments:
+        sock:
+            A connected Unix socket.
+        args:
+            The command line arguments, without the program name.
+        env:
+            The environment; the one of this process by default.
+        cwd:
+            The working directory; the one of this process by default.
+        fds:
+            The standard input, output and error of the command.
+    """
+    data = marshal.dumps({
+        'args': [str(x) for x in args],
+        'env': dict(os.environ if env is None else env),
+        'cwd': os.getcwd() if cwd is None else cwd,
+    })
+    header = _SIZE.pack(len(data))
+    sock.sendmsg([header], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                             array.array('i', fds))])
+    sock.sendall(data)
+
+
+def receive_request(sock):
+    """
+    Reads a call sent with :func:`send_request`.
+
+    Returns:
+        A tuple with the request (a dictionary) and the list of
+        the file descriptors.
+    """
+    fds = array.array('i')
+    header, ancillary, _, _ = sock.recvmsg(
+        _SIZE.size, socket.CMSG_LEN(len(STDIO) * fds.itemsize))
+    for level, kind, data in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    fds = list(fds)
+    try:
+        if len(header) < _SIZE.size:
+            header += _recv_exactly(sock, _SIZE.size - len(header))
+            if len(header) < _SIZE.size:
+                raise ValueError("Incomplete request")
+        size = _SIZE.unpack(header)[0]
+        data = _recv_exactly(sock, size)
+        if len(data) < size or len(fds) != len(STDIO):
+            raise ValueError("Incomplete request")
+        try:
+            request = marshal.loads(data)
+        except (EOFError, TypeError):
+            raise ValueError("Invalid request")
+        if not isinstance(request, dict):
+            raise ValueError("Invalid request")
+        return request, fds
+    except Exception:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+
+def call(path, args=None, env=None, cwd=None, fds=STDIO):
+    """
+    Runs a command in the server and waits for it to end.
+
+    Arguments:
+        path:
+            The socket of the server.
+        args:
+            The command line arguments without the program name;
+            the ones of this process by default.
+
+    Raises:
+        OSError:
+            If there is no server (FileNotFoundError or
+            ConnectionRefusedError).
+
+    Returns:
+        The exit code of the command.
+    """
+    if args is None:
+        args = sys.argv[1:]
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        send_request(sock, args, env=env, cwd=cwd, fds=fds)
+        pid = _recv_int(sock)
+        if pid is None:
+            return LOST_CHILD
+
+        previous = {}
+
+        def forward(signum, frame):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+        for name in FORWARDED_SIGNALS:
+            signum = getattr(signal, name)
+            try:
+                previous[signum] = signal.signal(signum, forward)
+            except ValueError:
+                # Not in the main thread.
+                break
+        try:
+            code = _recv_int(sock)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        return LOST_CHILD if code is None else code
+    finally:
+        sock.close()
+
+
+def call_or_run(path, func, args=None):
+    """
+    Runs a command in the server or, if there is none, in this process.
+
+    Arguments:
+        path:
+            The socket of the server.
+        func:
+            The entry point of the application; called without arguments
+            if there is no server.
+
+    Returns:
+        The exit code of the command.
+    """
+    try:
+        return call(path, args=args)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return func()
+
+
+def exit_code(result):
+    """ The exit code of a process for the result of an entry point. """
+    if result is None:
+        return 0
+    if isinstance(result, bool):
+        return 0 if result else 1
+    if isinstance(result, int):
+        return result
+    print(result, file=sys.stderr)
+    return 1
+
+
+def _reopen_stdio():
+    """ Replaces the standard streams after their descriptors changed. """
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', closefd=False, buffering=1
+                      if os.isatty(1) else -1)
+    sys.stderr = open(2, 'w', closefd=False, buffering=1)
+
+
+def run_child(conn, request, fds, func, prog):
+    """
+    Runs a call in the forked child; does not return.
+
+    Arguments:
+        conn:
+            The connection of the client; receives the exit code.
+        request:
+            The arguments, environment and working directory.
+        fds:
+            The standard streams of the client.
+        func:
+            The entry point of the application.
+        prog:
+            The name of the program (`sys.argv[0]`).
+    """
+    code = LOST_CHILD
+    try:
+        conn.sendall(_INT.pack(os.getpid()))
+        for name in ('SIGTERM', 'SIGHUP', 'SIGCHLD'):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        for target, fd in zip(STDIO, fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        _reopen_stdio()
+        os.environ.clear()
+        os.environ.update(request['env'])
+        os.chdir(request['cwd'])
+        sys.argv = [prog] + request['args']
+        try:
+            code = exit_code(func())
+        except SystemExit as e:
+            code = exit_code(e.code)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        conn.sendall(_INT.pack(code))
+    except BaseException:
+        pass
+    finally:
+        os._exit(code & 0xFF)
+
+
+class WarmServer(object):
+    """
+    Accepts calls on a Unix socket and runs each in a forked child.
+
+    Arguments:
+        path:
+            The socket; its directory is created (only accessible to
+            the user) if needed.
+        func:
+            The entry point of the application; called without arguments
+            in the child, with `sys.argv` set from the call. Its result
+            (or the code of `SystemExit`) is the exit code.
+        prog:
+            The name of the program in `sys.argv[0]`.
+        preload:
+            Modules to import before accepting calls (those of
+            :func:`appupup.main.main` are always imported).
+        idle_timeout:
+            Stop after this many seconds without calls; None to never stop.
+    """
+    def __init__(self, path, func, prog=None, preload=(), idle_timeout=None):
+        self.path = path
+        self.func = func
+        self.prog = prog or getattr(func, '__module__', None) or 'warm'
+        self.preload = tuple(preload)
+        self.idle_timeout = idle_timeout
+        self.sock = None
+        self.children = set()
+        self.served = 0
+
+    def prepare(self):
+        """ Imports the modules and binds the socket. """
+        import importlib
+        for name in MAIN_MODULES + self.preload:
+            importlib.import_module(name)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError("A server is already listening on %s" %
+                              self.path)
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_mask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_mask)
+        sock.listen(64)
+        self.sock = sock
+
+    def reap(self):
+        """ Waits for the children that ended. """
+        for pid in list(self.children):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.discard(pid)
+
+    def handle(self, conn):
+        """ Forks a child for a connection. """
+        conn.settimeout(REQUEST_TIMEOUT)
+        try:
+            request, fds = receive_request(conn)
+        except (OSError, ValueError):
+            return
+        conn.settimeout(None)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                self.sock.close()
+                run_child(conn, request, fds, self.func, self.prog)
+            self.children.add(pid)
+            self.served += 1
+        except OSError:
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def serve_forever(self):
+        """ Accepts calls until stopped by a signal or the idle timeout. """
+        if self.sock is None:
+            self.prepare()
+        self.sock.settimeout(1.0)
+        idle = 0.0
+        try:
+            while True:
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.timeout:
+                    self.reap()
+                    idle += 1.0
+                    if self.idle_timeout is not None and \
+                            not self.children and idle >= self.idle_timeout:
+                        break
+                    continue
+                idle = 0.0
+                try:
+                    self.handle(conn)
+                finally:
+                    conn.close()
+                self.reap()
+        finally:
+            self.close()
+
+    def close(self):
+        """ Removes the socket. """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def load_entry(spec):
+    """ Imports a `module:function` entry point. """
+    import importlib
+    module_name, _, func_name = spec.partition(':')
+    module = importlib.import_module(module_name)
+    func = module
+    for part in (func_name or 'main').split('.'):
+        func = getattr(func, part)
+    return func
+
+
+def main(argv=None):
+    """ Starts a server or calls one. """
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) >= 2 and argv[0] == 'call' and not argv[1].startswith('-'):
+        # The client does not need argparse.
+        command = argv[2:]
+        if command[:1] == ['--']:
+            command = command[1:]
+        return call(argv[1], command)
+
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Runs the commands of an application in a warm process.')
+    subparsers = parser.add_subparsers(dest='action', metavar='action')
+    serve = subparsers.add_parser('serve', help='start a server')
+    serve.add_argument('socket', help='the socket to listen on')
+    serve.add_argument(
+        'entry', help='the entry point of the application (module:function)')
+    serve.add_argument(
+        '--preload', action='append', default=[], metavar='module',
+        help='a module to import before accepting calls')
+    serve.add_argument(
+        '--prog', default=None,
+        help='the name of the program given to the application')
+    serve.add_argument(
+        '--idle-timeout', type=float, default=None, metavar='seconds',
+        help='stop after this many seconds without calls')
+    client = subparsers.add_parser(
+        'call', help='run a command in a server')
+    client.add_argument('socket', help='the socket of the server')
+    client.add_argument(
+        'args', nargs=argparse.REMAINDER,
+        help='the arguments of the command (after --)')
+    args = parser.parse_args(argv)
+
+    if args.action == 'serve':
+        server = WarmServer(
+            args.socket, load_entry(args.entry), prog=args.prog,
+            preload=args.preload, idle_timeout=args.idle_timeout)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.action == 'call':
+        command = args.args
+        if command[:1] == ['--']:
+            command = command[1:]
+        return call(args.socket, command)
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the hot paths of appupup.
+
+Each module can be run on its own, e.g.:
+
+    python -m benchmarks.bench_debug_logger
+
+`python -m benchmarks run` runs all of them and saves the results in
+a history file that `python -m benchmarks compare` uses to find
+regressions; see :mod:`benchmarks.suite`.
+"""
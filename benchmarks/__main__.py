@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks; see :mod:`benchmarks.suite`.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import sys
+
+from benchmarks.suite import main
+
+sys.exit(main())
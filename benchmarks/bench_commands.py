@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Time to build the parser and parse `app cmd0 --count 2` for an application
+with many subcommands whose modules are slow to import, when all
+the modules are imported up front and when the commands are lazy.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from appupup.commands import Command, LazyCommandParser
+
+COMMANDS = 20
+PACKAGE = 'bench_commands_pkg'
+
+# Stands for the heavy dependencies of a command (about 2 ms each).
+COMMAND_MODULE = '''"""
+Command number %d.
+"""
+import time
+
+_end = time.perf_counter() + 0.002
+while time.perf_counter() < _end:
+    pass
+
+
+def setup_parser(parser):
+    parser.add_argument('--count', type=int, default=1)
+
+
+def run(args, logger):
+    return 0
+'''
+
+ARGV = ['cmd0', '--count', '2']
+
+
+def write_package(directory):
+    package_dir = os.path.join(directory, PACKAGE)
+    os.mkdir(package_dir)
+    with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+        f.write('')
+    for index in range(COMMANDS):
+        path = os.path.join(package_dir, 'cmd%d.py' % index)
+        with open(path, 'w') as f:
+            f.write(COMMAND_MODULE % index)
+
+
+def forget():
+    for name in list(sys.modules):
+        if name.startswith(PACKAGE + '.'):
+            del sys.modules[name]
+
+
+def eager():
+    parser = argparse.ArgumentParser(prog='app')
+    subparsers = parser.add_subparsers(dest='command')
+    for index in range(COMMANDS):
+        module = importlib.import_module('%s.cmd%d' % (PACKAGE, index))
+        command = subparsers.add_parser(
+            'cmd%d' % index, help=module.__doc__.strip())
+        module.setup_parser(command)
+        command.set_defaults(func=module.run)
+    return parser.parse_args(ARGV)
+
+
+def lazy(index_path):
+    parser = LazyCommandParser(prog='app')
+    parser.add_lazy_commands(
+        [Command('cmd%d' % index, '%s.cmd%d' % (PACKAGE, index))
+         for index in range(COMMANDS)],
+        index_path=index_path, version='1.0')
+    return parser.parse_args(ARGV)
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        forget()
+        start = time.perf_counter()
+        func()
+        value = (time.perf_counter() - start) * 1e6
+        best = value if best is None else min(best, value)
+    return best
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    sys.path.insert(0, temp_dir)
+    try:
+        write_package(temp_dir)
+        index_path = os.path.join(temp_dir, 'command-index.json')
+        results = [('eager (%d commands)' % COMMANDS, timed(eager))]
+        forget()
+        start = time.perf_counter()
+        lazy(index_path)
+        results.append(('lazy, first run (builds the index)',
+                        (time.perf_counter() - start) * 1e6))
+        results.append(('lazy, with the index',
+                        timed(lambda: lazy(index_path))))
+        return results
+    finally:
+        forget()
+        sys.path.remove(temp_dir)
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
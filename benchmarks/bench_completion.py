@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of a TAB: the bash function that reads the completion spec
+against starting Python to build the parser of the application (what
+generic argparse completers do), for the parser of make_argument_parser.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from appupup.completion import completion_script, write_spec
+from appupup.parse_args import make_argument_parser
+
+TABS = 200
+
+BUILD_PARSER = '''
+from appupup.completion import completion_spec
+from appupup.parse_args import make_argument_parser
+parser = make_argument_parser(
+    'appupup', 'bench_completion', 'benchmark', 'http://localhost',
+    app_version='1.0')
+completion_spec(parser)
+'''
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    bash = shutil.which('bash')
+    temp_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env['HOME'] = temp_dir
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)))
+    try:
+        path = os.path.join(temp_dir, 'completion.spec')
+        parser = make_argument_parser(
+            'appupup', 'bench_completion', 'benchmark', 'http://localhost')
+        parser.prog = 'myapp'
+        write_spec(path, parser, '1.0')
+        results = []
+        if bash is not None:
+            command = '%s\nCOMP_WORDS=(myapp --log-q)\nCOMP_CWORD=1\n' \
+                'for ((n = 0; n < %d; n++)); do ' \
+                '_appupup_complete_myapp; done' % (
+                    completion_script('bash', 'myapp', path), TABS)
+            start = time.perf_counter()
+            subprocess.check_call([bash, '--norc', '-c', command])
+            results.append(('bash function reading the spec',
+                            (time.perf_counter() - start) * 1e6 / TABS))
+        start = time.perf_counter()
+        for _ in range(10):
+            subprocess.check_call(
+                [sys.executable, '-c', BUILD_PARSER], env=env)
+        results.append(('python building the parser',
+                        (time.perf_counter() - start) * 1e6 / 10))
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Time to load generated config files of increasing size by parsing them
+and from the cache of appupup.configure.load_config.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import configparser
+import os
+import shutil
+import tempfile
+
+from appupup.configure import load_config
+from benchmarks.common import measure
+
+SECTIONS = (100, 1000, 5000)
+KEYS = 6
+
+
+def write_config(path, sections):
+    """ A config file with one tenth of the sections in an included file. """
+    included = sections // 10
+    with open(path, 'w') as f:
+        f.write('[include]\nrest = %s\n' % os.path.basename(path + '.inc'))
+        for index in range(included, sections):
+            f.write('[section%d]\n' % index)
+            for key in range(KEYS):
+                f.write('key%d = value of %d.%d\n' % (key, index, key))
+    with open(path + '.inc', 'w') as f:
+        for index in range(included):
+            f.write('[section%d]\n' % index)
+            for key in range(KEYS):
+                f.write('key%d = value of %d.%d\n' % (key, index, key))
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    cache_dir = os.path.join(temp_dir, 'cache')
+    results = []
+    try:
+        for sections in SECTIONS:
+            path = os.path.join(temp_dir, 'app%d.cfg' % sections)
+            write_config(path, sections)
+
+            def parse():
+                configparser.ConfigParser().read([path, path + '.inc'])
+
+            load_config(path, cache_dir)
+            results.append(('parse %d sections' % sections,
+                            measure(parse, number=1)))
+            results.append(('cached %d sections' % sections,
+                            measure(lambda: load_config(path, cache_dir),
+                                    number=1)))
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
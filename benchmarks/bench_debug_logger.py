@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Per-record cost of DebugLogger.emit for various numbers of active rules.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import re
+
+from appupup.formatter import FastFormatter
+from appupup.log import DebugLogger
+from benchmarks.common import measure, report, make_record
+
+RULE_SETS = (
+    ('0 rules', {}),
+    ('1 rule', {
+        'exclude_name_pattern': 'noisy.module',
+    }),
+    ('10 rules', {
+        'exclude_name_pattern': 'noisy.module',
+        'exclude_thread_pattern': re.compile('Dummy-'),
+        'exclude_file_name_pattern': 'other.py',
+        'exclude_func_name_pattern': re.compile('_private'),
+        'exclude_module_pattern': 'other',
+        'include_level_in': (logging.DEBUG, logging.INFO),
+        'include_path_pattern': re.compile('/srv/'),
+        'include_process_pattern': 'MainProcess',
+        'include_line_number_pattern': re.compile('[0-9]+'),
+        'include_relative_created_interval': (0, 1e12),
+    }),
+)
+
+
+# The format used by DebugLogger.install().
+INSTALL_FORMAT = FastFormatter(
+    "[%(asctime)s.%(msecs)03d] [%(levelname)-7s] [%(name)-19s] "
+    "[%(threadName)-15s] "
+    "[%(funcName)-25s] %(message)s",
+    datefmt='%M:%S')
+
+
+class NullDebugLogger(DebugLogger):
+    """ Does not write accepted records so only filtering is measured. """
+    def filtered_in(self, msg, record):
+        pass
+
+
+def run():
+    """ Returns a list of (name, microseconds per record) tuples. """
+    results = []
+    for title, rules in RULE_SETS:
+        handler = NullDebugLogger(**rules)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        record = make_record()
+        results.append((
+            'DebugLogger.emit, %s' % title,
+            measure(lambda: handler.emit(record))))
+
+    # Most records are excluded on debug-heavy services.
+    for lazy in (False, True):
+        handler = NullDebugLogger(
+            exclude_name_pattern='bench.module', lazy_format=lazy)
+        handler.setFormatter(INSTALL_FORMAT)
+        record = make_record()
+        results.append((
+            'DebugLogger.emit, excluded record, %s' % (
+                'lazy' if lazy else 'eager'),
+            measure(lambda: handler.emit(record))))
+
+    # A loop that logs from a single call site with expensive static rules.
+    static_rules = {
+        'exclude_name_pattern': re.compile('.*noisy'),
+        'exclude_path_pattern': re.compile('.*/vendor/'),
+        'include_func_name_pattern': re.compile('[a-z_]+$'),
+    }
+    for cache_size in (0, 4096):
+        handler = NullDebugLogger(
+            call_site_cache_size=cache_size, lazy_format=True, **static_rules)
+        record = make_record()
+        results.append((
+            'DebugLogger.emit, 3 regex rules, cache %d' % cache_size,
+            measure(lambda: handler.emit(record))))
+
+    # A hot loop logging from the same call site, with and without
+    # a rate limit; the limited records are never formatted.
+    with open(os.devnull, 'w') as stream:
+        for rate_limit in (None, 10):
+            handler = DebugLogger(lazy_format=True, rate_limit=rate_limit)
+            handler.setFormatter(INSTALL_FORMAT)
+            handler.setStream(stream)
+            record = make_record()
+            results.append((
+                'DebugLogger.emit, hot call site, rate limit %s' % rate_limit,
+                measure(lambda: handler.emit(record))))
+
+    # Records that are sampled out, by call site and by a field.
+    for title, rule in (
+            ('call site', ('bench.*', 'DEBUG', 0)),
+            ('request_id', ('bench.*', 'DEBUG', 0, 'request_id'))):
+        handler = NullDebugLogger(sample=[rule])
+        handler.setFormatter(INSTALL_FORMAT)
+        record = make_record()
+        record.request_id = 'f3b1c2d4'
+        results.append((
+            'DebugLogger.emit, sampled out by %s' % title,
+            measure(lambda: handler.emit(record))))
+
+    # A full logger.debug() call for a logger excluded by name.
+    # The logger is restored for the benchmarks that run after this one.
+    top = logging.getLogger('bench')
+    saved = top.propagate, top.level
+    top.propagate = False
+    noisy = logging.getLogger('bench.noisy')
+    try:
+        for gate in (False, True):
+            top.handlers = []
+            handler = DebugLogger.install(
+                'bench', gate=gate, lazy_format=True,
+                exclude_name_pattern='bench.noisy')
+            results.append((
+                'logger.debug() excluded by name, gate %s' % (
+                    'on' if gate else 'off'),
+                measure(lambda: noisy.debug('item %d', 42))))
+            handler.disable_gate()
+    finally:
+        top.handlers = []
+        top.propagate, level = saved
+        top.setLevel(level)
+    return results
+
+
+if __name__ == '__main__':
+    report(__doc__.strip(), run())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Lines per second written by the file and console handlers of setup_logging.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from appupup.formatter import FastFormatter
+from appupup.log_file import BufferedFileHandler
+from benchmarks.common import make_record
+
+# The format used by setup_logging() for the log file.
+FILE_FORMAT = FastFormatter(
+    "%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
+    "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+    "[%(funcName)-25s] | %(message)s",
+    '%Y-%m-%d %H:%M:%S')
+
+LINES = 100000
+
+
+def lines_per_second(handler, lines=LINES):
+    """ Sends records to a handler and closes it. """
+    handler.setFormatter(FILE_FORMAT)
+    record = make_record()
+    start = time.perf_counter()
+    for _ in range(lines):
+        handler.handle(record)
+    handler.close()
+    return lines / (time.perf_counter() - start)
+
+
+def run():
+    """ Returns a list of (name, microseconds per line) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'bench.log')
+        handlers = (
+            ('logging.FileHandler', lambda: logging.FileHandler(path)),
+            ('BufferedFileHandler, no buffer',
+             lambda: BufferedFileHandler(path, buffer_size=0)),
+            ('BufferedFileHandler, 64 KiB',
+             lambda: BufferedFileHandler(path, buffer_size=64 * 1024)),
+            ('BufferedFileHandler, 1 MiB',
+             lambda: BufferedFileHandler(path, buffer_size=1024 * 1024)),
+            ('BufferedFileHandler, 64 KiB, fsync 1 s',
+             lambda: BufferedFileHandler(
+                 path, buffer_size=64 * 1024, fsync_interval=1.0)),
+        )
+        results = []
+        for title, factory in handlers:
+            rate = lines_per_second(factory())
+            os.remove(path)
+            results.append((title, 1e6 / rate))
+        # The console handler, writing to a file that discards the output.
+        with open(os.devnull, 'w') as stream:
+            rate = lines_per_second(logging.StreamHandler(stream))
+        results.append(('logging.StreamHandler, console', 1e6 / rate))
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.0f lines/s' % (name, 1e6 / value))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Per-record cost of the formatters used by setup_logging.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+
+from appupup import formatter
+from appupup.formatter import FastFormatter, JsonFormatter
+from benchmarks.common import measure, report, make_record
+
+# The formats used by setup_logging() and DebugLogger.install().
+FORMATS = (
+    ('file format', (
+        "%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
+        "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+        "[%(funcName)-25s] | %(message)s",
+        '%Y-%m-%d %H:%M:%S')),
+    ('console format', (
+        "[%(asctime)s] [%(levelname)-7s] [%(name)-19s] [%(threadName)-15s] "
+        "[%(funcName)-25s] %(message)s",
+        '%M:%S')),
+    ('DebugLogger format', (
+        "[%(asctime)s.%(msecs)03d] [%(levelname)-7s] [%(name)-19s] "
+        "[%(threadName)-15s] "
+        "[%(funcName)-25s] %(message)s",
+        '%M:%S')),
+)
+
+
+def run():
+    """ Returns a list of (name, microseconds per record) tuples. """
+    record = make_record()
+    formatters = []
+    for title, (fmt, datefmt) in FORMATS:
+        formatters.append(
+            ('logging.Formatter, %s' % title, logging.Formatter(fmt, datefmt)))
+        formatters.append(
+            ('FastFormatter, %s' % title, FastFormatter(fmt, datefmt)))
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        formatters.append(('JsonFormatter, orjson', JsonFormatter()))
+    formatters.append(('JsonFormatter, json module',
+                       JsonFormatter(dumps=formatter.stdlib_json_dumps)))
+    return [(title, measure(lambda: fmt.format(record)))
+            for title, fmt in formatters]
+
+
+if __name__ == '__main__':
+    report(__doc__.strip(), run())
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Loading the overrides module: executing the file each time against
+the module kept by appupup.hooks, and searching for the file.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import importlib.util
+import os
+import shutil
+import tempfile
+
+from appupup.hooks import find_hook_file, load_hook_module
+from benchmarks.common import measure, report
+
+SOURCE = ''.join('def helper_%d(args):\n    return %d\n\n' % (i, i)
+                 for i in range(200)) + 'def init(args):\n    pass\n'
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'overrides.py')
+        with open(path, 'w') as f:
+            f.write(SOURCE)
+
+        def exec_file():
+            spec = importlib.util.spec_from_file_location('overrides', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+        return [
+            ('spec_from_file_location + exec_module',
+             measure(exec_file, number=100)),
+            ('load_hook_module', measure(lambda: load_hook_module(path))),
+            ('find_hook_file', measure(lambda: find_hook_file('nothing'))),
+        ]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    report(__doc__.strip(), run())
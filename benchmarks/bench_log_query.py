@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Time to find the errors of a 5 minute window in a large log file, with and
+without the sparse index.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from appupup.log_query import LogIndex, Query, query_log
+from benchmarks.bench_file_handler import FILE_FORMAT
+from benchmarks.common import make_record
+
+LINES = 300000
+START = time.mktime((2019, 11, 15, 0, 0, 0, 0, 0, -1))
+
+# 14:00 to 14:05 in a file that covers the day.
+QUERY = Query(since='2019-11-15 14:00:00', until='2019-11-15 14:05:00',
+              level=logging.ERROR)
+
+
+def write_log(path, lines=LINES, first=0):
+    """ A day of records, one error in a thousand. """
+    step = 86400.0 / LINES
+    with open(path, 'a') as f:
+        chunk = []
+        for index in range(first, first + lines):
+            record = make_record(
+                level=logging.ERROR if index % 1000 == 0 else logging.INFO)
+            record.created = START + index * step
+            chunk.append(FILE_FORMAT.format(record) + '\n')
+            if len(chunk) == 10000:
+                f.write(''.join(chunk))
+                chunk = []
+        f.write(''.join(chunk))
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1e6
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'app.log')
+        write_log(path)
+        results = [
+            ('linear scan (%d MiB)' % (os.path.getsize(path) >> 20),
+             timed(lambda: list(query_log(path, QUERY, use_index=False)))),
+            ('build the index',
+             timed(lambda: LogIndex(path).update())),
+            ('indexed query',
+             timed(lambda: list(query_log(path, QUERY)))),
+        ]
+        write_log(path, lines=LINES // 100, first=LINES)
+        results.append((
+            'indexed query after 1% more lines',
+            timed(lambda: list(query_log(path, QUERY)))))
+        results.append((
+            'indexed query, no new lines',
+            timed(lambda: list(query_log(path, QUERY)))))
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
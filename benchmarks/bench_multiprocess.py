@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Records per second logged by worker processes through a LogCollector.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import multiprocessing
+import os
+import time
+
+from appupup.log_mp import LogCollector
+
+RECORDS = 20000
+WORKERS = tuple(sorted({1, 2, 4, max(1, os.cpu_count() or 1)}))
+
+
+class CountingHandler(logging.Handler):
+    """ Formats the records and counts them. """
+    def __init__(self):
+        super(CountingHandler, self).__init__()
+        self.setFormatter(logging.Formatter(
+            "%(asctime)s [%(levelname)-7s] [%(name)s] | %(message)s"))
+        self.count = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.count = self.count + 1
+
+
+def produce(count):
+    """ Runs in a worker. """
+    log = logging.getLogger('bench.worker')
+    for index in range(count):
+        log.info("processing item %d", index)
+    return count
+
+
+def records_per_second(workers, batch_size, records=RECORDS):
+    """ Logs `records` records split among `workers` processes. """
+    root = logging.getLogger()
+    saved = root.handlers, root.level
+    handler = CountingHandler()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    try:
+        start = time.perf_counter()
+        with LogCollector(batch_size=batch_size) as collector:
+            with multiprocessing.Pool(
+                    workers, initializer=collector.initializer,
+                    initargs=collector.initargs) as pool:
+                pool.map(produce, [records // workers] * workers)
+                pool.close()
+                pool.join()
+        elapsed = time.perf_counter() - start
+        assert handler.count == records // workers * workers
+        return handler.count / elapsed
+    finally:
+        root.handlers, level = saved
+        root.setLevel(level)
+
+
+def run():
+    """ Returns a list of (name, microseconds per record) tuples. """
+    results = []
+    for batch_size in (1, 100):
+        for workers in WORKERS:
+            rate = records_per_second(workers, batch_size)
+            results.append((
+                '%d worker(s), batch of %d' % (workers, batch_size),
+                1e6 / rate))
+    return results
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.0f records/s' % (name, 1e6 / value))
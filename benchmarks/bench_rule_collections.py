@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of DebugLogger rules that hold many patterns for the same field.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import re
+
+from appupup.log_rules import compile_rules
+from appupup.log import DebugLogger
+from benchmarks.common import measure, report, make_record
+
+SIZES = (1, 100, 10000)
+
+
+def run():
+    """ Returns a list of (name, microseconds per record) tuples. """
+    results = []
+    record = make_record(name='bench.module')
+    record.message = record.getMessage()
+    for size in SIZES:
+        names = ['noisy.module%d' % i for i in range(size)]
+        decide = compile_rules(DebugLogger(exclude_name_pattern=names))
+        results.append((
+            '%d exact names' % size,
+            measure(lambda: decide('', record))))
+
+        # The worst case: the record matches none of the expressions.
+        patterns = [re.compile('noisy%d\\.' % i) for i in range(size)]
+        decide = compile_rules(DebugLogger(exclude_name_pattern=patterns))
+        results.append((
+            '%d regular expressions' % size,
+            measure(lambda: decide('', record))))
+
+        # Checking the expressions one by one, as a chain of rules would.
+        matchers = [pattern.match for pattern in patterns]
+        results.append((
+            '%d regular expressions, one by one' % size,
+            measure(lambda: any(match(record.name) for match in matchers),
+                    number=max(1, 100000 // size))))
+    return results
+
+
+if __name__ == '__main__':
+    report(__doc__.strip(), run())
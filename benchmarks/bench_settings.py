@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Reading a typed setting from the config file: get_common_arg with
+a conversion at each use against an attribute of the resolved settings.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import configparser
+from argparse import Namespace
+
+from appupup.arg_conf import Setting, Settings, get_common_arg
+from benchmarks.common import measure, report
+
+SETTINGS = Settings([
+    Setting('port', type=int),
+    Setting('timeout', type=float, default=1.0),
+], group='server')
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    cfg = configparser.ConfigParser()
+    cfg.read_string('[server]\nport = 8080\ntimeout = 2.5\n')
+    args = Namespace(port=None, timeout=None, cfg=cfg)
+    settings = SETTINGS.resolve(args)
+
+    def common_arg():
+        return int(get_common_arg(args, 'port', 'server', 'port'))
+
+    def attribute():
+        return settings.port
+
+    return [
+        ('get_common_arg + int()', measure(common_arg)),
+        ('resolved settings attribute', measure(attribute)),
+        ('resolve all settings', measure(lambda: SETTINGS.resolve(args))),
+    ]
+
+
+if __name__ == '__main__':
+    report(__doc__.strip(), run())
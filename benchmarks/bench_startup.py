@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Startup latency of a small application built on appupup.main: a new
+interpreter that only starts, one that imports appupup.main, one that runs
+the application and main() called again in a running process.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import measure
+
+CALLS = 20
+
+APP_MODULE = '''
+import sys
+from appupup.main import main
+
+
+def setup_parser(parser):
+    parser.set_defaults(func=lambda args, logger: 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(
+        app_name='startup_bench', app_version='1.0.0', app_stage='',
+        app_author='appupup', app_description='benchmark',
+        app_url='http://localhost', parser_constructor=setup_parser))
+'''
+
+ARGS = ['--config', '-', '--log-file', '-']
+
+
+def timed(func, number=CALLS):
+    """ The average duration of a call in microseconds. """
+    func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) * 1e6 / number
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    from appupup.main import main
+
+    temp_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env['HOME'] = temp_dir
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)))
+    app = os.path.join(temp_dir, 'startup_bench.py')
+    with open(app, 'w') as f:
+        f.write(APP_MODULE)
+
+    root = logging.getLogger()
+    saved = sys.argv, list(root.handlers), root.level
+
+    def in_process():
+        sys.argv = ['startup_bench'] + ARGS
+        try:
+            main(app_name='startup_bench', app_version='1.0.0',
+                 app_stage='', app_author='appupup',
+                 app_description='benchmark', app_url='http://localhost',
+                 parser_constructor=lambda parser: parser.set_defaults(
+                     func=lambda args, logger: 0))
+        finally:
+            sys.argv, root.handlers[:], root.level = saved
+
+    try:
+        with open(os.devnull, 'wb') as null:
+            def interpreter(*args):
+                return lambda: subprocess.check_call(
+                    [sys.executable] + list(args), env=env, cwd=temp_dir,
+                    stdout=null, stderr=null)
+
+            return [
+                ('new interpreter', timed(interpreter('-c', 'pass'))),
+                ('new interpreter, import appupup.main',
+                 timed(interpreter('-c', 'import appupup.main'))),
+                ('new interpreter, run the application',
+                 timed(interpreter(app, *ARGS))),
+                ('main() in process', measure(in_process, number=CALLS)),
+            ]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of a call to a small application built on appupup.main: a cold
+start of the interpreter, a call through the warm server from a new
+client process (`python -m appupup.warm call`) and from a process that
+is already running (appupup.warm.call).
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from appupup.warm import call
+
+CALLS = 20
+
+ENTRY_MODULE = '''
+import sys
+
+
+def run():
+    from appupup.main import main
+
+    def setup_parser(parser):
+        parser.set_defaults(func=lambda args, logger: 0)
+
+    return main(
+        app_name='bench_warm', app_version='1.0.0', app_stage='',
+        app_author='appupup', app_description='benchmark',
+        app_url='http://localhost', parser_constructor=setup_parser)
+
+
+if __name__ == '__main__':
+    sys.exit(run())
+'''
+
+ARGS = ['--config', '-', '--log-file', '-']
+
+
+def wait_for(path, server, timeout=20):
+    deadline = time.time() + timeout
+    while True:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return
+        except OSError:
+            if time.time() > deadline or server.poll() is not None:
+                raise
+            time.sleep(0.05)
+        finally:
+            probe.close()
+
+
+def timed(func, number=CALLS):
+    """ The average duration of a call in microseconds. """
+    func()
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) * 1e6 / number
+
+
+def run():
+    """ Returns a list of (name, microseconds) tuples. """
+    temp_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env['HOME'] = temp_dir
+    env['PYTHONPATH'] = os.pathsep.join(
+        [temp_dir, os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__)))])
+    path = os.path.join(temp_dir, 'bench.sock')
+    entry = os.path.join(temp_dir, 'warm_bench_entry.py')
+    with open(entry, 'w') as f:
+        f.write(ENTRY_MODULE)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'appupup.warm', 'serve', path,
+         'warm_bench_entry:run'], env=env, cwd=temp_dir)
+    try:
+        wait_for(path, server)
+        with open(os.devnull, 'wb') as null:
+            def cold():
+                subprocess.check_call(
+                    [sys.executable, entry] + ARGS, env=env, stdout=null)
+
+            def client():
+                subprocess.check_call(
+                    [sys.executable, '-m', 'appupup.warm', 'call', path,
+                     '--'] + ARGS, env=env, stdout=null)
+
+            def in_process():
+                fds = (null.fileno(), null.fileno(), 2)
+                if call(path, ARGS, env=env, fds=fds) != 0:
+                    raise RuntimeError("The call failed")
+
+            return [
+                ('cold start', timed(cold)),
+                ('warm server, client process', timed(client)),
+                ('warm server, in process client', timed(in_process)),
+            ]
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    print(__doc__.strip())
+    for name, value in run():
+        print('    %-48s %12.1f ms' % (name, value / 1000))
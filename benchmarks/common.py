@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the benchmarks.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import timeit
+
+
+def measure(func, number=None, repeat=5):
+    """
+    Measures the time it takes to call a function.
+
+    Arguments:
+        func:
+            The callable to measure; receives no arguments.
+        number:
+            How many times to call the function in a run; by default it is
+            determined automatically so that a run takes at least 0.2 s.
+        repeat:
+            How many runs to perform; the best one is reported.
+
+    Returns:
+        The time for a single call in microseconds.
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def report(title, results):
+    """ Prints a list of (name, microseconds) tuples. """
+    print(title)
+    for name, value in results:
+        print('    %-48s %12.3f us' % (name, value))
+
+
+def make_record(name='bench.module', level=logging.DEBUG,
+                msg='processing item %d', args=(42,), lineno=100):
+    """ Creates a log record similar to the ones produced by loggers. """
+    return logging.LogRecord(
+        name, level, '/srv/app/bench/module.py', lineno, msg, args, None,
+        func='process')
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks, keeps their results and finds regressions.
+
+    python -m benchmarks run                # all of them
+    python -m benchmarks run -b debug_logger -b startup --label my-change
+    python -m benchmarks compare            # the last run against the one
+                                            # before it
+    python -m benchmarks compare --baseline main --threshold 0.05
+    python -m benchmarks history
+
+Each run appends a line to the history file (`.benchmarks/history.jsonl`
+by default), a JSON object with the time, the commit, the version of
+Python, the platform, an optional label and the results:
+
+    {"time": "...", "commit": "...", "python": "3.11.7", "platform": "...",
+     "label": null, "results": {"debug_logger": {"0 rules": 1.52, ...}},
+     "errors": {}}
+
+The results are in microseconds per operation (lower is better), as
+returned by the `run()` function of each `bench_*` module. `compare`
+reports the results that are slower than the baseline by more than
+the threshold and exits with 1 if there are any.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import datetime
+import importlib
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import traceback
+
+HISTORY_FILE = os.path.join('.benchmarks', 'history.jsonl')
+
+# A result that is slower than the baseline by more than this fraction is
+# a regression.
+THRESHOLD = 0.1
+
+
+def benchmark_names():
+    """ The names of the benchmark modules without the `bench_` prefix. """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return sorted(name[len('bench_'):]
+                  for _, name, _ in pkgutil.iter_modules([directory])
+                  if name.startswith('bench_'))
+
+
+def run_benchmarks(names=None, verbose=True):
+    """
+    Runs some benchmarks.
+
+    Arguments:
+        names:
+            The names of the benchmarks (see :func:`benchmark_names`);
+            by default all of them.
+        verbose:
+            Print the results as they are produced.
+
+    Returns:
+        A tuple with the results ({benchmark: {name: microseconds}}) and
+        the errors ({benchmark: traceback}) of the benchmarks that failed.
+    """
+    results = {}
+    errors = {}
+    for name in names or benchmark_names():
+        if verbose:
+            print(name)
+        try:
+            module = importlib.import_module('benchmarks.bench_%s' % name)
+            results[name] = dict(module.run())
+        except Exception:
+            errors[name] = traceback.format_exc()
+            if verbose:
+                print(errors[name], file=sys.stderr)
+            continue
+        if verbose:
+            for title, value in results[name].items():
+                print('    %-48s %12.3f us' % (title, value))
+    return results, errors
+
+
+def current_commit():
+    """ The commit of the source tree (None if it is not known). """
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip() or None
+
+
+def make_entry(results, errors=None, label=None):
+    """ A history entry for some results. """
+    return {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'label': label,
+        'results': results,
+        'errors': errors or {},
+    }
+
+
+def load_history(path):
+    """ The entries of a history file (an empty list if there is none). """
+    try:
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def append_history(path, entry):
+    """ Adds an entry at the end of a history file. """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+
+def find_entry(history, ref):
+    """
+    An entry of the history.
+
+    Arguments:
+        history:
+            The entries.
+        ref:
+            The index of the entry (negative values count from the end),
+            its label or the start of its commit; the latest match is used.
+
+    Raises:
+        LookupError:
+            If no entry matches.
+    """
+    try:
+        index = int(ref)
+    except ValueError:
+        pass
+    else:
+        try:
+            return history[index]
+        except IndexError:
+            raise LookupError("There is no entry %d in the history" % index)
+    for entry in reversed(history):
+        if entry.get('label') == ref or \
+                (entry.get('commit') or '').startswith(ref):
+            return entry
+    raise LookupError("No entry in the history matches %r" % ref)
+
+
+def compare(baseline, current):
+    """
+    Compares the results of two entries.
+
+    Only the results present in both are compared.
+
+    Returns:
+        A list of (benchmark, name, old, new, change) tuples sorted by
+        benchmark and name, where change is new / old - 1 (positive if
+        the new result is slower).
+    """
+    rows = []
+    old_results = baseline['results']
+    for benchmark, values in sorted(current['results'].items()):
+        old_values = old_results.get(benchmark, {})
+        for name, new in sorted(values.items()):
+            old = old_values.get(name)
+            if old is None:
+                continue
+            change = new / old - 1 if old else 0.0
+            rows.append((benchmark, name, old, new, change))
+    return rows
+
+
+def regressions(rows, threshold=THRESHOLD):
+    """ The rows of :func:`compare` that are slower than the threshold. """
+    return [row for row in rows if row[4] > threshold]
+
+
+def describe(entry):
+    """ A short description of a history entry. """
+    return '%s %s%s' % (
+        entry['time'], (entry.get('commit') or 'unknown')[:10],
+        ' (%s)' % entry['label'] if entry.get('label') else '')
+
+
+def print_comparison(baseline, current, threshold=THRESHOLD):
+    """
+    Prints the comparison of two entries.
+
+    Returns:
+        The number of regressions.
+    """
+    rows = compare(baseline, current)
+    print("baseline: %s" % describe(baseline))
+    print("current:  %s" % describe(current))
+    for benchmark, name, old, new, change in rows:
+        print('%-3s %-60s %12.3f %12.3f %+7.1f%%' % (
+            '!!' if change > threshold else '',
+            '%s: %s' % (benchmark, name), old, new, change * 100))
+    slower = regressions(rows, threshold)
+    if slower:
+        print("%d result(s) slower by more than %.0f%%" % (
+            len(slower), threshold * 100))
+    return len(slower)
+
+
+def run_command(args):
+    results, errors = run_benchmarks(args.benchmarks)
+    entry = make_entry(results, errors, args.label)
+    if not args.no_save:
+        append_history(args.history, entry)
+    result = 1 if errors else 0
+    if args.compare:
+        history = load_history(args.history)
+        if not args.no_save:
+            history = history[:-1]
+        if history:
+            if print_comparison(history[-1], entry, args.threshold):
+                result = 1
+        else:
+            print("There is nothing to compare with")
+    return result
+
+
+def compare_command(args):
+    history = load_history(args.history)
+    try:
+        baseline = find_entry(history, args.baseline)
+        current = find_entry(history, args.current)
+    except LookupError as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 1 if print_comparison(baseline, current, args.threshold) else 0
+
+
+def history_command(args):
+    for index, entry in enumerate(load_history(args.history)):
+        print('%4d  %s  %d results%s' % (
+            index, describe(entry),
+            sum(len(values) for values in entry['results'].values()),
+            ', %d failed' % len(entry['errors']) if entry['errors'] else ''))
+    return 0
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Runs the benchmarks of appupup and compares results.')
+    parser.add_argument(
+        '--history', default=HISTORY_FILE, metavar='file',
+        help='the history file (default: %(default)s)')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser(
+        'run', help='runs the benchmarks and saves the results')
+    run_parser.add_argument(
+        '-b', '--benchmark', action='append', dest='benchmarks',
+        choices=benchmark_names(), metavar='name',
+        help='run only this benchmark (can be repeated): %s' % ', '.join(
+            benchmark_names()))
+    run_parser.add_argument(
+        '--label', help='a name for the results')
+    run_parser.add_argument(
+        '--no-save', action='store_true', default=False,
+        help='do not add the results to the history')
+    run_parser.add_argument(
+        '--compare', action='store_true', default=False,
+        help='compare the results with the last entry of the history')
+    run_parser.set_defaults(func=run_command)
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='compares two entries of the history')
+    compare_parser.add_argument(
+        '--baseline', default='-2', metavar='ref',
+        help='index, label or commit of the baseline (default: the one '
+             'before the last)')
+    compare_parser.add_argument(
+        '--current', default='-1', metavar='ref',
+        help='index, label or commit of the entry to check (default: '
+             'the last)')
+    compare_parser.set_defaults(func=compare_command)
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument(
+            '--threshold', type=float, default=THRESHOLD, metavar='fraction',
+            help='report results slower by more than this fraction '
+                 '(default: %(default)s)')
+
+    history_parser = subparsers.add_parser(
+        'history', help='lists the entries of the history')
+    history_parser.set_defaults(func=history_command)
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of `python -m benchmarks`.
+
+    Returns:
+        0 on success, 1 if a benchmark failed or a regression was found
+        and 2 if an entry of the history was not found.
+    """
+    args = make_parser().parse_args(argv)
+    return args.func(args)
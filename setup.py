@@ -43,6 +43,12 @@ EXTRAS = {
         'mock',
         'nose',
     ],
+    'zstd': [
+        'zstandard',
+    ],
+    'json': [
+        'orjson',
+    ],
 }
 
 # The rest you shouldn't have to touch too much :)
@@ -118,7 +124,8 @@ setup(
     author_email=EMAIL,
     python_requires=REQUIRES_PYTHON,
     url=URL,
-    packages=find_packages(exclude=["tests", "*.tests", "*.tests.*", "tests.*"]),
+    packages=find_packages(exclude=["tests", "*.tests", "*.tests.*", "tests.*",
+                                    "benchmarks", "benchmarks.*"]),
     # entry_points={
     #     'console_scripts': ['mycli=mymodule:cli'],
     # },
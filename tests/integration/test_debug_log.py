@@ -23,16 +23,17 @@ class TestTestee(TestCase):
         self.testee = DebugLogger(*args, **kwargs)
         self.testee.filtered_in = MagicMock()
         self.testee.filtered_out = MagicMock()
-        self.logger = logging.getLogger('DebugLogger')
         self.logger.handlers = []
         self.logger.addHandler(self.testee)
 
     def setUp(self):
-        pass
+        self.logger = logging.getLogger('DebugLogger')
+        self.logger.setLevel(logging.DEBUG)
 
     def tearDown(self):
         self.testee = None
         self.logger.handlers = []
+        self.logger.setLevel(logging.NOTSET)
 
     def test_init_all_goes(self):
         self.do_me_one()
@@ -41,22 +42,22 @@ class TestTestee(TestCase):
         self.testee.filtered_out.assert_not_called()
 
     def test_name_pattern(self):
-        self.do_me_one(name_pattern='Other name')
+        self.do_me_one(include_name_pattern='Other name')
         self.logger.debug("test")
         self.testee.filtered_in.assert_not_called()
         self.testee.filtered_out.assert_called_once()
 
-        self.do_me_one(name_pattern='DebugLogger')
+        self.do_me_one(include_name_pattern='DebugLogger')
         self.logger.debug("test")
         self.testee.filtered_in.assert_called_once()
         self.testee.filtered_out.assert_not_called()
 
-        self.do_me_one(name_pattern=re.compile('O.+e'))
+        self.do_me_one(include_name_pattern=re.compile('O.+e'))
         self.logger.debug("test")
         self.testee.filtered_in.assert_not_called()
         self.testee.filtered_out.assert_called_once()
 
-        self.do_me_one(name_pattern=re.compile('D.+r'))
+        self.do_me_one(include_name_pattern=re.compile('D.+r'))
         self.logger.debug("test")
         self.testee.filtered_in.assert_called_once()
         self.testee.filtered_out.assert_not_called()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+The flight recorder keeps the records of a process that was killed.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, SkipTest
+
+from appupup.flight_recorder import read_flight_recorder
+
+SCRIPT = """
+import logging, os, signal
+from appupup.flight_recorder import FlightRecorderHandler
+handler = FlightRecorderHandler(%r, size=65536)
+logger = logging.getLogger('worker')
+logger.addHandler(handler)
+logger.setLevel(logging.DEBUG)
+for i in range(1000):
+    logger.debug('step %%d', i)
+os.kill(os.getpid(), signal.SIGKILL)
+"""
+
+
+class TestKilledProcess(TestCase):
+    def setUp(self):
+        if not hasattr(signal, 'SIGKILL'):
+            raise SkipTest("needs SIGKILL")
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_records_survive(self):
+        path = os.path.join(self.temp_dir, 'worker.ring')
+        process = subprocess.run([sys.executable, '-c', SCRIPT % path])
+        self.assertEqual(process.returncode, -signal.SIGKILL)
+
+        records = read_flight_recorder(path)['records']
+        self.assertEqual(records[-1], (1000, 'step 999'))
+        self.assertEqual(
+            [sequence for sequence, _ in records],
+            list(range(1001 - len(records), 1001)))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Startup cost of an application built on appupup.
+
+The budgets can be changed with the APPUPUP_IMPORT_BUDGET_MS and
+APPUPUP_STARTUP_BUDGET_MS environment variables on slow machines.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+# Time allowed for `import appupup.main`, as reported by -X importtime.
+IMPORT_BUDGET_MS = float(os.environ.get('APPUPUP_IMPORT_BUDGET_MS', 15))
+
+# Time allowed for importing and running main() with a trivial command.
+STARTUP_BUDGET_MS = float(os.environ.get('APPUPUP_STARTUP_BUDGET_MS', 150))
+
+# Modules that should not be loaded just by importing appupup.main.
+DEFERRED_MODULES = (
+    'appdirs', 'argparse', 'configparser', 'datetime', 'importlib.util',
+    'json', 'logging.handlers', 'mmap', 'random', 'socket', 'gzip',
+    'appupup.log', 'appupup.parse_args',
+)
+
+APP = '''
+import sys, time
+start = time.perf_counter()
+from appupup.main import main
+result = main(
+    app_name='startup_app', app_version='1.0.0', app_stage='',
+    app_author='appupup', app_description='test',
+    app_url='http://localhost',
+    parser_constructor=lambda parser: parser.set_defaults(
+        func=lambda args, logger: 0))
+print((time.perf_counter() - start) * 1000)
+sys.exit(result)
+'''
+
+
+class TestStartup(TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = dict(os.environ)
+        for name in list(self.env):
+            if name.startswith('XDG_'):
+                del self.env[name]
+        self.env['HOME'] = self.home
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        self.env['PYTHONPATH'] = os.pathsep.join(
+            [root] + [x for x in [os.environ.get('PYTHONPATH')] if x])
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def python(self, *args):
+        return subprocess.run(
+            [sys.executable] + list(args), env=self.env, cwd=self.home,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+
+    def test_import_is_lazy(self):
+        output = self.python(
+            '-c', 'import sys, appupup.main; print(" ".join(sys.modules))')
+        loaded = set(output.stdout.split())
+        self.assertEqual(
+            [name for name in DEFERRED_MODULES if name in loaded], [])
+
+    def test_import_budget(self):
+        best = None
+        for _ in range(3):
+            output = self.python('-X', 'importtime', '-c', 'import appupup.main')
+            for line in output.stderr.splitlines():
+                parts = line.split('|')
+                if len(parts) == 3 and parts[2].strip() == 'appupup.main':
+                    value = int(parts[1]) / 1000.0
+                    best = value if best is None else min(best, value)
+        self.assertIsNotNone(best)
+        self.assertLess(best, IMPORT_BUDGET_MS)
+
+    def test_startup_budget(self):
+        best = min(float(self.python('-c', APP).stdout)
+                   for _ in range(3))
+        self.assertLess(best, STARTUP_BUDGET_MS)
+
+    def test_nothing_written(self):
+        # No record reaches the log file, so neither the file nor
+        # the directories of the application are created.
+        self.python('-c', APP)
+        self.assertEqual(os.listdir(self.home), [])
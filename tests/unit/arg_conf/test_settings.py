@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the settings declared with arg_conf.Settings.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import configparser
+from argparse import Namespace
+from unittest import TestCase
+
+from appupup.arg_conf import (
+    FrozenSettings, Setting, Settings, SettingsError, parse_bool, parse_size,
+)
+
+SETTINGS = Settings([
+    Setting('host'),
+    Setting('port', type=int, default=8080),
+    Setting('debug', type=bool, default=False, arg_name=False),
+    Setting('buffer', arg_name='buffer_size', cfg_key='buffer-size',
+            type=parse_size, default=0),
+    Setting('name', cfg_group='app', required=False),
+], group='server')
+
+
+def make_cfg(text):
+    cfg = configparser.ConfigParser()
+    cfg.read_string(text)
+    return cfg
+
+
+def make_args(cfg='', **kwargs):
+    values = dict(host=None, port=None, buffer_size=None, name=None)
+    values.update(kwargs)
+    return Namespace(cfg=make_cfg(cfg), **values)
+
+
+class TestSettings(TestCase):
+    def test_sources(self):
+        result = SETTINGS.resolve(make_args(
+            '[server]\nhost = cfg-host\nport = 90\ndebug = yes\n'
+            'buffer-size = 4K\n', port=100))
+        self.assertIsInstance(result, FrozenSettings)
+        self.assertEqual(result.host, 'cfg-host')
+        self.assertEqual(result.port, 100)
+        self.assertIs(result.debug, True)
+        self.assertEqual(result.buffer, 4096)
+        self.assertIsNone(result.name)
+        self.assertEqual(result.as_dict(), {
+            'host': 'cfg-host', 'port': 100, 'debug': True,
+            'buffer': 4096, 'name': None})
+
+    def test_defaults(self):
+        result = SETTINGS.resolve(make_args(host='h'))
+        self.assertEqual((result.port, result.debug, result.buffer),
+                         (8080, False, 0))
+
+    def test_frozen(self):
+        result = SETTINGS.resolve(make_args(host='h'))
+        with self.assertRaises(AttributeError):
+            result.port = 1
+        with self.assertRaises(AttributeError):
+            result.other = 1
+        with self.assertRaises(AttributeError):
+            del result.host
+        self.assertFalse(hasattr(result, '__dict__'))
+
+    def test_all_errors(self):
+        with self.assertRaises(SettingsError) as context:
+            SETTINGS.resolve(make_args(
+                '[server]\nport = many\ndebug = maybe\n'))
+        errors = context.exception.errors
+        self.assertEqual(len(errors), 3)
+        self.assertIn('host needs to be specified at command line as '
+                      '--host=value or in config file as host=value in '
+                      '[server] section', errors[0])
+        self.assertIn("port has an invalid value 'many' in [server] section",
+                      errors[1])
+        self.assertIn("debug has an invalid value 'maybe'", errors[2])
+        self.assertIsInstance(context.exception, RuntimeError)
+
+    def test_unique_names(self):
+        with self.assertRaises(ValueError):
+            Settings([Setting('a'), Setting('a', cfg_key='b')])
+
+    def test_shared_declarations(self):
+        port = Setting('port', type=int)
+        first = Settings([port], group='first')
+        second = Settings([port], group='second')
+        self.assertIsNone(port.cfg_group)
+        cfg = '[first]\nport = 1\n[second]\nport = 2\n'
+        self.assertEqual(first.resolve(make_args(cfg)).port, 1)
+        self.assertEqual(second.resolve(make_args(cfg)).port, 2)
+
+    def test_parse_bool(self):
+        for value in ('yes', 'True', 'on', '1', True):
+            self.assertIs(parse_bool(value), True)
+        for value in ('no', 'FALSE', 'off', '0', False):
+            self.assertIs(parse_bool(value), False)
+        with self.assertRaises(ValueError):
+            parse_bool('maybe')
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the benchmark suite.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+from unittest.mock import patch
+
+from benchmarks.suite import (
+    append_history, benchmark_names, compare, find_entry, load_history,
+    main, make_entry, regressions, run_benchmarks)
+
+
+class FakeBenchmark(object):
+    """ Stands for a bench_* module. """
+    @staticmethod
+    def run():
+        return [('fast', 1.0), ('slow', 2.0)]
+
+
+def import_benchmark(name):
+    if name == 'benchmarks.bench_broken':
+        raise ImportError("broken")
+    return FakeBenchmark
+
+
+def entry(label, commit, **results):
+    return {'time': '2020-01-01T00:00:00', 'commit': commit, 'label': label,
+            'results': results, 'errors': {}}
+
+
+class TestSuite(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'hist', 'history.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_names(self):
+        names = benchmark_names()
+        for name in ('debug_logger', 'file_handler', 'startup', 'config'):
+            self.assertIn(name, names)
+
+    @patch('importlib.import_module', import_benchmark)
+    def test_run(self):
+        results, errors = run_benchmarks(['fake'], verbose=False)
+        self.assertEqual(results, {'fake': {'fast': 1.0, 'slow': 2.0}})
+        self.assertEqual(errors, {})
+
+        results, errors = run_benchmarks(['fake', 'broken'], verbose=False)
+        self.assertEqual(list(results), ['fake'])
+        self.assertIn('ImportError: broken', errors['broken'])
+
+    def test_history(self):
+        self.assertEqual(load_history(self.path), [])
+        first = make_entry({'a': {'x': 1.0}}, label='base')
+        append_history(self.path, first)
+        append_history(self.path, make_entry({'a': {'x': 2.0}}))
+        history = load_history(self.path)
+        self.assertEqual(history[0], first)
+        self.assertEqual(history[1]['results'], {'a': {'x': 2.0}})
+        self.assertIsNone(history[1]['label'])
+
+    def test_find_entry(self):
+        history = [entry('base', 'abc123'), entry(None, 'def456'),
+                   entry('base', '789abc')]
+        self.assertIs(find_entry(history, '-1'), history[2])
+        self.assertIs(find_entry(history, '0'), history[0])
+        self.assertIs(find_entry(history, 'base'), history[2])
+        self.assertIs(find_entry(history, 'def'), history[1])
+        with self.assertRaises(LookupError):
+            find_entry(history, '5')
+        with self.assertRaises(LookupError):
+            find_entry(history, 'other')
+
+    def test_compare(self):
+        old = entry(None, None, a={'x': 10.0, 'y': 10.0, 'gone': 1.0},
+                    b={'z': 4.0})
+        new = entry(None, None, a={'x': 10.5, 'y': 12.0, 'new': 1.0},
+                    c={'w': 1.0})
+        rows = compare(old, new)
+        self.assertEqual([row[:4] for row in rows], [
+            ('a', 'x', 10.0, 10.5), ('a', 'y', 10.0, 12.0)])
+        self.assertAlmostEqual(rows[0][4], 0.05)
+        self.assertEqual([row[1] for row in regressions(rows)], ['y'])
+        self.assertEqual(len(regressions(rows, threshold=0.01)), 2)
+        self.assertEqual(regressions(rows, threshold=0.5), [])
+
+    def test_compare_command(self):
+        append_history(self.path, entry('base', None, a={'x': 10.0}))
+        append_history(self.path, entry(None, None, a={'x': 12.0}))
+        with redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(main(['--history', self.path, 'compare']), 1)
+            self.assertEqual(main(['--history', self.path, 'compare',
+                                   '--threshold', '0.5']), 0)
+            self.assertEqual(main(['--history', self.path, 'compare',
+                                   '--baseline', '-1']), 0)
+            self.assertEqual(main(['--history', self.path, 'history']), 0)
+        self.assertIn('+20.0%', output.getvalue())
+        self.assertIn('1 result(s) slower by more than 10%',
+                      output.getvalue())
+
+    @patch('importlib.import_module', import_benchmark)
+    def test_run_command(self):
+        with redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(main(['--history', self.path, 'run',
+                                   '-b', 'settings', '--label', 'x']), 0)
+            self.assertEqual(main(['--history', self.path, 'run',
+                                   '-b', 'settings', '--compare']), 0)
+            self.assertEqual(main(['--history', self.path, 'run',
+                                   '-b', 'settings', '--no-save']), 0)
+        history = load_history(self.path)
+        self.assertEqual([e['label'] for e in history], ['x', None])
+        self.assertEqual(history[1]['results'],
+                         {'settings': {'fast': 1.0, 'slow': 2.0}})
+        self.assertIn('baseline:', output.getvalue())
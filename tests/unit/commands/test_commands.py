@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the lazy subcommands.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from appupup.commands import Command, LazyCommandParser
+
+COMMAND_MODULE = '''"""
+%s
+
+More text.
+"""
+def setup_parser(parser):
+    parser.add_argument('--count', type=int, default=1)
+
+
+def run(args, logger):
+    return '%s'
+'''
+
+
+class CountAction(argparse.Action):
+    calls = 0
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        CountAction.calls = CountAction.calls + 1
+        setattr(namespace, self.dest, values)
+
+
+class TestLazyCommands(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.package = 'lazy_cmd_test_pkg'
+        package_dir = os.path.join(self.temp_dir, self.package)
+        os.mkdir(package_dir)
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+            f.write('')
+        for name in ('alpha', 'beta'):
+            with open(os.path.join(package_dir, name + '.py'), 'w') as f:
+                f.write(COMMAND_MODULE % ('The %s command.' % name, name))
+        sys.path.insert(0, self.temp_dir)
+        self.index_path = os.path.join(self.temp_dir, 'udd', 'index.json')
+        self.forget()
+
+    def tearDown(self):
+        self.forget()
+        sys.path.remove(self.temp_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def forget(self):
+        for name in list(sys.modules):
+            if name.startswith(self.package):
+                del sys.modules[name]
+
+    def imported(self):
+        return sorted(name.rsplit('.', 1)[-1] for name in sys.modules
+                      if name.startswith(self.package + '.'))
+
+    def make_parser(self, version='1.0', **kwargs):
+        parser = LazyCommandParser(prog='app')
+        parser.add_argument('--verbose', action='store_true')
+        parser.add_lazy_commands([
+            Command('alpha', self.package + '.alpha', **kwargs),
+            Command('beta', self.package + '.beta'),
+        ], index_path=self.index_path, version=version)
+        return parser
+
+    def test_only_used_command_imported(self):
+        self.make_parser()
+        self.forget()
+        parser = self.make_parser()
+        self.assertEqual(self.imported(), [])
+        args = parser.parse_args(['--verbose', 'beta', '--count', '3'])
+        self.assertEqual(self.imported(), ['beta'])
+        self.assertEqual(args.command, 'beta')
+        self.assertEqual(args.count, 3)
+        self.assertTrue(args.verbose)
+        self.assertEqual(args.func(args, None), 'beta')
+
+    def test_no_command(self):
+        parser = self.make_parser(help='first')
+        self.forget()
+        args = parser.parse_args(['--verbose'])
+        self.assertIsNone(args.command)
+        self.assertFalse(hasattr(args, 'func'))
+        self.assertEqual(self.imported(), [])
+
+    def test_unknown_argument(self):
+        parser = self.make_parser()
+        with self.assertRaises(SystemExit):
+            with redirect_stdout(io.StringIO()):
+                parser.parse_args(['alpha', '--other'])
+
+    def test_help_from_index(self):
+        parser = self.make_parser()
+        self.assertEqual(self.imported(), ['alpha', 'beta'])
+        with open(self.index_path) as f:
+            self.assertEqual(json.load(f)['helps'], {
+                'alpha': 'The alpha command.',
+                'beta': 'The beta command.'})
+
+        self.forget()
+        parser = self.make_parser()
+        output = io.StringIO()
+        with self.assertRaises(SystemExit):
+            with redirect_stdout(output):
+                parser.parse_args(['--help'])
+        self.assertIn('The beta command.', output.getvalue())
+        self.assertEqual(self.imported(), [])
+
+    def test_declared_help(self):
+        self.make_parser(help='Declared.')
+        self.forget()
+        output = io.StringIO()
+        with self.assertRaises(SystemExit):
+            with redirect_stdout(output):
+                self.make_parser(help='Declared.').parse_args(
+                    ['alpha', '--help'])
+        self.assertIn('Declared.', output.getvalue())
+        self.assertIn('--count', output.getvalue())
+        self.assertEqual(self.imported(), ['alpha'])
+
+    def test_version_invalidates_index(self):
+        self.make_parser(version='1.0')
+        package_dir = os.path.join(self.temp_dir, self.package)
+        with open(os.path.join(package_dir, 'beta.py'), 'w') as f:
+            f.write(COMMAND_MODULE % ('Changed.', 'beta'))
+        self.forget()
+        self.make_parser(version='1.0')
+        with open(self.index_path) as f:
+            self.assertEqual(json.load(f)['helps']['beta'],
+                             'The beta command.')
+        self.forget()
+        self.make_parser(version='1.1')
+        with open(self.index_path) as f:
+            self.assertEqual(json.load(f)['helps']['beta'], 'Changed.')
+
+    def test_find_command(self):
+        parser = self.make_parser()
+        parser.add_argument('--name')
+        parser.add_argument('--pair', nargs=2)
+        self.assertEqual(parser.find_command(['--name', 'alpha', 'beta']),
+                         'beta')
+        self.assertEqual(parser.find_command(['--na', 'alpha', 'beta']),
+                         'beta')
+        self.assertEqual(parser.find_command(['--name=beta', 'alpha']),
+                         'alpha')
+        self.assertEqual(parser.find_command(
+            ['--pair', 'alpha', 'beta', '--verbose', 'alpha']), 'alpha')
+        self.assertEqual(parser.find_command(['--', 'beta']), 'beta')
+        self.assertIsNone(parser.find_command(['--name', 'alpha']))
+
+    def test_actions_run_once(self):
+        parser = self.make_parser()
+        parser.add_argument('--count-me', action=CountAction)
+        CountAction.calls = 0
+        args = parser.parse_args(['--count-me', 'x', 'alpha'])
+        self.assertEqual(CountAction.calls, 1)
+        self.assertEqual(args.count_me, 'x')
+        self.assertEqual(args.command, 'alpha')
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the shell completion.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase, skipIf
+
+from appupup.commands import Command
+from appupup.completion import (
+    add_completion_arguments, completion_script, completion_spec,
+    refresh_spec, spec_stamp, spec_version, write_spec,
+)
+from appupup.parse_args import make_argument_parser
+
+BASH = shutil.which('bash')
+
+
+def make_parser(spec_path=None):
+    parser = argparse.ArgumentParser(prog='myapp')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--config', metavar='file')
+    parser.add_argument('--format', choices=('text', 'json'))
+    parser.add_argument('--secret', help=argparse.SUPPRESS)
+    if spec_path is not None:
+        add_completion_arguments(parser, spec_path, '1.0')
+    subparsers = parser.add_subparsers(dest='command')
+    serve = subparsers.add_parser('serve')
+    serve.add_argument('--port', type=int)
+    serve.add_argument('mode', choices=('fast', 'slow'))
+    copy = subparsers.add_parser('copy')
+    copy.add_argument('source', type=argparse.FileType('r'))
+    copy.add_argument('--into').completion = '@dir'
+    return parser
+
+
+class TestSpec(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'udd', 'completion.spec')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_spec(self):
+        entries = completion_spec(make_parser())
+        self.assertIn(('', 'opt', '--verbose', ''), entries)
+        self.assertIn(('', 'opt', '-h', ''), entries)
+        self.assertIn(('', 'val', '--config', '@file'), entries)
+        self.assertIn(('', 'val', '--format', 'text json'), entries)
+        self.assertIn(('', 'cmd', 'serve', ''), entries)
+        self.assertIn(('serve', 'val', '--port', ''), entries)
+        self.assertIn(('serve', 'pos', 'mode', 'fast slow'), entries)
+        self.assertIn(('copy', 'pos', 'source', '@file'), entries)
+        self.assertIn(('copy', 'val', '--into', '@dir'), entries)
+        self.assertFalse(any(entry[2] == '--secret' for entry in entries))
+
+    def test_refresh(self):
+        parser = make_parser()
+        self.assertFalse(refresh_spec(self.path, parser, '1.0'))
+        self.assertFalse(os.path.exists(self.path))
+        write_spec(self.path, parser, '1.0')
+        self.assertEqual(spec_version(self.path), '1.0')
+        self.assertFalse(refresh_spec(self.path, parser, '1.0'))
+        self.assertTrue(refresh_spec(self.path, parser, '1.1'))
+        self.assertEqual(spec_version(self.path), '1.1')
+        self.assertTrue(os.path.exists(spec_stamp(self.path, '1.1')))
+        self.assertFalse(os.path.exists(spec_stamp(self.path, '1.0')))
+
+    def test_refresh_stamp(self):
+        parser = make_parser()
+        write_spec(self.path, parser, '1.0')
+        with open(self.path, 'w') as f:
+            f.write('not read\n')
+        # With the stamp of the version the spec is not read.
+        self.assertFalse(refresh_spec(self.path, parser, '1.0'))
+        self.assertEqual(open(self.path).read(), 'not read\n')
+        os.remove(spec_stamp(self.path, '1.0'))
+        write_spec(self.path, parser, '1.0')
+        os.remove(spec_stamp(self.path, '1.0'))
+        # A current spec without a stamp gets one.
+        self.assertFalse(refresh_spec(self.path, parser, '1.0'))
+        self.assertTrue(os.path.exists(spec_stamp(self.path, '1.0')))
+
+    def test_udd(self):
+        udd = os.path.join(self.temp_dir, 'other')
+        argv = ['--ud', udd, '--completion-spec']
+        parser = make_argument_parser(
+            'appupup', 'test_completion', 'test', 'http://localhost',
+            commands=[Command('run', 'appupup.main', func='main')],
+            app_version='1.0', argv=argv)
+        with self.assertRaises(SystemExit):
+            parser.parse_args(argv)
+        self.assertEqual(spec_version(os.path.join(udd, 'completion.spec')),
+                         '1.0')
+        self.assertEqual(parser.lazy_commands.index.path,
+                         os.path.join(udd, 'command-index.json'))
+
+    def test_arguments(self):
+        parser = make_parser(self.path)
+        output = io.StringIO()
+        with self.assertRaises(SystemExit), redirect_stdout(output):
+            parser.parse_args(['--completion-script', 'bash'])
+        self.assertIn('complete -o filenames -F _appupup_complete_myapp '
+                      'myapp', output.getvalue())
+        self.assertIn(self.path, output.getvalue())
+        with self.assertRaises(SystemExit):
+            parser.parse_args(['--completion-spec'])
+        self.assertEqual(spec_version(self.path), '1.0')
+        self.assertIn('--completion-script', open(self.path).read())
+        self.assertNotIn('--completion-spec', open(self.path).read())
+
+
+@skipIf(BASH is None, 'bash is not available')
+class TestBash(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'completion.spec')
+        write_spec(self.path, make_parser(), '1.0')
+        self.script = completion_script('bash', 'myapp', self.path)
+        for name in ('data.txt', 'docs'):
+            if name == 'docs':
+                os.mkdir(os.path.join(self.temp_dir, name))
+            else:
+                open(os.path.join(self.temp_dir, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def complete(self, *words):
+        command = '%s\nCOMP_WORDS=(%s)\nCOMP_CWORD=%d\n' \
+            '_appupup_complete_myapp\nprintf "%%s\\n" "${COMPREPLY[@]}"' % (
+                self.script, ' '.join("'%s'" % word for word in words),
+                len(words) - 1)
+        output = subprocess.run(
+            [BASH, '--norc', '--noprofile', '-c', command],
+            cwd=self.temp_dir, stdout=subprocess.PIPE, check=True,
+            universal_newlines=True).stdout
+        return sorted(line for line in output.split('\n') if line)
+
+    def test_commands(self):
+        self.assertEqual(self.complete('myapp', ''), ['copy', 'serve'])
+        self.assertEqual(self.complete('myapp', 's'), ['serve'])
+
+    def test_options(self):
+        self.assertEqual(self.complete('myapp', '--f'), ['--format'])
+        self.assertEqual(self.complete('myapp', '--format', ''),
+                         ['json', 'text'])
+        self.assertEqual(self.complete('myapp', 'serve', '--'),
+                         ['--help', '--port'])
+
+    def test_positionals(self):
+        self.assertEqual(self.complete('myapp', 'serve', ''),
+                         ['fast', 'slow'])
+        self.assertEqual(self.complete('myapp', 'copy', 'd'),
+                         ['data.txt', 'docs'])
+        self.assertEqual(self.complete('myapp', 'copy', '--into', 'd'),
+                         ['docs'])
+        self.assertEqual(self.complete('myapp', '--config', 'd'),
+                         ['data.txt', 'docs'])
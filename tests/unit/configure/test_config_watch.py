@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for reloading the config file.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from argparse import Namespace
+from unittest import TestCase
+
+from appupup.config_watch import (
+    ConfigWatcher, config_diff, log_level_callback, watch_config)
+from appupup.configure import read_config
+
+
+class TestConfigWatch(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'app.cfg')
+        self.version = 0
+        self.write('[main]\nname = app\n')
+        self.args = Namespace(config_file=self.path,
+                              cfg=read_config(self.path)[0])
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, content, name='app.cfg'):
+        # A different mtime for each version, even on coarse file systems.
+        self.version += 1
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        mtime = 1000000 + self.version
+        os.utime(path, (mtime, mtime))
+
+    def callback(self, changes, old, new):
+        self.calls.append((changes, old, new))
+
+    def make_watcher(self, **kwargs):
+        watcher = ConfigWatcher(self.args, settle=0, **kwargs)
+        watcher.add_callback(self.callback)
+        return watcher
+
+    def test_diff(self):
+        old = read_config(self.path)[0]
+        self.write('[main]\nname = other\nsize = 1\n[extra]\nkey = 2\n')
+        new = read_config(self.path)[0]
+        self.assertEqual(config_diff(old, new), {
+            ('main', 'name'): ('app', 'other'),
+            ('main', 'size'): (None, '1'),
+            ('extra', 'key'): (None, '2'),
+        })
+        self.assertEqual(config_diff(new, new), {})
+
+    def test_reload(self):
+        watcher = self.make_watcher()
+        old = self.args.cfg
+        self.assertIsNone(watcher.check())
+        self.write('[main]\nname = other\n[include]\nmore = more.cfg\n')
+        self.assertEqual(watcher.check(),
+                         {('main', 'name'): ('app', 'other')})
+        self.assertIsNot(self.args.cfg, old)
+        self.assertEqual(old['main']['name'], 'app')
+        self.assertEqual(self.args.cfg['main']['name'], 'other')
+        self.assertEqual(len(self.calls), 1)
+        self.assertIs(self.calls[0][1], old)
+
+        # The included file is watched too.
+        self.write('[main]\nname = more\n', name='more.cfg')
+        watcher.check()
+        self.assertEqual(self.args.cfg['main']['name'], 'more')
+        self.assertEqual(watcher.reloads, 2)
+
+    def test_invalid(self):
+        watcher = self.make_watcher()
+        old = self.args.cfg
+        self.write('[main\nname = other\n')
+        self.assertIsNone(watcher.check())
+        self.assertIs(self.args.cfg, old)
+        self.assertIsNone(watcher.check())
+        self.assertEqual(self.calls, [])
+
+    def wait_for_reload(self, use_inotify):
+        watcher = self.make_watcher(interval=0.05, use_inotify=use_inotify)
+        watcher.start()
+        try:
+            time.sleep(0.1)
+            self.write('[main]\nname = watched\n')
+            deadline = time.time() + 5
+            while not watcher.reloads and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(self.args.cfg['main']['name'], 'watched')
+        return watcher
+
+    def test_thread_polling(self):
+        self.wait_for_reload(False)
+
+    def test_thread_inotify(self):
+        self.wait_for_reload(True)
+
+    def test_stop_wakes_inotify(self):
+        watcher = self.make_watcher(interval=30)
+        watcher.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        watcher.stop()
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_watch_config_callbacks(self):
+        self.write('[main]\nname = changed\n')
+        watcher = watch_config(self.args, interval=30, use_inotify=False,
+                               callbacks=[self.callback])
+        try:
+            deadline = time.time() + 5
+            while not self.calls and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.calls[0][2]['main']['name'], 'changed')
+
+    def test_log_levels(self):
+        handler = logging.NullHandler()
+        handler.setLevel(logging.INFO)
+        root = logging.getLogger()
+        root_level = root.level
+        self.args.log_handlers = [handler]
+        self.args.log_level_fixed = False
+        watcher = self.make_watcher()
+        watcher.add_callback(log_level_callback(self.args))
+        try:
+            self.write('[log]\nlevel = WARNING\n'
+                       '[loggers]\nappupup.test.watch = ERROR\n')
+            watcher.check()
+            self.assertEqual(handler.level, logging.WARNING)
+            self.assertEqual(self.args.log_level, logging.WARNING)
+            self.assertEqual(
+                logging.getLogger('appupup.test.watch').level, logging.ERROR)
+
+            self.write('[log]\nlevel = 10\n')
+            watcher.check()
+            self.assertEqual(handler.level, logging.DEBUG)
+            self.assertEqual(
+                logging.getLogger('appupup.test.watch').level,
+                logging.NOTSET)
+
+            self.args.log_level_fixed = True
+            self.write('[log]\nlevel = ERROR\n')
+            watcher.check()
+            self.assertEqual(handler.level, logging.DEBUG)
+        finally:
+            root.setLevel(root_level)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for reading the config file.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from appupup import configure
+from appupup.configure import cache_file, load_config, read_config
+
+
+class TestConfig(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.path = self.write('app.cfg', '[main]\nname = app\nsize = 1\n'
+                                          '[include]\ncommon = common.cfg\n'
+                                          'extra = conf.d/*.cfg\n')
+        self.write('common.cfg', '[main]\nsize = 2\n[common]\nkey = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.temp_dir, name)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_include(self):
+        self.write('conf.d/b.cfg', '[main]\nsize = 4\n')
+        self.write('conf.d/a.cfg', '[main]\nsize = 3\n[include]\nx = a.cfg\n')
+        parser, dependencies = read_config(self.path)
+        self.assertEqual(parser['main']['name'], 'app')
+        self.assertEqual(parser['main']['size'], '4')
+        self.assertEqual(parser['common']['key'], '1')
+        self.assertFalse(parser.has_section('include'))
+        self.assertEqual(
+            [os.path.relpath(path, self.temp_dir)
+             for path, _ in dependencies],
+            ['app.cfg', 'conf.d', 'common.cfg',
+             os.path.join('conf.d', 'a.cfg'), os.path.join('conf.d', 'b.cfg')])
+
+    def test_missing(self):
+        path = os.path.join(self.temp_dir, 'missing.cfg')
+        self.assertEqual(load_config(path, self.cache_dir).sections(), [])
+        self.assertFalse(os.path.exists(self.cache_dir))
+        self.assertEqual(load_config('-', self.cache_dir).sections(), [])
+
+    def test_cached(self):
+        first = load_config(self.path, self.cache_dir)
+        self.assertTrue(os.path.exists(cache_file(self.cache_dir, self.path)))
+        with patch.object(configure, 'read_config') as read:
+            second = load_config(self.path, self.cache_dir)
+            self.assertFalse(read.called)
+        self.assertEqual(second.sections(), first.sections())
+        self.assertEqual(second['main']['size'], '2')
+        self.assertEqual(second.getint('common', 'key'), 1)
+        self.assertEqual(dict(second['main']), dict(first['main']))
+        second.remove_section('common')
+        second['new'] = {'a': 'b'}
+        self.assertEqual(second.sections(), ['main', 'new'])
+
+    def test_invalidated(self):
+        load_config(self.path, self.cache_dir)
+        self.write('common.cfg', '[main]\nsize = 22\n', mtime=1)
+        self.assertEqual(
+            load_config(self.path, self.cache_dir)['main']['size'], '22')
+        self.write('conf.d/new.cfg', '[main]\nsize = 5\n')
+        self.assertEqual(
+            load_config(self.path, self.cache_dir)['main']['size'], '5')
+        os.remove(os.path.join(self.temp_dir, 'common.cfg'))
+        self.assertFalse(
+            load_config(self.path, self.cache_dir).has_section('common'))
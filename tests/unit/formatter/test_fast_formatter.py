@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for FastFormatter.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import sys
+from unittest import TestCase
+
+from appupup.formatter import FastFormatter
+
+FORMATS = (
+    ("%(levelname)s: %(message)s", '%M:%S'),
+    ("[%(asctime)s] [%(levelname)-7s] [%(name)-19s] [%(threadName)-15s] "
+     "[%(funcName)-25s] %(message)s", '%M:%S'),
+    ("%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
+     "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+     "[%(funcName)-25s] | %(message)s", '%Y-%m-%d %H:%M:%S'),
+    ("[%(asctime)s.%(msecs)03d] %(message)s 100%% %%(name)s", '%M:%S'),
+    ("%(asctime)s %(message)s", None),
+    ("%(message)s", None),
+    ("%(message)s 100%%", None),
+    ("{asctime} {message}", None),
+)
+
+
+def make_record(created, msg='message %d', args=(1, ), exc_info=None):
+    record = logging.LogRecord(
+        'a.b', logging.INFO, '/path/file.py', 12, msg, args, exc_info,
+        func='func')
+    record.created = created
+    record.msecs = (created - int(created)) * 1000
+    return record
+
+
+class TestFastFormatter(TestCase):
+    def test_same_output(self):
+        try:
+            raise ValueError('error')
+        except ValueError:
+            exc_info = sys.exc_info()
+
+        for fmt, datefmt in FORMATS:
+            style = '{' if fmt.startswith('{') else '%'
+            expected = logging.Formatter(fmt, datefmt, style=style)
+            testee = FastFormatter(fmt, datefmt, style=style)
+            for created in (1573822800.0, 1573822800.5, 1573822801.25,
+                            1573822801.999, 1573822862.0, 1573822800.5):
+                for exc in (None, exc_info):
+                    self.assertEqual(
+                        testee.format(make_record(created, exc_info=exc)),
+                        expected.format(make_record(created, exc_info=exc)))
+
+    def test_missing_field(self):
+        with self.assertRaises(ValueError):
+            FastFormatter('%(other)s').format(make_record(0))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for JsonFormatter.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import logging
+import sys
+from unittest import TestCase
+
+from appupup import formatter
+from appupup.formatter import JsonFormatter
+
+
+def make_record(msg='message %d', args=(1, ), exc_info=None):
+    record = logging.LogRecord(
+        'a.b', logging.INFO, '/path/file.py', 12, msg, args, exc_info,
+        func='func')
+    record.created = 0
+    record.msecs = 5
+    return record
+
+
+class TestJsonFormatter(TestCase):
+    def test_keys(self):
+        text = JsonFormatter(datefmt='%Y').format(make_record())
+        self.assertNotIn('\n', text)
+        data = json.loads(text)
+        self.assertEqual(list(data), [
+            'time', 'level', 'name', 'file', 'line', 'thread', 'function',
+            'message', 'exception'])
+        self.assertEqual(data['time'], '1970.005')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['file'], 'file.py')
+        self.assertEqual(data['line'], 12)
+        self.assertEqual(data['message'], 'message 1')
+        self.assertIsNone(data['exception'])
+
+    def test_default_datefmt(self):
+        data = json.loads(JsonFormatter(datefmt=None).format(make_record()))
+        self.assertTrue(data['time'].endswith(',005'))
+        self.assertEqual(data['time'].count('005'), 1)
+
+    def test_exception(self):
+        try:
+            raise ValueError('bad\nvalue')
+        except ValueError:
+            record = make_record(exc_info=sys.exc_info())
+        text = JsonFormatter().format(record)
+        self.assertNotIn('\n', text)
+        self.assertIn('ValueError: bad', json.loads(text)['exception'])
+
+    def test_stdlib_encoder(self):
+        record = make_record(msg='ă "quoted"', args=None)
+        self.assertEqual(
+            JsonFormatter(dumps=formatter.stdlib_json_dumps).format(record),
+            JsonFormatter().format(record))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for hooks.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from importlib.util import cache_from_source
+from unittest import TestCase
+
+from appupup.hooks import (
+    HookPipeline, find_hook_file, hook_file_from_argv, load_hook_module)
+
+logger = logging.getLogger('appupup.test.hooks')
+
+
+class TestHookFile(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_from_argv(self):
+        self.assertEqual(hook_file_from_argv(['--hook-file', 'a.py']), 'a.py')
+        self.assertEqual(hook_file_from_argv(['-v', '--hook-file=b.py']),
+                         'b.py')
+        self.assertIsNone(hook_file_from_argv(['--', '--hook-file', 'a.py']))
+        self.assertIsNone(hook_file_from_argv(['--hook-file']))
+
+    def test_from_argv_abbreviation(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--hooks', action='store_true')
+        parser.add_argument('--hook-file')
+        self.assertEqual(hook_file_from_argv(['--hook-f', 'a.py'], parser),
+                         'a.py')
+        self.assertEqual(hook_file_from_argv(['--hook-=b.py'], parser),
+                         'b.py')
+        # Ambiguous, like for argparse.
+        self.assertIsNone(hook_file_from_argv(['--hook', 'a.py'], parser))
+        self.assertIsNone(hook_file_from_argv(['--hook-f', 'a.py']))
+
+        parser = argparse.ArgumentParser(allow_abbrev=False)
+        parser.add_argument('--hook-file')
+        self.assertIsNone(hook_file_from_argv(['--hook-f', 'a.py'], parser))
+
+    def test_find(self):
+        self.assertEqual(find_hook_file('pkg', 'x.py'), 'x.py')
+        os.makedirs(os.path.join(self.temp_dir, 'work', 'pkg'))
+        os.chdir(os.path.join(self.temp_dir, 'work'))
+        self.assertIsNone(find_hook_file('pkg'))
+
+        # A file created later is found by the next search.
+        path = self.write(os.path.join('work', 'pkg', 'overrides.py'), '')
+        self.assertEqual(os.path.realpath(find_hook_file('pkg')),
+                         os.path.realpath(path))
+
+        os.chdir(os.path.join(self.temp_dir, 'work', 'pkg'))
+        self.assertEqual(os.path.realpath(find_hook_file('pkg')),
+                         os.path.realpath(path))
+
+        os.remove(path)
+        self.assertIsNone(find_hook_file('pkg'))
+
+    def test_load(self):
+        path = self.write('hook_a.py', 'VALUE = 1\n')
+        module = load_hook_module(path)
+        self.assertEqual(module.VALUE, 1)
+        self.assertIs(load_hook_module(path), module)
+        if not sys.dont_write_bytecode:
+            self.assertTrue(os.path.exists(cache_from_source(path)))
+
+        stat = os.stat(path)
+        self.write('hook_a.py', 'VALUE = 22\n')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(load_hook_module(path).VALUE, 22)
+
+    def test_load_error(self):
+        path = self.write('hook_b.py', 'import appupup_missing_module\n')
+        pipeline = HookPipeline()
+        self.assertFalse(pipeline.load(path))
+        with self.assertLogs(logger, 'ERROR') as logs:
+            pipeline.start_reporting(logger)
+        self.assertIn('hook_b.py could not be loaded', logs.output[0])
+        self.assertIn('ModuleNotFoundError', logs.output[0])
+
+
+class TestHookPipeline(TestCase):
+    def test_stages(self):
+        calls = []
+        pipeline = HookPipeline({
+            'pre_run': lambda *a: calls.append(('a', a)),
+            'init': [lambda *a: calls.append(('init', a))],
+        })
+        pipeline.add('pre_run', lambda *a: calls.append(('b', a)))
+        pipeline.run('pre_run', 1, 2)
+        pipeline.run('post_logging', 3)
+        pipeline.run('on_exit', 4)
+        self.assertEqual(calls, [('a', (1, 2)), ('b', (1, 2)),
+                                 ('init', (3, ))])
+        self.assertEqual([t[0] for t in pipeline.timings],
+                         ['pre_run', 'pre_run', 'post_logging'])
+        with self.assertRaises(ValueError):
+            pipeline.add('after_everything', print)
+
+    def test_timings(self):
+        def slow_hook(args):
+            time.sleep(0.02)
+
+        def fast_hook(args):
+            pass
+
+        pipeline = HookPipeline({'pre_run': [slow_hook, fast_hook]},
+                                slow=0.01)
+        pipeline.run('pre_run', None)
+        with self.assertLogs(logger, 'DEBUG') as logs:
+            pipeline.start_reporting(logger)
+            pipeline.add('post_run', lambda args, result: 1 / result)
+            with self.assertRaises(ZeroDivisionError):
+                pipeline.run('post_run', None, 0)
+        self.assertEqual(len(pipeline.timings), 3)
+        self.assertEqual([r.levelname for r in logs.records],
+                         ['WARNING', 'DEBUG', 'DEBUG'])
+        self.assertIn('slow_hook (pre_run)', logs.output[0])
+        self.assertIn('<lambda> (post_run)', logs.output[2])
@@ -28,19 +28,19 @@ class TestTestee(TestCase):
     def test_init(self):
         self.testee = DebugLogger()
 
-    def test_check_one(self):
-        self.assertTrue(self.testee.check_one(None, 1))
-        self.assertFalse(self.testee.check_one(
+    def test_filter_include(self):
+        self.assertTrue(self.testee.filter_include(None, 1))
+        self.assertFalse(self.testee.filter_include(
             re.compile('d'), 1))
-        self.assertFalse(self.testee.check_one(
+        self.assertFalse(self.testee.filter_include(
             'd', 1))
-        self.assertTrue(self.testee.check_one(
+        self.assertTrue(self.testee.filter_include(
             re.compile('[0-9]+'), 112233))
-        self.assertFalse(self.testee.check_one(
+        self.assertFalse(self.testee.filter_include(
             re.compile('[0-9]+'), 'abcd'))
-        self.assertTrue(self.testee.check_one(
+        self.assertTrue(self.testee.filter_include(
             re.compile('1'), 1))
-        self.assertTrue(self.testee.check_one(
+        self.assertTrue(self.testee.filter_include(
             '1', 1))
 
     def test_check_interval(self):
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the flight recorder.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+
+from appupup.flight_recorder import (
+    FlightRecorderHandler, child_path, read_flight_recorder, HEADER_SIZE,
+    SLOT)
+
+
+def make_record(msg):
+    return logging.makeLogRecord({'levelno': logging.DEBUG, 'msg': msg})
+
+
+class TestFlightRecorder(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.ring')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_ring(self):
+        testee = FlightRecorderHandler(
+            self.path, size=HEADER_SIZE + 4 * 64, slot_size=64, keep=True)
+        for i in range(10):
+            testee.handle(make_record('record %d' % i))
+        testee.handle(make_record('x' * 100))
+        testee.close()
+
+        content = read_flight_recorder(self.path)
+        self.assertEqual(content['pid'], os.getpid())
+        self.assertEqual(content['records'], [
+            (8, 'record 7'), (9, 'record 8'), (10, 'record 9'),
+            (11, 'x' * (64 - SLOT.size))])
+
+    def test_torn_slot(self):
+        testee = FlightRecorderHandler(
+            self.path, size=HEADER_SIZE + 4 * 64, slot_size=64, keep=True)
+        testee.handle(make_record('first'))
+        testee.handle(make_record('second'))
+        # A write that was interrupted before the header was updated.
+        start = HEADER_SIZE + 2 * 64 + SLOT.size
+        testee.map[start:start + 3] = b'new'
+        testee.close()
+
+        self.assertEqual(
+            read_flight_recorder(self.path)['records'], [(1, 'first')])
+
+    def test_removed_on_close(self):
+        testee = FlightRecorderHandler(self.path, size=4096)
+        testee.handle(make_record('first'))
+        testee.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_a_recorder(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 128)
+        with self.assertRaises(ValueError):
+            read_flight_recorder(self.path)
+
+    def test_child_path(self):
+        self.assertEqual(child_path('/x/app-12.ring', 34), '/x/app-34.ring')
+        self.assertEqual(child_path('/x/my-app.ring', 34),
+                         '/x/my-app-34.ring')
+
+    @skipUnless(hasattr(os, 'fork'), "needs fork")
+    def test_fork(self):
+        path = os.path.join(self.temp_dir, 'app-%d.ring' % os.getpid())
+        testee = FlightRecorderHandler(path, size=4096, keep=True)
+        testee.handle(make_record('parent'))
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                testee.handle(make_record('child'))
+                code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        testee.handle(make_record('parent again'))
+        testee.close()
+
+        self.assertEqual(read_flight_recorder(path)['records'],
+                         [(1, 'parent'), (2, 'parent again')])
+        content = read_flight_recorder(
+            os.path.join(self.temp_dir, 'app-%d.ring' % pid))
+        self.assertEqual(content['pid'], pid)
+        self.assertEqual(content['records'], [(1, 'child')])
+
+    @skipUnless(hasattr(os, 'fork'), "needs fork")
+    def test_fork_without_records(self):
+        testee = FlightRecorderHandler(self.path, size=4096)
+        pid = os.fork()
+        if pid == 0:
+            testee.close()
+            os._exit(0 if os.path.exists(self.path) else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        self.assertEqual(os.listdir(self.temp_dir), ['test.ring'])
+        testee.close()
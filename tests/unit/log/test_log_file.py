@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the file handlers.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from appupup.log import make_file_handler
+from appupup.log_file import (
+    FileHandler, BufferedFileHandler, RotatingFileHandler)
+
+
+def make_record(level=logging.INFO, msg='message'):
+    return logging.makeLogRecord({'levelno': level, 'msg': msg})
+
+
+class TestBufferedFileHandler(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.log')
+        self.testee = None
+
+    def tearDown(self):
+        if self.testee is not None:
+            self.testee.close()
+        shutil.rmtree(self.temp_dir)
+
+    def content(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_flush_on_size(self):
+        self.testee = BufferedFileHandler(
+            self.path, buffer_size=20, flush_interval=None)
+        self.testee.handle(make_record(msg='0123456789'))
+        self.assertEqual(self.content(), '')
+        self.testee.handle(make_record(msg='0123456789'))
+        self.assertEqual(self.content(), '0123456789\n' * 2)
+
+    def test_flush_on_level(self):
+        self.testee = BufferedFileHandler(
+            self.path, flush_interval=None, flush_level=logging.ERROR)
+        self.testee.handle(make_record(msg='a'))
+        self.assertEqual(self.content(), '')
+        self.testee.handle(make_record(logging.ERROR, msg='b'))
+        self.assertEqual(self.content(), 'a\nb\n')
+
+    def test_flush_on_interval(self):
+        self.testee = BufferedFileHandler(
+            self.path, flush_interval=0.01, fsync_interval=0)
+        self.testee.handle(make_record(msg='a'))
+        for _ in range(100):
+            if self.content():
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.content(), 'a\n')
+
+    def test_close(self):
+        self.testee = BufferedFileHandler(self.path, delay=True)
+        self.testee.handle(make_record(msg='a'))
+        self.testee.close()
+        self.assertFalse(self.testee.flusher)
+        self.assertEqual(self.content(), 'a\n')
+        self.testee = None
+
+    def test_no_buffer(self):
+        self.testee = BufferedFileHandler(self.path, buffer_size=0)
+        self.testee.handle(make_record(msg='a'))
+        self.assertEqual(self.content(), 'a\n')
+
+
+class TestRotatingFileHandler(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def log_files(self):
+        """ The names of the files except the hidden ones. """
+        return [name for name in os.listdir(self.temp_dir)
+                if not name.startswith('.')]
+
+    def read_all(self):
+        """ The lines in the live file and in the rotated ones. """
+        lines = []
+        for name in self.log_files():
+            path = os.path.join(self.temp_dir, name)
+            opener = gzip.open if name.endswith('.gz') else open
+            with opener(path, 'rt') as f:
+                lines.extend(f.read().splitlines())
+        return lines
+
+    def test_rotate_on_size(self):
+        testee = RotatingFileHandler(
+            self.path, buffer_size=0, max_bytes=100, compress='gzip')
+        for i in range(50):
+            testee.handle(make_record(msg='line %03d' % i))
+        testee.close()
+
+        names = os.listdir(self.temp_dir)
+        self.assertIn('test.log', names)
+        rotated = [name for name in names if name != 'test.log']
+        self.assertEqual(len(rotated), 4)
+        self.assertTrue(all(name.endswith('.gz') for name in rotated))
+        self.assertEqual(
+            sorted(self.read_all()), ['line %03d' % i for i in range(50)])
+
+    def test_rotate_on_interval(self):
+        testee = RotatingFileHandler(
+            self.path, buffer_size=0, rotate_interval=0.01, compress=None)
+        testee.handle(make_record(msg='a'))
+        time.sleep(0.02)
+        testee.handle(make_record(msg='b'))
+        testee.close()
+        self.assertEqual(len(self.log_files()), 2)
+        self.assertEqual(sorted(self.read_all()), ['a', 'b'])
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.temp_dir, '.test.log.started')))
+
+    def test_reopen_old_file(self):
+        testee = RotatingFileHandler(
+            self.path, buffer_size=0, rotate_interval=60, compress=None)
+        testee.handle(make_record(msg='a'))
+        testee.close()
+        started = testee.rotate_at - 60
+
+        # A restart after the file became old enough rotates it.
+        real_time = time.time
+        with patch.object(time, 'time', lambda: real_time() + 61):
+            testee = RotatingFileHandler(
+                self.path, buffer_size=0, rotate_interval=60, compress=None)
+            self.assertEqual(testee.rotate_at, started + 60)
+            testee.handle(make_record(msg='b'))
+            testee.close()
+        self.assertEqual(len(self.log_files()), 2)
+
+        # Without the recorded time the time stamps of the file are used.
+        os.remove(os.path.join(self.temp_dir, '.test.log.started'))
+        with open(self.path, 'w') as f:
+            f.write('old\n')
+        os.utime(self.path, (real_time() - 120, real_time() - 120))
+        testee = RotatingFileHandler(
+            self.path, buffer_size=0, rotate_interval=60, compress=None)
+        self.assertLessEqual(testee.rotate_at, real_time())
+        testee.close()
+
+    def test_prune_order(self):
+        # The rotations happen in the same second, so the names differ
+        # only in their counter.
+        with patch.object(time, 'strftime', lambda fmt: '20191115-130000'):
+            testee = RotatingFileHandler(
+                self.path, buffer_size=0, max_bytes=5, backup_count=3,
+                compress=None)
+            for i in range(12):
+                testee.handle(make_record(msg='line %02d' % i))
+            testee.close()
+        self.assertEqual(sorted(self.log_files()), [
+            'test.log', 'test.log.20191115-130000.10', 'test.log.20191115-130000.11',
+            'test.log.20191115-130000.9'])
+        self.assertEqual(sorted(self.read_all()), ['line 09', 'line 10',
+                                                   'line 11'])
+
+    def test_backup_count(self):
+        testee = RotatingFileHandler(
+            self.path, buffer_size=0, max_bytes=10, backup_count=2,
+            compress='gzip')
+        for i in range(10):
+            testee.handle(make_record(msg='line %04d' % i))
+        testee.close()
+        self.assertEqual(len(os.listdir(self.temp_dir)), 3)
+
+    def test_concurrent_writers(self):
+        testee = RotatingFileHandler(
+            self.path, buffer_size=256, max_bytes=2048, compress='gzip',
+            flush_interval=0.001)
+
+        def writer(index):
+            for i in range(500):
+                testee.handle(make_record(msg='writer %d line %03d' % (
+                    index, i)))
+
+        threads = [threading.Thread(target=writer, args=(index, ))
+                   for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        testee.close()
+
+        self.assertGreater(len(os.listdir(self.temp_dir)), 10)
+        self.assertEqual(sorted(self.read_all()), sorted(
+            'writer %d line %03d' % (index, i)
+            for index in range(8) for i in range(500)))
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            RotatingFileHandler(self.path, max_bytes=10, compress='rar')
+
+
+class TestMakeFileHandler(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make(self, cfg=None, **kwargs):
+        args = Namespace(
+            log_file=os.path.join(self.temp_dir, 'test.log'), cfg=cfg or {},
+            **kwargs)
+        handler = make_file_handler(args)
+        handler.close()
+        return handler
+
+    def test_plain(self):
+        self.assertIs(type(self.make()), FileHandler)
+
+    def test_created_on_first_write(self):
+        for kwargs in ({}, {'log_file_buffer': 1024}):
+            path = os.path.join(self.temp_dir, 'logs', 'test.log')
+            handler = make_file_handler(Namespace(
+                log_file=path, cfg={}, **kwargs))
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+            handler.handle(make_record())
+            handler.close()
+            self.assertTrue(os.path.isfile(path))
+            shutil.rmtree(os.path.dirname(path))
+
+    def test_buffered(self):
+        handler = self.make(log_file_buffer=1024)
+        self.assertIs(type(handler), BufferedFileHandler)
+        self.assertEqual(handler.buffer_size, 1024)
+
+    def test_rotating_from_config(self):
+        handler = self.make(
+            cfg={'log': {'rotate_size': '1M', 'rotate_count': '3',
+                         'compress': 'none'}})
+        self.assertIs(type(handler), RotatingFileHandler)
+        self.assertEqual(handler.max_bytes, 1024 * 1024)
+        self.assertEqual(handler.archiver.backup_count, 3)
+        self.assertIsNone(handler.archiver.compress)
+
+        handler = self.make(
+            cfg={'log': {'rotate_size': '1M'}}, log_rotate_size=10)
+        self.assertEqual(handler.max_bytes, 10)
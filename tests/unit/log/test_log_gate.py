@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for LevelGate.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import re
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from appupup.log import DebugLogger
+from appupup.log_gate import LevelGate, lowest_level
+
+
+class TestLowestLevel(TestCase):
+    def test_no_rules(self):
+        self.assertEqual(lowest_level(DebugLogger()), 1)
+
+    def test_rules(self):
+        self.assertEqual(lowest_level(DebugLogger(
+            include_level_in=(logging.INFO, logging.ERROR))), logging.INFO)
+        self.assertEqual(lowest_level(DebugLogger(
+            exclude_level_number_pattern=re.compile('[0-9]$'))), 10)
+        self.assertEqual(lowest_level(DebugLogger(
+            include_level_name_pattern='WARNING')), logging.WARNING)
+
+
+class TestLevelGate(TestCase):
+    def setUp(self):
+        self.top = logging.getLogger('gate_test')
+        self.top.handlers = []
+        self.testee = None
+
+    def tearDown(self):
+        if self.testee is not None:
+            self.testee.disable_gate()
+        self.top.handlers = []
+        self.top.setLevel(logging.NOTSET)
+
+    def install(self, **kwargs):
+        self.testee = DebugLogger.install(
+            'gate_test', gate=True, **kwargs)
+        self.testee.filtered_in = MagicMock()
+        return self.testee
+
+    def test_name_rules(self):
+        noisy = logging.getLogger('gate_test.noisy')
+        quiet = logging.getLogger('gate_test.quiet')
+        other = logging.getLogger('gate_test_other')
+        self.install(exclude_name_pattern=re.compile('.*noisy'))
+        self.assertTrue(noisy.disabled)
+        self.assertFalse(quiet.disabled)
+        self.assertFalse(other.disabled)
+
+        created = logging.getLogger('gate_test.noisy.child.noisy')
+        self.assertTrue(created.disabled)
+
+        self.testee.exclude_name_pattern = None
+        self.assertFalse(noisy.disabled)
+        self.assertFalse(created.disabled)
+
+    def test_level_rules(self):
+        child = logging.getLogger('gate_test.child')
+        child.setLevel(logging.DEBUG)
+        self.install(include_level_in=(logging.WARNING, logging.ERROR))
+        self.assertFalse(child.isEnabledFor(logging.INFO))
+        self.assertTrue(child.isEnabledFor(logging.WARNING))
+        logging.getLogger('gate_test.child.sub').info('dropped')
+        self.testee.filtered_in.assert_not_called()
+
+        self.testee.disable_gate()
+        self.assertEqual(child.level, logging.DEBUG)
+        self.assertEqual(self.top.level, 1)
+
+    def make_gate(self, name):
+        return LevelGate(
+            DebugLogger(exclude_name_pattern=re.compile('.*noisy')),
+            logging.getLogger('gate_test.%s' % name))
+
+    def test_stacked_gates(self):
+        manager = self.top.manager
+        for run, reverse in enumerate((False, True)):
+            first, second = self.make_gate('a'), self.make_gate('b')
+            first.install()
+            second.install()
+            if reverse:
+                first, second = second, first
+
+            # The other gate still applies to new loggers.
+            first.uninstall()
+            self.assertFalse(logging.getLogger(
+                '%s.noisy%d' % (first.logger.name, run)).disabled)
+            self.assertTrue(logging.getLogger(
+                '%s.noisy%d' % (second.logger.name, run)).disabled)
+
+            second.uninstall()
+            self.assertNotIn('getLogger', manager.__dict__)
+            self.assertFalse(logging.getLogger(
+                '%s.later.noisy%d' % (second.logger.name, run)).disabled)
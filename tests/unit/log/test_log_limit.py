@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the rate limiting of DebugLogger.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import logging
+from unittest import TestCase
+
+from appupup.log import DebugLogger
+from appupup.log_limit import RateLimiter
+
+
+def make_record(created, lineno=10, msg='message %d', args=(1, )):
+    record = logging.makeLogRecord({
+        'name': 'test', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+        'pathname': 'test.py', 'lineno': lineno, 'msg': msg, 'args': args})
+    record.created = created
+    return record
+
+
+class TestRateLimiter(TestCase):
+    def test_token_bucket(self):
+        testee = RateLimiter(1, burst=2)
+        allowed = [testee.check(make_record(100 + i * 0.1))
+                   for i in range(10)]
+        self.assertEqual(allowed, [True, True] + [False] * 8)
+        self.assertEqual(testee.summaries, [])
+
+        self.assertTrue(testee.check(make_record(102)))
+        summary, = testee.summaries
+        self.assertEqual(
+            summary.getMessage(),
+            'suppressed 8 similar messages in 1.8 seconds')
+        self.assertEqual(summary.lineno, 10)
+        self.assertEqual(summary.created, 102)
+
+    def test_keys(self):
+        testee = RateLimiter(1, burst=1)
+        self.assertTrue(testee.check(make_record(100, lineno=1)))
+        self.assertTrue(testee.check(make_record(100, lineno=2)))
+        self.assertFalse(testee.check(make_record(100, lineno=1)))
+
+        testee = RateLimiter(1, burst=1, key='template')
+        self.assertTrue(testee.check(make_record(100, lineno=1)))
+        self.assertFalse(testee.check(make_record(100, lineno=2, args=(2, ))))
+        self.assertTrue(testee.check(make_record(100, msg='other')))
+
+        testee = RateLimiter(1, burst=1, key='message')
+        self.assertTrue(testee.check(make_record(100)))
+        self.assertTrue(testee.check(make_record(100, args=(2, ))))
+        self.assertFalse(testee.check(make_record(100, lineno=5)))
+
+        with self.assertRaises(ValueError):
+            RateLimiter(1, key='nope')
+
+    def test_bounded(self):
+        testee = RateLimiter(1, burst=1, max_keys=2)
+        testee.check(make_record(100, lineno=1))
+        testee.check(make_record(100, lineno=1))
+        testee.check(make_record(100, lineno=2))
+        self.assertEqual(testee.summaries, [])
+        testee.check(make_record(101, lineno=3))
+        self.assertEqual(len(testee), 2)
+        summary, = testee.summaries
+        self.assertEqual(summary.lineno, 1)
+
+    def test_flush(self):
+        testee = RateLimiter(1, burst=1)
+        testee.check(make_record(100))
+        testee.check(make_record(100))
+        testee.flush(now=100.5)
+        summary, = testee.summaries
+        self.assertEqual(summary.args, (1, 0.5))
+
+
+class TestDebugLoggerRateLimit(TestCase):
+    def make_testee(self, **kwargs):
+        testee = DebugLogger(**kwargs)
+        testee.setFormatter(logging.Formatter('%(message)s'))
+        testee.setStream(io.StringIO())
+        return testee
+
+    def test_emit(self):
+        testee = self.make_testee(rate_limit=1, rate_limit_burst=1)
+        for i in range(5):
+            testee.handle(make_record(100, args=(i, )))
+        testee.handle(make_record(101.5, args=(5, )))
+        self.assertEqual(testee.stream.getvalue().splitlines(), [
+            'message 0',
+            'suppressed 4 similar messages in 1.5 seconds',
+            'message 5'])
+
+    def test_close_and_rules(self):
+        testee = self.make_testee(
+            rate_limit=1, rate_limit_burst=1, exclude_line_number_pattern=7)
+        testee.handle(make_record(100))
+        testee.handle(make_record(100, lineno=7))
+        testee.handle(make_record(100))
+        testee.close()
+        lines = testee.stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'message 1')
+        self.assertTrue(lines[1].startswith('suppressed 1 similar messages'))
+        self.assertEqual(len(lines), 2)
+
+    def test_reconfigure(self):
+        testee = self.make_testee()
+        self.assertIsNone(testee.limiter)
+        testee.rate_limit = 10
+        testee.handle(make_record(100))
+        self.assertEqual(testee.limiter.rate, 10)
+        self.assertEqual(len(testee.limiter), 1)
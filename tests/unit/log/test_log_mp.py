@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the logging from worker processes.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import multiprocessing
+import sys
+from unittest import TestCase
+
+from appupup.log_mp import LogCollector, prepare_record
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super(CaptureHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def work(index):
+    logging.getLogger('test.worker').info("item %d", index)
+    logging.getLogger('test.worker').debug("hidden %d", index)
+    return index
+
+
+def fail():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logging.getLogger('test.worker').exception("failed")
+
+
+class TestPrepareRecord(TestCase):
+    def test_message_and_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.getLogger('x').makeRecord(
+                'x', logging.ERROR, 'f.py', 1, "a %s", (object(), ),
+                exc_info=sys.exc_info())
+        data = prepare_record(record)
+        self.assertTrue(data['msg'].startswith('a <object'))
+        self.assertIsNone(data['args'])
+        self.assertIsNone(data['exc_info'])
+        self.assertIn('ValueError: boom', data['exc_text'])
+
+
+class TestLogCollector(TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved = self.root.handlers, self.root.level
+        self.handler = CaptureHandler()
+        self.root.handlers = [self.handler]
+        self.root.setLevel(logging.INFO)
+        self.context = multiprocessing.get_context('fork')
+
+    def tearDown(self):
+        self.root.handlers, level = self.saved
+        self.root.setLevel(level)
+
+    def test_pool(self):
+        with LogCollector(batch_size=3) as collector:
+            with self.context.Pool(
+                    2, initializer=collector.initializer,
+                    initargs=collector.initargs) as pool:
+                self.assertEqual(pool.map(work, range(10)), list(range(10)))
+                pool.close()
+                pool.join()
+        self.assertEqual(collector.received, 10)
+        messages = sorted(r.getMessage() for r in self.handler.records)
+        self.assertEqual(messages, sorted("item %d" % i for i in range(10)))
+        record = self.handler.records[0]
+        self.assertEqual(record.name, 'test.worker')
+        self.assertEqual(record.funcName, 'work')
+        self.assertNotEqual(
+            record.process, multiprocessing.current_process().pid)
+
+    def test_exception(self):
+        with LogCollector(flush_interval=0) as collector:
+            process = self.context.Process(
+                target=_run_in_worker, args=(collector.initargs, fail))
+            process.start()
+            process.join()
+        self.assertEqual(len(self.handler.records), 1)
+        self.assertIn('ValueError: boom', self.handler.records[0].exc_text)
+
+    def test_parent_filters_apply(self):
+        self.handler.addFilter(lambda record: record.getMessage() != 'item 1')
+        with LogCollector(flush_interval=0) as collector:
+            for index in (1, 2):
+                process = self.context.Process(
+                    target=_run_in_worker,
+                    args=(collector.initargs, work, index))
+                process.start()
+                process.join()
+        self.assertEqual(collector.received, 2)
+        self.assertEqual(
+            [r.getMessage() for r in self.handler.records], ['item 2'])
+
+def _run_in_worker(initargs, func, *args):
+    from appupup.log_mp import init_worker
+    init_worker(*initargs)
+    func(*args)
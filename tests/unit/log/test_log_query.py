@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the indexed log query.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from appupup.formatter import FastFormatter, JsonFormatter
+from appupup.log_query import (
+    LogIndex, Query, query_log, parse_time, iter_records, main)
+
+# The format used by setup_logging() for the log file.
+TEXT_FORMAT = FastFormatter(
+    "%(asctime)5s [%(levelname)-7s] [%(name)-19s] "
+    "[%(filename)15s:%(lineno)-4d] [%(threadName)-15s] "
+    "[%(funcName)-25s] | %(message)s",
+    '%Y-%m-%d %H:%M:%S')
+
+START = time.mktime((2019, 11, 15, 14, 0, 0, 0, 0, -1))
+
+
+def make_record(index, level=logging.INFO, name='app.worker'):
+    record = logging.makeLogRecord({
+        'name': name, 'levelno': level,
+        'levelname': logging.getLevelName(level),
+        'pathname': 'worker.py', 'lineno': 10,
+        'msg': 'record %d', 'args': (index, )})
+    record.created = START + index
+    record.msecs = 0
+    return record
+
+
+class TestLogQuery(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'app.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, records, fmt=TEXT_FORMAT):
+        with open(self.path, 'a') as f:
+            for record in records:
+                f.write(fmt.format(record) + '\n')
+
+    def make_log(self, count=1000, fmt=TEXT_FORMAT):
+        records = []
+        for index in range(count):
+            if index % 100 == 50:
+                records.append(make_record(index, logging.ERROR, 'app.db'))
+            else:
+                records.append(make_record(index))
+        self.write(records, fmt)
+
+    def query(self, use_index=True, **kwargs):
+        return list(query_log(
+            self.path, Query(**kwargs), use_index=use_index,
+            block_size=4096))
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time('2019-11-15 14:05'), '2019-11-15 14:05:00')
+        self.assertEqual(parse_time('2019-11-15T14:05:07'),
+                         '2019-11-15 14:05:07')
+        self.assertEqual(parse_time('14:05', now=START),
+                         '2019-11-15 14:05:00')
+        with self.assertRaises(ValueError):
+            parse_time('yesterday')
+
+    def test_same_as_scan(self):
+        self.make_log()
+        queries = (
+            {},
+            {'level': logging.ERROR},
+            {'since': '2019-11-15 14:05:00', 'until': '2019-11-15 14:08:00'},
+            {'since': '2019-11-15 14:05:00', 'level': logging.ERROR},
+            {'names': ['app.d*']},
+            {'names': ['other']},
+        )
+        for kwargs in queries:
+            self.assertEqual(
+                self.query(**kwargs), self.query(use_index=False, **kwargs),
+                kwargs)
+
+        errors = self.query(level=logging.ERROR, since='2019-11-15 14:05:00',
+                            until='2019-11-15 14:10:00')
+        self.assertEqual(len(errors), 3)
+        self.assertIn('record 350', errors[0])
+
+    def test_index_skips_blocks(self):
+        self.make_log()
+        index = LogIndex(self.path, block_size=4096)
+        self.assertTrue(index.update() > 5)
+        self.assertTrue(os.path.isfile(index.index_path))
+        size = os.path.getsize(self.path)
+        regions = index.regions(Query(
+            since='2019-11-15 14:05:00', until='2019-11-15 14:06:00'), size)
+        covered = sum(end - start for start, end in regions)
+        self.assertTrue(covered < size / 4, (covered, size))
+
+    def test_incremental(self):
+        self.make_log(500)
+        index = LogIndex(self.path, block_size=4096)
+        index.update()
+        blocks = [block.to_json() for block in index.blocks]
+        self.make_log(500)
+        again = LogIndex(self.path, block_size=4096)
+        self.assertTrue(again.update() > 0)
+        self.assertEqual([block.to_json() for block in again.blocks[
+            :len(blocks)]], blocks)
+        self.assertEqual(LogIndex(self.path, block_size=4096).update(), 0)
+
+        # The file was replaced.
+        os.remove(self.path)
+        self.write([make_record(2000 + i) for i in range(10)])
+        self.assertEqual(len(self.query()), 10)
+        self.assertEqual(
+            self.query(since='2019-11-15 14:30:00')[0].split(' | ')[1],
+            'record 2000\n')
+
+    def test_continuation_lines(self):
+        self.write([make_record(1)])
+        with open(self.path, 'a') as f:
+            f.write('Traceback (most recent call last):\n  boom\n')
+        self.write([make_record(2, logging.ERROR)])
+        with open(self.path, 'a') as f:
+            f.write('partial line')
+        records = self.query(level=logging.INFO)
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0].endswith('  boom\n'))
+        self.assertEqual(len(list(iter_records(
+            b'orphan\n' + open(self.path, 'rb').read(), 0, 10000))), 3)
+
+    def test_json(self):
+        self.make_log(300, fmt=JsonFormatter())
+        errors = self.query(level=logging.ERROR)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(errors, self.query(
+            level=logging.ERROR, use_index=False))
+        self.assertEqual(len(self.query(names=['app.worker'])), 297)
+
+    def test_main(self):
+        self.make_log(200)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([
+                '--level', 'ERROR', '--since', '2019-11-15 14:01',
+                self.path]), 0)
+        self.assertEqual(output.getvalue().count('\n'), 1)
+        self.assertIn('record 150', output.getvalue())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the queue based logging.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from appupup.log_queue import (
+    LogQueue, start_queue_logging, DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+
+def make_record(level=logging.INFO, msg='message'):
+    return logging.makeLogRecord({'levelno': level, 'msg': msg})
+
+
+class TestLogQueue(TestCase):
+    def test_order(self):
+        testee = LogQueue(maxsize=10)
+        records = [make_record(level) for level in (10, 20, 10, 40, 20)]
+        for record in records:
+            testee.put(record)
+        testee.put(None)
+        self.assertEqual(len(testee), 5)
+        self.assertEqual([testee.get() for _ in range(6)], records + [None])
+
+    def test_drop_newest(self):
+        testee = LogQueue(maxsize=2, overflow=DROP_NEWEST)
+        records = [make_record(level) for level in (10, 20, 30)]
+        for record in records:
+            testee.put(record)
+        self.assertEqual(testee.dropped, {30: 1})
+        self.assertEqual([testee.get(), testee.get()], records[:2])
+
+    def test_drop_oldest(self):
+        testee = LogQueue(maxsize=3, overflow=DROP_OLDEST)
+        records = [make_record(level) for level in (20, 10, 10, 30, 5)]
+        for record in records:
+            testee.put(record)
+        self.assertEqual(testee.dropped, {10: 1, 5: 1})
+        self.assertEqual(testee.dropped_total, 2)
+        self.assertEqual([testee.get() for _ in range(3)],
+                         [records[0], records[2], records[3]])
+
+    def test_block(self):
+        testee = LogQueue(maxsize=1, overflow=BLOCK)
+        testee.put(make_record())
+        thread = threading.Thread(target=testee.put, args=(make_record(), ))
+        thread.start()
+        thread.join(0.05)
+        self.assertTrue(thread.is_alive())
+        testee.get()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(testee), 1)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            LogQueue(overflow='other')
+
+
+class TestStartQueueLogging(TestCase):
+    def test_records_reach_handler(self):
+        logger = logging.getLogger('test_log_queue')
+        logger.propagate = False
+        handler = MagicMock(level=logging.NOTSET)
+        logger.handlers = [handler]
+        listener = start_queue_logging(logger, maxsize=100)
+        try:
+            self.assertIsNot(logger.handlers[0], handler)
+            for i in range(10):
+                logger.warning('record %d', i)
+        finally:
+            listener.stop()
+            listener.stop()
+        self.assertEqual(handler.handle.call_count, 10)
+        handler.flush.assert_called_once()
+
+    def test_blocked_producer_during_stop(self):
+        release = threading.Event()
+        handled = []
+
+        class SlowHandler(logging.Handler):
+            def handle(self, record):
+                release.wait(5)
+                handled.append(record.msg)
+
+        logger = logging.getLogger('test_log_queue.stop')
+        logger.propagate = False
+        logger.handlers = [SlowHandler()]
+        listener = start_queue_logging(logger, maxsize=1)
+        queue = listener.queue
+        logger.warning('first')
+        # The listener is busy with the first record, the second one fills
+        # the queue and the third one waits for room.
+        deadline = time.time() + 5
+        while len(queue) and time.time() < deadline:
+            time.sleep(0.001)
+        logger.warning('second')
+        producer = threading.Thread(target=logger.warning, args=('third', ))
+        producer.start()
+        time.sleep(0.05)
+        self.assertTrue(producer.is_alive())
+
+        stopper = threading.Thread(target=listener.stop)
+        stopper.start()
+        deadline = time.time() + 5
+        # Wait for the sentinel, the third item put in the queue.
+        while queue.sequence < 3 and time.time() < deadline:
+            time.sleep(0.001)
+        release.set()
+        producer.join(5)
+        stopper.join(5)
+        self.assertFalse(producer.is_alive())
+        self.assertFalse(stopper.is_alive())
+        self.assertEqual(handled, ['first', 'second', 'third'])
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the compiled rules of DebugLogger.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+import re
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from appupup.log import DebugLogger
+from appupup.log_rules import (
+    compile_rules, merge_patterns, ACCEPT, REJECT, HANDLED)
+
+
+def make_record(name='a.b', level=logging.DEBUG, msg='message', lineno=10,
+                args=None):
+    record = logging.LogRecord(
+        name, level, '/some/path/file.py', lineno, msg, args, None,
+        func='func')
+    record.message = record.getMessage()
+    return record
+
+
+class TestCompileRules(TestCase):
+    def test_no_rules(self):
+        self.assertIsNone(compile_rules(DebugLogger()))
+
+    def test_exclude_pattern(self):
+        decide = compile_rules(DebugLogger(exclude_name_pattern='a.b'))
+        self.assertEqual(decide('', make_record('a.b')), REJECT)
+        self.assertEqual(decide('', make_record('a.c')), ACCEPT)
+
+        decide = compile_rules(DebugLogger(
+            exclude_name_pattern=re.compile('a\\.')))
+        self.assertEqual(decide('', make_record('a.c')), REJECT)
+        self.assertEqual(decide('', make_record('b.a')), ACCEPT)
+
+    def test_include_pattern(self):
+        decide = compile_rules(DebugLogger(
+            include_line_number_pattern='10',
+            include_level_number_pattern=re.compile('[0-9]+')))
+        self.assertEqual(decide('', make_record(lineno=10)), ACCEPT)
+        self.assertEqual(decide('', make_record(lineno=11)), REJECT)
+
+    def test_exclude_before_include(self):
+        decide = compile_rules(DebugLogger(
+            include_name_pattern='a.b', exclude_message_pattern='message'))
+        self.assertEqual(decide('', make_record('a.b')), REJECT)
+
+    def test_interval_and_membership(self):
+        decide = compile_rules(DebugLogger(
+            include_level_in=(logging.INFO, logging.WARNING),
+            exclude_created_interval=(0, 1)))
+        record = make_record(level=logging.INFO)
+        self.assertEqual(decide('', record), REJECT)
+        record.created = 0.5
+        self.assertEqual(decide('', record), ACCEPT)
+        record = make_record(level=logging.DEBUG)
+        record.created = 0.5
+        self.assertEqual(decide('', record), REJECT)
+
+    def test_callback(self):
+        callback = MagicMock(return_value=False)
+        handler = DebugLogger(callback_name_pattern=('a.b', callback))
+        decide = compile_rules(handler)
+        record = make_record('a.b')
+        self.assertEqual(decide('msg', record), HANDLED)
+        callback.assert_called_once_with(handler, 'msg', 'a.b', record)
+
+        callback.return_value = True
+        self.assertEqual(decide('msg', record), ACCEPT)
+        self.assertEqual(decide('msg', make_record('a.c')), ACCEPT)
+        self.assertEqual(callback.call_count, 2)
+
+
+class TestRecompile(TestCase):
+    def test_rules_change(self):
+        testee = DebugLogger()
+        testee.filtered_in = MagicMock()
+        testee.filtered_out = MagicMock()
+        testee.emit(make_record('a.b'))
+        testee.filtered_in.assert_called_once()
+
+        testee.exclude_name_pattern = 'a.b'
+        testee.emit(make_record('a.b'))
+        testee.filtered_out.assert_called_once()
+
+        testee.exclude_name_pattern = None
+        testee.emit(make_record('a.b'))
+        self.assertEqual(testee.filtered_in.call_count, 2)
+
+
+class TestLazyFormat(TestCase):
+    def make_testee(self, **kwargs):
+        testee = DebugLogger(lazy_format=True, **kwargs)
+        testee.format = MagicMock(return_value='formatted')
+        testee.stream = MagicMock()
+        return testee
+
+    def test_rejected_not_formatted(self):
+        testee = self.make_testee(exclude_message_pattern='message 1')
+        record = make_record(msg='message %d', args=(1,))
+        del record.message
+        testee.emit(record)
+        testee.format.assert_not_called()
+        testee.stream.write.assert_not_called()
+
+    def test_accepted_formatted_once(self):
+        testee = self.make_testee(include_message_pattern='message 1')
+        record = make_record(msg='message %d', args=(1,))
+        del record.message
+        testee.emit(record)
+        testee.format.assert_called_once_with(record)
+        testee.stream.write.assert_called_once_with('formatted\n')
+
+    def test_callback_gets_lazy_message(self):
+        def callback(handler, msg, value, record):
+            self.assertEqual(str(msg), 'formatted')
+            self.assertEqual(msg.message, 'message')
+            return True
+
+        testee = self.make_testee(callback_name_pattern=('a.b', callback))
+        testee.emit(make_record('a.b'))
+        testee.format.assert_called_once()
+        testee.stream.write.assert_called_once_with('formatted\n')
+
+
+class TestCallSiteCache(TestCase):
+    def test_cache_info(self):
+        testee = DebugLogger(exclude_name_pattern=re.compile('x'))
+        testee.filtered_in = MagicMock()
+        for _ in range(5):
+            testee.emit(make_record('a.b'))
+        info = testee.cache_info()
+        self.assertEqual(info.hits, 4)
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(testee.filtered_in.call_count, 5)
+
+        testee.exclude_name_pattern = re.compile('a')
+        self.assertEqual(testee.cache_info().currsize, 0)
+        testee.call_site_cache_size = 0
+        self.assertIsNone(testee.cache_info())
+
+    def test_cheap_rules_not_cached(self):
+        testee = DebugLogger(exclude_name_pattern='x')
+        self.assertIsNone(testee.cache_info())
+
+    def test_same_outcome(self):
+        calls = []
+
+        def callback(handler, msg, value, record):
+            calls.append(value)
+            return value != 'stop'
+
+        kwargs = dict(
+            exclude_func_name_pattern=re.compile('skip'),
+            exclude_message_pattern='drop',
+            include_level_in=(logging.DEBUG, logging.INFO),
+            callback_thread_pattern=(re.compile('Main'), callback),
+            callback_name_pattern=(re.compile('a|stop'), callback),
+            callback_message_pattern=(re.compile('m'), callback))
+        records = []
+        for name in ('a', 'b', 'stop'):
+            for msg in ('message', 'drop', 'other'):
+                for level in (logging.DEBUG, logging.WARNING):
+                    for _ in range(2):
+                        records.append(make_record(name, level, msg))
+
+        outcomes = []
+        for cache_size in (0, 16):
+            decide = compile_rules(
+                DebugLogger(**kwargs), cache_size=cache_size)
+            outcomes.append(
+                [(decide('', record), tuple(calls)) for record in records])
+            del calls[:]
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertTrue(hasattr(decide, 'cache_info'))
+
+
+class TestMultiplePatterns(TestCase):
+    def test_merge_patterns(self):
+        merged = merge_patterns([
+            re.compile('a'), re.compile('b+'), re.compile('c', re.I),
+            re.compile('(x)\\1')])
+        self.assertEqual(len(merged), 3)
+        self.assertIn('(?:a)|(?:b+)', [x.pattern for x in merged])
+
+    def test_collection(self):
+        decide = compile_rules(DebugLogger(exclude_name_pattern=[
+            'a.b', 'a.c', re.compile('x'), re.compile('y+z')]))
+        for name in ('a.b', 'a.c', 'x.a', 'yyz'):
+            self.assertEqual(decide('', make_record(name)), REJECT)
+        for name in ('a.d', 'ax', 'yy'):
+            self.assertEqual(decide('', make_record(name)), ACCEPT)
+
+    def test_strings_only(self):
+        decide = compile_rules(DebugLogger(
+            include_line_number_pattern={10, 11}))
+        self.assertEqual(decide('', make_record(lineno=11)), ACCEPT)
+        self.assertEqual(decide('', make_record(lineno=12)), REJECT)
+
+    def test_intervals(self):
+        decide = compile_rules(DebugLogger(
+            include_created_interval=[(0, 1), (5, 6)]))
+        record = make_record()
+        for created, outcome in ((0.5, ACCEPT), (3, REJECT), (6, ACCEPT)):
+            record.created = created
+            self.assertEqual(decide('', record), outcome)
+
+    def test_callback(self):
+        callback = MagicMock(return_value=False)
+        decide = compile_rules(DebugLogger(callback_name_pattern=(
+            ['a.b', re.compile('c')], callback)))
+        self.assertEqual(decide('', make_record('a.b')), HANDLED)
+        self.assertEqual(decide('', make_record('c.d')), HANDLED)
+        self.assertEqual(decide('', make_record('d')), ACCEPT)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the sampling of log records.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import logging
+import re
+from unittest import TestCase
+
+from appupup.log import DebugLogger
+from appupup.log_sample import Sampler, SampleRule
+
+
+def make_record(name='db.pool', level=logging.DEBUG, lineno=10, **extra):
+    data = {
+        'name': name, 'levelno': level,
+        'levelname': logging.getLevelName(level),
+        'pathname': 'db/pool.py', 'lineno': lineno, 'msg': 'message'}
+    data.update(extra)
+    return logging.makeLogRecord(data)
+
+
+class TestSampleRule(TestCase):
+    def test_covers(self):
+        testee = SampleRule('db.*', 'DEBUG', 0.5)
+        self.assertTrue(testee.covers('db.pool', logging.DEBUG))
+        self.assertFalse(testee.covers('db.pool', logging.INFO))
+        self.assertFalse(testee.covers('http', logging.DEBUG))
+
+        testee = SampleRule(re.compile('db$'), (10, 'info'), 0.5)
+        self.assertTrue(testee.covers('db', logging.INFO))
+        self.assertFalse(testee.covers('db.pool', logging.INFO))
+
+        testee = SampleRule('*', rate=0.5)
+        self.assertTrue(testee.covers('x', logging.CRITICAL))
+
+    def test_arguments(self):
+        with self.assertRaises(ValueError):
+            SampleRule('db', rate=2)
+        with self.assertRaises(ValueError):
+            SampleRule('db', level='LOUD')
+
+    def test_extremes(self):
+        self.assertFalse(SampleRule('*', rate=0).keeps('anything'))
+        self.assertTrue(SampleRule('*', rate=1).keeps('anything'))
+
+
+class TestSampler(TestCase):
+    def test_rate(self):
+        testee = Sampler([('db.*', 'DEBUG', 0.1)])
+        kept = sum(testee.filter(make_record(lineno=line))
+                   for line in range(10000))
+        self.assertTrue(800 < kept < 1200, kept)
+        self.assertTrue(all(
+            testee.filter(make_record(level=logging.INFO, lineno=line))
+            for line in range(100)))
+
+    def test_deterministic(self):
+        testee = Sampler([('db.*', 'DEBUG', 0.5, 'request_id')])
+        other = Sampler([('db.*', None, 0.5, 'request_id')])
+        for index in range(100):
+            first = testee.filter(make_record(request_id=index))
+            self.assertEqual(first, testee.filter(
+                make_record(lineno=index, request_id=index)))
+            self.assertEqual(first, other.filter(
+                make_record(name='db.other', request_id=index)))
+
+    def test_missing_field(self):
+        testee = Sampler([('db.*', 'DEBUG', 0.5, 'request_id')])
+        by_site = Sampler([('db.*', 'DEBUG', 0.5)])
+        for line in range(20):
+            self.assertEqual(
+                testee.filter(make_record(lineno=line)),
+                by_site.filter(make_record(lineno=line)))
+
+    def test_first_rule_wins(self):
+        testee = Sampler([
+            SampleRule('db.important', rate=1),
+            SampleRule('db.*', rate=0),
+        ])
+        self.assertTrue(testee.filter(make_record('db.important')))
+        self.assertFalse(testee.filter(make_record('db.pool')))
+        self.assertTrue(testee.filter(make_record('http')))
+
+    def test_cache_bounded(self):
+        testee = Sampler([('db.*', None, 0.5)], cache_size=10)
+        for line in range(100):
+            testee.filter(make_record(lineno=line))
+        self.assertTrue(len(testee.site_cache) <= 10)
+
+
+class TestDebugLoggerSample(TestCase):
+    def test_emit(self):
+        testee = DebugLogger(sample=[('db.*', 'DEBUG', 0)])
+        testee.setFormatter(logging.Formatter('%(name)s'))
+        testee.setStream(io.StringIO())
+        testee.handle(make_record())
+        testee.handle(make_record(level=logging.INFO))
+        testee.handle(make_record('http'))
+        self.assertEqual(
+            testee.stream.getvalue().splitlines(), ['db.pool', 'http'])
+
+        testee.sample = None
+        testee.handle(make_record())
+        self.assertEqual(
+            testee.stream.getvalue().splitlines(),
+            ['db.pool', 'http', 'db.pool'])
+
+    def test_filtered_out(self):
+        class Testee(DebugLogger):
+            def filtered_out(self, msg, record):
+                messages.append(msg)
+
+        for lazy_format in (False, True):
+            messages = []
+            testee = Testee(sample=[('db.*', 'DEBUG', 0)],
+                            lazy_format=lazy_format)
+            testee.setFormatter(logging.Formatter('%(name)s'))
+            testee.setStream(io.StringIO())
+            testee.handle(make_record())
+            self.assertEqual([str(msg) for msg in messages], ['db.pool'])
+            self.assertEqual(isinstance(messages[0], str), not lazy_format)
+
+    def test_not_formatted(self):
+        class CountingFormatter(logging.Formatter):
+            calls = 0
+
+            def format(self, record):
+                CountingFormatter.calls += 1
+                return super(CountingFormatter, self).format(record)
+
+        testee = DebugLogger(sample=[('db.*', 'DEBUG', 0)])
+        testee.setFormatter(CountingFormatter('%(name)s'))
+        testee.setStream(io.StringIO())
+        for _ in range(10):
+            testee.handle(make_record())
+        self.assertEqual(CountingFormatter.calls, 0)
+        testee.handle(make_record('http'))
+        self.assertEqual(CountingFormatter.calls, 1)
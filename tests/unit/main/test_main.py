@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for main.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stderr
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from appupup.main import main
+
+
+def run_main(argv, func, **kwargs):
+    """ Runs main() with a single command that calls `func`. """
+    def setup_parser(parser):
+        parser.set_defaults(func=func)
+
+    with patch.object(sys, 'argv', ['app'] + argv):
+        return main(
+            app_name='test_app', app_version='1.0.0', app_stage='',
+            app_author='appupup', app_description='test',
+            app_url='http://localhost', parser_constructor=setup_parser,
+            **kwargs)
+
+
+class TestMain(TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.handlers = self.root.handlers
+        self.level = self.root.level
+        self.root.handlers = []
+
+    def tearDown(self):
+        self.root.handlers = self.handlers
+        self.root.level = self.level
+
+    def test_result(self):
+        argv = ['--config', '-', '--log-file', '-']
+        self.assertEqual(run_main(argv, lambda args, logger: 2), 2)
+        self.assertEqual(run_main(argv, lambda args, logger: None), 0)
+
+    def test_queue_flushed_on_error(self):
+        handler = MagicMock(level=logging.NOTSET)
+
+        def func(args, logger):
+            self.assertIsNotNone(args.log_listener)
+            args.log_listener.handlers = (handler, )
+            raise ValueError
+
+        result = run_main(
+            ['--config', '-', '--log-file', '-', '--log-queue-size', '10'],
+            func)
+        self.assertEqual(result, -2)
+        records = [call[0][0] for call in handler.handle.call_args_list]
+        self.assertEqual(records[-1].levelno, logging.CRITICAL)
+        self.assertEqual(self.root.handlers, [handler])
+
+    def test_profile(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with redirect_stderr(io.StringIO()):
+                result = run_main(
+                    ['--config', '-', '--log-file', '-',
+                     '--profile', 'cprofile', '--profile-dir', temp_dir],
+                    lambda args, logger: 3)
+            self.assertEqual(result, 3)
+            self.assertEqual(len(os.listdir(temp_dir)), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_config_log_levels(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, 'app.cfg')
+        with open(path, 'w') as f:
+            f.write('[log]\nlevel = WARNING\n'
+                    '[loggers]\nappupup.test.main = ERROR\n')
+        levels = []
+
+        def func(args, logger):
+            levels.append(args.log_level)
+            levels.append(args.log_handlers[0].level)
+            levels.append(logging.getLogger('appupup.test.main').level)
+            levels.append(args.config_watcher is not None)
+            return 0
+
+        try:
+            self.assertEqual(run_main(
+                ['--config', path, '--log-file', '-',
+                 '--watch-config'], func), 0)
+            self.assertEqual(levels, [
+                logging.WARNING, logging.WARNING, logging.ERROR, True])
+            del levels[:]
+            self.assertEqual(run_main(
+                ['--config', path, '--log-file', '-',
+                 '--verbose'], func), 0)
+            self.assertEqual(levels, [
+                logging.DEBUG, logging.DEBUG, logging.ERROR, False])
+        finally:
+            logging.getLogger('appupup.test.main').setLevel(logging.NOTSET)
+            shutil.rmtree(temp_dir)
+
+    def test_config_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, 'app.cfg')
+        udd = os.path.join(temp_dir, 'udd')
+        with open(path, 'w') as f:
+            f.write('[app]\nkey = value\n')
+        values = []
+
+        def func(args, logger):
+            values.append(args.cfg['app']['key'])
+            return 0
+
+        try:
+            argv = ['--config', path, '--log-file', '-', '--udd', udd]
+            self.assertEqual(run_main(argv, func), 0)
+            self.assertFalse(os.path.exists(udd))
+
+            self.assertEqual(run_main(argv + ['--config-cache'], func), 0)
+            self.assertTrue(os.listdir(os.path.join(udd, 'config-cache')))
+            self.assertEqual(values, ['value', 'value'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_settings(self):
+        from appupup.arg_conf import Setting, Settings
+        settings = Settings([
+            Setting('log_queue_size', type=int),
+            Setting('missing', cfg_group='app'),
+            Setting('other', cfg_group='app'),
+        ])
+        calls = []
+        with self.assertLogs('test_app', 'ERROR') as logs:
+            result = run_main(['--config', '-', '--log-file', '-'],
+                              lambda args, logger: calls.append(args),
+                              settings=settings)
+        self.assertEqual(result, 1)
+        self.assertEqual(calls, [])
+        self.assertIn('missing needs', logs.output[0])
+        self.assertIn('other needs', logs.output[0])
+
+        settings = Settings([Setting('log_queue_size', type=int)])
+        result = run_main(['--config', '-', '--log-file', '-'],
+                          lambda args, logger: args.settings.log_queue_size,
+                          settings=settings)
+        self.assertEqual(result, 0)
+
+    def test_hook_installs_debug_logger(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, 'debug_overrides.py')
+        with open(path, 'w') as f:
+            f.write(
+                'import io\n'
+                'from appupup.log import DebugLogger\n'
+                'HANDLER = DebugLogger.install()\n'
+                'HANDLER.setStream(io.StringIO())\n')
+
+        def func(args, logger):
+            logger.debug("debug from the command")
+            return args.hooks.module.HANDLER.stream.getvalue()
+
+        try:
+            output = []
+            run_main(['--config', '-', '--log-file', '-',
+                      '--hook-file', path],
+                     lambda args, logger: output.append(func(args, logger)))
+            self.assertIn("debug from the command", output[0])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_hooks(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, 'my_overrides.py')
+        with open(path, 'w') as f:
+            f.write(
+                'CALLS = []\n'
+                'def pre_parse(parser):\n'
+                '    parser.add_argument("--extra", default="x")\n'
+                '    CALLS.append("pre_parse")\n'
+                'def post_config(args):\n'
+                '    CALLS.append(("post_config", args.extra))\n'
+                'def init(args):\n'
+                '    CALLS.append("init")\n'
+                'def pre_run(args):\n'
+                '    CALLS.append("pre_run")\n'
+                'def post_run(args, result):\n'
+                '    CALLS.append(("post_run", result))\n'
+                'def on_exit(args, result):\n'
+                '    CALLS.append(("on_exit", result))\n')
+        calls = []
+
+        def func(args, logger):
+            args.hooks.module.CALLS.append('func')
+            calls.append(args.hooks.module.CALLS)
+            return 5
+
+        try:
+            with self.assertLogs('test_app', 'DEBUG') as logs:
+                result = run_main(
+                    ['--config', '-', '--log-file', '-', '--verbose',
+                     '--hook-file', path, '--extra', 'y'], func,
+                    hooks={'on_exit': lambda args, result: calls.append(
+                        result)})
+            self.assertEqual(result, 5)
+            self.assertEqual(calls[0], [
+                'pre_parse', ('post_config', 'y'), 'init', 'pre_run', 'func',
+                ('post_run', 5), ('on_exit', 5)])
+            self.assertEqual(calls[1], 5)
+            timed = [line for line in logs.output if 'Hook ' in line]
+            self.assertEqual(len(timed), 8)
+            self.assertIn('my_overrides.py (load)', timed[0])
+
+            with open(path, 'w') as f:
+                f.write('raise ImportError("broken hook")\n')
+            with self.assertLogs('test_app', 'ERROR') as logs:
+                result = run_main(
+                    ['--config', '-', '--log-file', '-',
+                     '--hook-file', path], lambda args, logger: 0)
+            self.assertEqual(result, 0)
+            self.assertIn('broken hook', logs.output[0])
+        finally:
+            shutil.rmtree(temp_dir)
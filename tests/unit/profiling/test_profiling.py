@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the profiling of the main function.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import time
+from argparse import Namespace
+from contextlib import redirect_stderr
+from unittest import TestCase
+
+from appupup.profiling import SamplingProfiler, profile_call
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total = total + 1
+    return total
+
+
+class TestSamplingProfiler(TestCase):
+    def test_samples(self):
+        testee = SamplingProfiler(interval=0.001)
+        testee.start()
+        busy(0.1)
+        testee.stop()
+        self.assertTrue(sum(testee.samples.values()) > 10)
+        lines = testee.collapsed()
+        self.assertTrue(any('busy (test_profiling.py:' in line
+                            for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit()
+                            for line in lines))
+        label, own, total = testee.summary(1)[0]
+        self.assertTrue(label.startswith('busy'))
+        self.assertTrue(total >= own)
+
+
+class TestProfileCall(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def profile(self, mode, func, *func_args):
+        args = Namespace(
+            profile=mode, profile_interval=0.001, profile_top=5,
+            profile_dir=None, udd=self.temp_dir)
+        output = io.StringIO()
+        with redirect_stderr(output):
+            try:
+                return profile_call(args, 'app', func, *func_args)
+            finally:
+                self.output = output.getvalue()
+
+    def files(self):
+        return os.listdir(os.path.join(self.temp_dir, 'profiles'))
+
+    def test_cprofile(self):
+        self.assertTrue(self.profile('cprofile', busy, 0.05) > 0)
+        name, = self.files()
+        self.assertTrue(name.startswith('app-') and name.endswith('.pstats'))
+        stats = pstats.Stats(os.path.join(self.temp_dir, 'profiles', name))
+        self.assertTrue(any(key[2] == 'busy' for key in stats.stats))
+        self.assertIn('busy', self.output)
+
+    def test_sample(self):
+        self.assertTrue(self.profile('sample', busy, 0.05) > 0)
+        name, = self.files()
+        self.assertTrue(name.endswith('.collapsed'))
+        self.assertIn('busy', self.output)
+
+    def test_exception(self):
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            self.profile('sample', fail)
+        self.assertEqual(len(self.files()), 1)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the warm process mode.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from appupup.warm import call, call_or_run, exit_code
+
+ENTRY_MODULE = '''
+import os
+import sys
+
+
+def run():
+    sys.stdout.write('%s|%s|%s\\n' % (
+        ' '.join(sys.argv), os.environ.get('WARM_TEST'), os.getcwd()))
+    sys.stderr.write(sys.stdin.read().upper())
+    if sys.argv[1:2] == ['exit']:
+        sys.exit(int(sys.argv[2]))
+    if sys.argv[1:2] == ['raise']:
+        raise ValueError('boom')
+    return 0
+
+
+def app():
+    from appupup.main import main
+
+    def setup_parser(parser):
+        parser.add_argument('--value', type=int, default=0)
+        parser.set_defaults(func=lambda args, logger: args.value)
+
+    return main(
+        app_name='warm_test', app_version='1.0.0', app_stage='',
+        app_author='appupup', app_description='test',
+        app_url='http://localhost', parser_constructor=setup_parser)
+'''
+
+
+class TestWarm(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(cls.temp_dir, 'warm_entry.py'), 'w') as f:
+            f.write(ENTRY_MODULE)
+        env = dict(os.environ)
+        env['HOME'] = cls.temp_dir
+        env['PYTHONPATH'] = os.pathsep.join((
+            cls.temp_dir,
+            os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.dirname(os.path.abspath(__file__)))))))
+        cls.env = env
+        cls.servers = []
+        cls.socket = cls.start_server('run')
+        cls.app_socket = cls.start_server('app')
+
+    @classmethod
+    def start_server(cls, function):
+        path = os.path.join(cls.temp_dir, 'run', '%s.sock' % function)
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'appupup.warm', 'serve', path,
+             'warm_entry:%s' % function, '--prog', 'entry',
+             '--idle-timeout', '60'],
+            env=cls.env, cwd=cls.temp_dir)
+        cls.servers.append(server)
+        deadline = time.time() + 20
+        while True:
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise
+                time.sleep(0.05)
+            finally:
+                probe.close()
+        return path
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.servers:
+            server.terminate()
+            server.wait(10)
+        shutil.rmtree(cls.temp_dir)
+
+    def call(self, path, args, stdin=b''):
+        files = [tempfile.TemporaryFile() for _ in range(3)]
+        try:
+            files[0].write(stdin)
+            files[0].seek(0)
+            code = call(path, args, env={'WARM_TEST': 'yes'},
+                        cwd=self.temp_dir,
+                        fds=[f.fileno() for f in files])
+            outputs = []
+            for f in files[1:]:
+                f.seek(0)
+                outputs.append(f.read().decode('utf-8'))
+            return code, outputs[0], outputs[1]
+        finally:
+            for f in files:
+                f.close()
+
+    def test_forwarded(self):
+        code, out, err = self.call(self.socket, ['a', 'b'], b'input')
+        self.assertEqual(code, 0)
+        self.assertEqual(out, 'entry a b|yes|%s\n' % self.temp_dir)
+        self.assertEqual(err, 'INPUT')
+
+    def test_exit_code(self):
+        self.assertEqual(self.call(self.socket, ['exit', '7'])[0], 7)
+
+    def test_exception(self):
+        code, out, err = self.call(self.socket, ['raise'])
+        self.assertEqual(code, 1)
+        self.assertIn('ValueError: boom', err)
+
+    def test_main(self):
+        code, out, err = self.call(
+            self.app_socket,
+            ['--config', '-', '--log-file', '-', '--value', '5'])
+        self.assertEqual(code, 5)
+        code, out, err = self.call(self.app_socket, ['--help'])
+        self.assertEqual(code, 0)
+        self.assertIn('--value', out)
+
+    def test_no_server(self):
+        path = os.path.join(self.temp_dir, 'missing.sock')
+        with self.assertRaises(FileNotFoundError):
+            call(path, [])
+        self.assertEqual(call_or_run(path, lambda: 4, args=[]), 4)
+
+    def test_exit_code_of_result(self):
+        self.assertEqual(exit_code(None), 0)
+        self.assertEqual(exit_code(True), 0)
+        self.assertEqual(exit_code(False), 1)
+        self.assertEqual(exit_code(-2), -2)